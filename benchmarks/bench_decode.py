@@ -0,0 +1,83 @@
+"""Benchmark decoding of graph messages received from the backend.
+
+The legacy decoder below is the `json.loads` call with a per-object
+hook that Geneagrapher used before `geneagrapher.decode` was added.
+It is compared against `decode_response` with each installed JSON
+backend on synthetic graph messages of several sizes.
+
+Usage:
+
+    python -m benchmarks.bench_decode [--sizes 10000 100000] [--repeat 5]
+"""
+
+from geneagrapher.decode import JSON_BACKENDS, decode_response, load_backend
+from geneagrapher.synthetic import make_geneagraph
+
+from argparse import ArgumentParser
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional
+from unittest.mock import patch
+
+
+def intify_record_keys(d: Dict[Any, Any]) -> Dict[Any, Any]:
+    if "nodes" in d:
+        ret = {k: v for k, v in d.items() if k != "nodes"}
+        ret["nodes"] = {int(k): v for k, v in d["nodes"].items()}
+        return ret
+
+    return d
+
+
+def legacy_decode(message: str) -> Any:
+    return json.loads(message, object_hook=intify_record_keys)
+
+
+def best_time(fn: Callable[[], Any], repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000], metavar="N"
+    )
+    parser.add_argument("--repeat", type=int, default=5, metavar="N")
+    args = parser.parse_args(argv)
+
+    backends = {}
+    for name in JSON_BACKENDS:
+        try:
+            backends[name] = load_backend(name)
+        except ImportError:
+            print(f"{name} is not installed; skipping")
+
+    print(f"{'nodes':>8} {'MB':>7} {'decoder':>10} {'time (s)':>9} {'speedup':>8}")
+    for size in args.sizes:
+        message = json.dumps(
+            {"kind": "graph", "payload": make_geneagraph(size)}, ensure_ascii=False
+        )
+        mb = len(message.encode()) / 1e6
+
+        legacy = best_time(lambda: legacy_decode(message), args.repeat)
+        print(f"{size:>8} {mb:>7.1f} {'legacy':>10} {legacy:>9.3f} {1:>7.2f}x")
+
+        expected = legacy_decode(message)
+        for name, loads in backends.items():
+            with patch("geneagrapher.decode.default_loads", return_value=loads):
+                if decode_response(message) != expected:
+                    raise SystemExit(f"{name} result differs for {size} nodes")
+                current = best_time(lambda: decode_response(message), args.repeat)
+            print(
+                f"{size:>8} {mb:>7.1f} {name:>10} {current:>9.3f} "
+                f"{legacy / current:>7.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
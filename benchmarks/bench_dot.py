@@ -0,0 +1,87 @@
+"""Benchmark DOT generation against the previous implementation.
+
+The legacy implementation below is the `DotOutput` that Geneagrapher
+shipped before edges were generated in a single pass over the sorted
+records (with one `filter` generator per record) and before the output
+was streamed in chunks. Both implementations are run on the same
+synthetic graphs, and their outputs are checked to be identical.
+
+Usage:
+
+    python -m benchmarks.bench_dot [--sizes 100000 1000000] [--repeat 3]
+"""
+
+from geneagrapher.output.dot import DotOutput, make_node_str
+from geneagrapher.synthetic import make_geneagraph
+from geneagrapher.types import Geneagraph, Record
+
+from argparse import ArgumentParser
+import time
+from typing import Callable, Generator, List, Optional
+
+
+def legacy_make_edge_str(
+    record: Record, graph: Geneagraph
+) -> Generator[str, None, None]:
+    for advisor_id in filter(
+        lambda aid: aid in graph["nodes"], set(record["advisors"])
+    ):
+        yield f'{advisor_id} -> {record["id"]};'
+
+
+def legacy_output(graph: Geneagraph) -> str:
+    template = """digraph {{
+    graph [ordering="out"];
+    node [shape=plaintext];
+    edge [style=bold];
+
+    {nodes}
+
+    {edges}
+}}"""
+    nodes = [
+        make_node_str(record)
+        for record in sorted(graph["nodes"].values(), key=lambda r: r["id"])
+    ]
+    edges = [
+        edge_str
+        for record in sorted(
+            graph["nodes"].values(),
+            key=lambda r: (r["year"] or -10000, r["name"]),
+        )
+        for edge_str in legacy_make_edge_str(record, graph)
+    ]
+    prefix = "\n    "
+    return template.format(nodes=prefix.join(nodes), edges=prefix.join(edges))
+
+
+def best_time(fn: Callable[[], str], repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[100_000, 1_000_000], metavar="N"
+    )
+    parser.add_argument("--repeat", type=int, default=3, metavar="N")
+    args = parser.parse_args(argv)
+
+    print(f"{'nodes':>10} {'legacy (s)':>12} {'current (s)':>12} {'speedup':>8}")
+    for size in args.sizes:
+        graph = make_geneagraph(size)
+        if legacy_output(graph) != DotOutput(graph).output:
+            raise SystemExit(f"outputs differ for {size} nodes")
+
+        legacy = best_time(lambda: legacy_output(graph), args.repeat)
+        current = best_time(lambda: DotOutput(graph).output, args.repeat)
+        print(f"{size:>10} {legacy:>12.3f} {current:>12.3f} {legacy / current:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
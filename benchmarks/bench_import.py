@@ -0,0 +1,137 @@
+"""Benchmark the time `ggrapher` spends importing its modules.
+
+Each module is imported in a fresh interpreter run with
+`python -X importtime`, and the time spent importing the `geneagrapher`
+package and its dependencies is reported, along with the dependencies
+that took the longest. The slowest dependencies (websockets, asyncio,
+the output formatters, package metadata) are imported only where they
+are used, and `IMPORT_BUDGET` bounds the startup cost that remains; the
+test suite enforces both.
+
+Usage:
+
+    python -m benchmarks.bench_import [--modules geneagrapher.geneagrapher]
+                                      [--repeat 5]
+"""
+
+from argparse import ArgumentParser
+from dataclasses import dataclass
+import os
+import subprocess
+import sys
+from typing import List, Optional
+
+# The modules whose import `ggrapher` pays for on every run, including
+# `--help`, `--version` and the offline subcommands.
+STARTUP_MODULES = ["geneagrapher.geneagrapher", "geneagrapher.convert"]
+# Modules that those must not import.
+DEFERRED_MODULES = [
+    "asyncio",
+    "cProfile",
+    "importlib.metadata",
+    "sqlite3",
+    "websockets",
+    "geneagrapher.client",
+    "geneagrapher.components",
+    "geneagrapher.output.dot",
+    "geneagrapher.output.identity",
+    "geneagrapher.output.ndjson",
+]
+IMPORT_BUDGET = 0.025  # seconds
+
+
+@dataclass
+class ImportTime:
+    name: str
+    depth: int
+    self_seconds: float
+    cumulative_seconds: float
+
+
+def import_times(module: str) -> List[ImportTime]:
+    """Import `module` in a fresh interpreter and return the import
+    time of every module imported, in the order `-X importtime`
+    reports them (dependencies before the modules that import them)."""
+    # Bytecode is written, as it is when Geneagrapher is installed, so
+    # that only the first import compiles the modules.
+    env = {k: v for k, v in os.environ.items() if k != "PYTHONDONTWRITEBYTECODE"}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        if not self_us.strip().isdigit():
+            continue  # The header line.
+        times.append(
+            ImportTime(
+                name.strip(),
+                (len(name) - len(name.lstrip()) - 1) // 2,
+                int(self_us) / 1e6,
+                int(cumulative_us) / 1e6,
+            )
+        )
+    return times
+
+
+def startup_imports(times: List[ImportTime]) -> List[ImportTime]:
+    """Return the imports of the `geneagrapher` package and of the
+    modules it imports, leaving out those of interpreter startup."""
+    imports: List[ImportTime] = []
+    nested: List[ImportTime] = []
+    for t in times:
+        nested.append(t)
+        if t.depth == 0:
+            if t.name == "geneagrapher" or t.name.startswith("geneagrapher."):
+                imports.extend(nested)
+            nested = []
+    return imports
+
+
+def startup_time(times: List[ImportTime]) -> float:
+    """Return the time spent importing the `geneagrapher` package and
+    the modules it imports."""
+    return sum(t.cumulative_seconds for t in startup_imports(times) if t.depth == 0)
+
+
+def fastest_import(module: str, repeat: int) -> List[ImportTime]:
+    """Import `module` `repeat` times, after an untimed import that
+    compiles it, and return the import times of the fastest."""
+    import_times(module)
+    return min((import_times(module) for _ in range(repeat)), key=startup_time)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--modules", nargs="+", default=STARTUP_MODULES, metavar="MODULE"
+    )
+    parser.add_argument("--repeat", type=int, default=5, metavar="N")
+    parser.add_argument(
+        "--top", type=int, default=10, help="list the N slowest dependencies"
+    )
+    args = parser.parse_args(argv)
+
+    over_budget = False
+    for module in args.modules:
+        times = fastest_import(module, args.repeat)
+        best = startup_time(times)
+        over_budget |= best > IMPORT_BUDGET
+        print(f"{module}: {best * 1000:.1f} ms (budget {IMPORT_BUDGET * 1000:.0f} ms)")
+        slowest = sorted(
+            startup_imports(times), key=lambda t: t.self_seconds, reverse=True
+        )
+        for t in slowest[: args.top]:
+            print(f"    {t.self_seconds * 1000:>7.2f} ms  {t.name}")
+    if over_budget:
+        raise SystemExit("startup imports exceed the budget")
+
+
+if __name__ == "__main__":
+    main()
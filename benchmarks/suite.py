@@ -0,0 +1,295 @@
+"""Benchmark suite for Geneagrapher's graph pipeline.
+
+Each stage of the pipeline is run on synthetic graphs of several
+sizes, and its wall time, peak memory, and throughput (records per
+second) are recorded:
+
+- `decode`: decoding a graph message received from the backend
+- `compact`: converting a graph to a `CompactGraph`
+- `dot`, `json`, `ndjson`, `bin`: writing a graph in each output format
+- `reuse-json`, `reuse-bin`: loading a graph saved in the JSON or the
+  binary format and writing it as DOT
+- `run`: the whole `ggrapher` command, against a local stub backend
+  (throughput counts the records in the requested graph)
+
+Results are compared against a stored baseline, and the suite exits
+with a non-zero status if any stage got slower or used more memory
+than the baseline allows.
+
+Usage:
+
+    python -m benchmarks.suite [--sizes 1000 100000 1000000]
+    python -m benchmarks.suite --update-baseline
+
+Baselines are machine-specific; update the stored baseline on the
+machine that runs the comparison.
+"""
+
+from geneagrapher.compact import CompactGraph
+from geneagrapher.decode import decode_response
+from geneagrapher.geneagrapher import TEXT_FORMATS, TextFormat, get_formatter, run
+from geneagrapher.load import load_graph, map_graph
+from geneagrapher.output.binary import BinaryOutput
+from geneagrapher.output.dot import DotOutput
+from geneagrapher.output.identity import IdentityOutput
+from geneagrapher.stub_backend import StubBackend
+from geneagrapher.synthetic import make_geneagraph
+from geneagrapher.traverse import traverse_local
+from geneagrapher.types import Geneagraph, StartNodeRequest
+
+from argparse import ArgumentParser
+import asyncio
+from contextlib import contextmanager
+from dataclasses import dataclass
+import gc
+import io
+import json
+import os
+from pathlib import Path
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, TextIO, cast
+from unittest.mock import patch
+
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+DEFAULT_TOLERANCE = 0.25
+# Measurements below these are too noisy to compare.
+MIN_COMPARABLE_SECONDS = 0.05
+MIN_COMPARABLE_BYTES = 1_000_000
+
+
+@dataclass
+class Result:
+    seconds: float
+    peak_bytes: int
+    records_per_second: float
+
+
+class NullWriter(io.TextIOBase):
+    """A text file that discards what is written to it."""
+
+    def write(self, s: str) -> int:
+        return len(s)
+
+
+class NullBinaryWriter(io.RawIOBase):
+    """A binary file that discards what is written to it."""
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b: bytes) -> int:  # type: ignore[override]
+        return len(b)
+
+
+def measure(fn: Callable[[], object], records: int, repeat: int) -> Result:
+    """Return the best wall time of `repeat` calls of `fn`, and the
+    peak memory allocated during one additional, traced call. Memory is
+    traced process-wide, so it includes the stub backend's thread."""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    seconds = min(times)
+    return Result(seconds, peak, records / seconds if seconds else 0.0)
+
+
+@contextmanager
+def stub_backend(graph: Geneagraph) -> Iterator[str]:
+    """Run a stub backend serving `graph` on a background thread, and
+    yield its URI."""
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    stop = loop.create_future()
+    uri = ""
+
+    async def serve() -> None:
+        nonlocal uri
+        async with StubBackend(graph, progress_steps=0).serve("localhost", 0) as s:
+            uri = f"ws://localhost:{list(s.sockets)[0].getsockname()[1]}"
+            ready.set()
+            await stop
+
+    thread = threading.Thread(target=loop.run_until_complete, args=(serve(),))
+    thread.start()
+    ready.wait()
+    try:
+        yield uri
+    finally:
+        loop.call_soon_threadsafe(stop.set_result, None)
+        thread.join()
+        loop.close()
+
+
+def run_ggrapher(argv: List[str]) -> None:
+    with patch.object(sys, "argv", ["ggrapher"] + argv):
+        run()
+
+
+def benchmark_size(size: int, repeat: int) -> Dict[str, Result]:
+    graph = make_geneagraph(size)
+    records = len(graph["nodes"])
+    results: Dict[str, Result] = {}
+
+    message = json.dumps({"kind": "graph", "payload": graph})
+    results["decode"] = measure(lambda: decode_response(message), records, repeat)
+
+    results["compact"] = measure(
+        lambda: CompactGraph.from_geneagraph(graph), records, repeat
+    )
+
+    def write(format: TextFormat) -> None:
+        get_formatter(format, graph).write(cast(TextIO, NullWriter()))
+
+    for format in TEXT_FORMATS:
+        results[format] = measure(lambda: write(format), records, repeat)
+    results["bin"] = measure(
+        lambda: BinaryOutput(graph).write(cast(BinaryIO, NullBinaryWriter())),
+        records,
+        repeat,
+    )
+
+    saved = IdentityOutput(graph).output
+    results["reuse-json"] = measure(
+        lambda: DotOutput(load_graph(io.StringIO(saved))).write(
+            cast(TextIO, NullWriter())
+        ),
+        records,
+        repeat,
+    )
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / "graph.bin"
+        with open(path, "wb") as f:
+            BinaryOutput(graph).write(f)
+        results["reuse-bin"] = measure(
+            lambda: DotOutput(map_graph(path)).write(cast(TextIO, NullWriter())),
+            records,
+            repeat,
+        )
+
+    # Records are generated oldest first, so the descendants of the
+    # oldest record with any span most of the synthetic genealogy.
+    root = next(rid for rid, r in graph["nodes"].items() if r["descendants"])
+    start: StartNodeRequest = {
+        "recordId": root,
+        "getAdvisors": False,
+        "getDescendants": True,
+    }
+    reached = len(traverse_local([start], StubBackend(graph).lookup)[0]["nodes"])
+    with stub_backend(graph) as uri, tempfile.TemporaryDirectory() as tmpdir:
+        out = os.path.join(tmpdir, "graph.dot")
+        argv = ["--backend-uri", uri, "--no-cache", "-q", "-o", out, f"{root}:d"]
+        results["run"] = measure(lambda: run_ggrapher(argv), reached, repeat)
+
+    return results
+
+
+def compare(
+    results: Dict[str, Result], baseline: Dict[str, Result], tolerance: float
+) -> List[str]:
+    """Return a description of each result that regressed by more than
+    `tolerance` relative to `baseline`."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if base.seconds >= MIN_COMPARABLE_SECONDS and result.seconds > base.seconds * (
+            1 + tolerance
+        ):
+            regressions.append(
+                f"{name}: {result.seconds:.3f}s vs. baseline {base.seconds:.3f}s"
+            )
+        if (
+            base.peak_bytes >= MIN_COMPARABLE_BYTES
+            and result.peak_bytes > base.peak_bytes * (1 + tolerance)
+        ):
+            regressions.append(
+                f"{name}: peak {result.peak_bytes / 1e6:.1f} MB vs. baseline \
+{base.peak_bytes / 1e6:.1f} MB"
+            )
+    return regressions
+
+
+def rounded(result: Result) -> Dict[str, float]:
+    return {
+        "seconds": round(result.seconds, 4),
+        "peak_bytes": result.peak_bytes,
+        "records_per_second": round(result.records_per_second),
+    }
+
+
+def load_baseline(path: Path) -> Dict[str, Result]:
+    if not path.exists():
+        return {}
+    return {name: Result(**r) for name, r in json.loads(path.read_text()).items()}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=DEFAULT_SIZES, metavar="N"
+    )
+    parser.add_argument("--repeat", type=int, default=3, metavar="N")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="allowed fractional regression (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="store these results as the baseline instead of comparing",
+    )
+    args = parser.parse_args(argv)
+
+    results: Dict[str, Result] = {}
+    print(f"{'stage':>20} {'time (s)':>9} {'peak (MB)':>10} {'records/s':>12}")
+    for size in args.sizes:
+        for stage, result in benchmark_size(size, args.repeat).items():
+            name = f"{stage}/{size}"
+            results[name] = result
+            print(
+                f"{name:>20} {result.seconds:>9.3f} {result.peak_bytes / 1e6:>10.1f} "
+                f"{result.records_per_second:>12,.0f}"
+            )
+
+    baseline = load_baseline(args.baseline)
+    if args.update_baseline:
+        baseline.update(results)
+        args.baseline.write_text(
+            json.dumps({k: rounded(v) for k, v in sorted(baseline.items())}, indent=2)
+            + "\n"
+        )
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\nREGRESSIONS (tolerance {args.tolerance:.0%}):", file=sys.stderr)
+        for regression in regressions:
+            print(f"  {regression}", file=sys.stderr)
+        return 1
+    print(f"\nNo regressions against {args.baseline}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
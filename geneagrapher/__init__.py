@@ -0,0 +1,17 @@
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .client import GeneagrapherClient
+
+__all__ = ["GeneagrapherClient"]
+
+
+def __getattr__(name: str) -> Any:
+    # The client is imported on first use, so that importing the
+    # package (as `ggrapher` does) does not import websockets and
+    # asyncio.
+    if name == "GeneagrapherClient":
+        from .client import GeneagrapherClient
+
+        return GeneagrapherClient
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,201 @@
+"""This module implements the `ggrapher batch` subcommand, which builds
+many graphs concurrently in one process.
+
+Jobs are read from a JSON Lines file. Each line is an object with the
+start nodes of a graph, the path to write the graph to, and,
+optionally, the output format:
+
+    {"ids": ["18231:a", "38586:d"], "out": "gauss-euler.dot"}
+    {"ids": ["7398:d"], "out": "curry.json", "format": "json"}
+
+All jobs run on one asyncio event loop and share the record cache and
+a pool of backend connections (see `GeneagrapherClient`), so that
+connections are not set up again for each job or each request. A
+failed job is reported and does not stop the other jobs.
+"""
+
+from .cache import RecordCache
+from .client import GeneagrapherClient
+from .geneagrapher import (
+    FORMATS,
+    GGRAPHER_URI,
+    GgrapherError,
+    OutputFormat,
+    StartNodeArg,
+    add_backend_arguments,
+    add_cache_arguments,
+    add_shards_argument,
+    check_shards_argument,
+    get_graph_cached,
+    make_payload,
+    max_message_size,
+    open_cache,
+    write_graph,
+)
+
+from argparse import ArgumentParser, FileType
+import asyncio
+from dataclasses import dataclass
+import json
+import sys
+from typing import List, Optional, TextIO
+
+DEFAULT_CONCURRENCY = 4
+
+
+class JobError(Exception):
+    pass
+
+
+@dataclass
+class Job:
+    line_number: int
+    start_nodes: List[StartNodeArg]
+    out: str
+    format: OutputFormat
+
+
+def parse_job(line_number: int, line: str) -> Job:
+    try:
+        spec = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise JobError(f"invalid JSON ({e})")
+    if not isinstance(spec, dict):
+        raise JobError("job must be a JSON object")
+
+    ids = spec.get("ids")
+    if not isinstance(ids, list) or len(ids) == 0:
+        raise JobError("'ids' must be a non-empty list")
+    try:
+        start_nodes = [StartNodeArg(str(i)) for i in ids]
+    except ValueError:
+        raise JobError(f"invalid ID in {ids}")
+
+    out = spec.get("out")
+    if not isinstance(out, str):
+        raise JobError("'out' must be a path")
+
+    format = spec.get("format", "dot")
+    if format not in FORMATS:
+        raise JobError(f"'format' must be one of {', '.join(FORMATS)}")
+
+    return Job(line_number, start_nodes, out, format)
+
+
+async def run_job(
+    job: Job,
+    cache: Optional[RecordCache],
+    semaphore: asyncio.Semaphore,
+    client: GeneagrapherClient,
+    *,
+    shards: int,
+) -> None:
+    async with semaphore:
+        graph = await get_graph_cached(
+            make_payload((sn.start_node for sn in job.start_nodes), True),
+            cache,
+            shards=shards,
+            client=client,
+        )
+    with open(job.out, "w") as outfile:
+        write_graph(job.format, graph, outfile)
+
+
+async def run_jobs(
+    jobfile: TextIO,
+    cache: Optional[RecordCache],
+    concurrency: int,
+    *,
+    uri: Optional[str] = None,
+    max_size: Optional[int] = None,
+    shards: int = 1,
+) -> int:
+    """Run the jobs in `jobfile`, requesting graphs from the backend at
+    `uri` over one pool of connections, and report the outcome of each
+    on stderr. Return the number of jobs that failed."""
+    semaphore = asyncio.Semaphore(concurrency)
+    client = GeneagrapherClient(
+        uri or GGRAPHER_URI, pool_size=concurrency * shards, max_size=max_size
+    )
+    labels: List[str] = []
+    tasks: List["asyncio.Task[None]"] = []
+    failures = 0
+
+    for line_number, line in enumerate(jobfile, start=1):
+        if not line.strip():
+            continue
+        try:
+            job = parse_job(line_number, line)
+        except JobError as e:
+            print(f"job {line_number}: failed: {e}", file=sys.stderr)
+            failures += 1
+            continue
+        labels.append(f"job {line_number} ({job.out})")
+        tasks.append(
+            asyncio.create_task(run_job(job, cache, semaphore, client, shards=shards))
+        )
+
+    async with client:
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+    for label, result in zip(labels, results):
+        if result is None:
+            print(f"{label}: done", file=sys.stderr)
+            continue
+
+        failures += 1
+        if isinstance(result, GgrapherError):
+            print(f"{label}: failed: {result.msg}", file=sys.stderr)
+        elif isinstance(result, Exception):
+            print(f"{label}: failed: {result}", file=sys.stderr)
+        else:
+            raise result
+
+    return failures
+
+
+def run_batch(argv: List[str]) -> int:
+    parser = ArgumentParser(
+        prog="ggrapher batch",
+        description="Build the graphs described in a JSON Lines job file. Each \
+line is an object with an 'ids' list of start nodes (e.g., '18231:a'), an 'out' \
+path, and an optional 'format' (default: dot).",
+    )
+    parser.add_argument(
+        "jobfile",
+        type=FileType("r"),
+        metavar="JOBS",
+        help="job file to read, or '-' for stdin",
+    )
+    parser.add_argument(
+        "-j",
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help="build at most N graphs at a time (default: %(default)s)",
+        metavar="N",
+    )
+    add_cache_arguments(parser)
+    add_backend_arguments(parser)
+    add_shards_argument(parser)
+    args = parser.parse_args(argv)
+    if args.concurrency < 1:
+        parser.error("argument -j/--concurrency: must be at least 1")
+    check_shards_argument(parser, args)
+
+    cache = open_cache(args)
+    try:
+        failures = asyncio.run(
+            run_jobs(
+                args.jobfile,
+                cache,
+                args.concurrency,
+                uri=args.backend_uri,
+                max_size=max_message_size(args),
+                shards=args.shards,
+            )
+        )
+    finally:
+        if cache is not None:
+            cache.close()
+
+    return 1 if failures else 0
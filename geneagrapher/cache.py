@@ -0,0 +1,196 @@
+"""This module implements `RecordCache`, a persistent on-disk store of
+`Record` objects that is shared across Geneagrapher runs.
+
+Records are stored in a SQLite database keyed by `RecordId`. Each
+entry remembers when it was fetched from the backend and when it was
+last read. Entries older than the cache's time-to-live are treated as
+missing. Since runs that share the cache may use different
+time-to-lives, a run's time-to-live does not remove entries: entries
+are removed only once they are older than the cache's retention period
+(or the run's time-to-live, if that is longer), or when they are the
+least recently used and the cache has grown beyond its size bound.
+"""
+
+from .types import Record, RecordId
+
+import json
+import os
+from pathlib import Path
+import sys
+import time
+from types import TracebackType
+from typing import Callable, Dict, Iterable, List, Optional, Type
+
+CACHE_FILENAME = "records.sqlite3"
+DEFAULT_CACHE_TTL = 7 * 24 * 60 * 60  # one week, in seconds
+CACHE_RETENTION = 30 * 24 * 60 * 60  # 30 days, in seconds
+DEFAULT_CACHE_SIZE = 1_000_000  # records
+
+SCHEMA = """CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY,
+    record TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS records_accessed_at ON records (accessed_at);
+"""
+
+
+def default_cache_dir() -> Path:
+    """Return the platform's conventional per-user cache directory for
+    Geneagrapher."""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA")
+        default = Path.home() / "AppData" / "Local"
+    else:
+        base = os.environ.get("XDG_CACHE_HOME")
+        default = Path.home() / ".cache"
+    return (Path(base) if base else default) / "geneagrapher"
+
+
+class RecordCache:
+    def __init__(
+        self,
+        path: Path,
+        *,
+        ttl: float = DEFAULT_CACHE_TTL,
+        max_records: int = DEFAULT_CACHE_SIZE,
+        retention: float = CACHE_RETENTION,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.max_records = max_records
+        self.retention = retention
+        self.clock = clock
+        # The number of entries, counted on the first write and then
+        # kept up to date, so that writes do not scan the table.
+        self._count: Optional[int] = None
+
+        # sqlite3 is imported here, rather than with the module, so that
+        # `ggrapher` runs that do not open the cache start quickly.
+        import sqlite3
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(path))
+        self.conn.executescript(SCHEMA)
+
+    @classmethod
+    def open(
+        cls,
+        cache_dir: Path,
+        *,
+        ttl: float = DEFAULT_CACHE_TTL,
+        max_records: int = DEFAULT_CACHE_SIZE,
+    ) -> "RecordCache":
+        return cls(cache_dir / CACHE_FILENAME, ttl=ttl, max_records=max_records)
+
+    def __enter__(self) -> "RecordCache":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __len__(self) -> int:
+        (count,) = self.conn.execute("SELECT COUNT(*) FROM records").fetchone()
+        return int(count)
+
+    def get(self, record_id: RecordId) -> Optional[Record]:
+        return self.get_many([record_id]).get(record_id)
+
+    def get_many(self, record_ids: Iterable[RecordId]) -> Dict[RecordId, Record]:
+        """Return the unexpired cached records among `record_ids`. Ids
+        that are not cached, or whose entries have expired, are absent
+        from the returned dictionary."""
+        now = self.clock()
+        ids = list(record_ids)
+        found: Dict[RecordId, Record] = {}
+
+        # SQLite limits the number of host parameters in a statement,
+        # so look the ids up in batches.
+        batch_size = 500
+        for i in range(0, len(ids), batch_size):
+            batch = ids[i : i + batch_size]
+            placeholders = ",".join("?" * len(batch))
+            for record_id, record_json in self.conn.execute(
+                f"SELECT id, record FROM records WHERE id IN ({placeholders}) \
+AND fetched_at >= ?",
+                batch + [now - self.ttl],
+            ):
+                found[RecordId(record_id)] = json.loads(record_json)
+
+        if found:
+            with self.conn:
+                self.conn.executemany(
+                    "UPDATE records SET accessed_at = ? WHERE id = ?",
+                    ((now, record_id) for record_id in found),
+                )
+        return found
+
+    def fetched_at(self, record_id: RecordId) -> Optional[float]:
+        """Return the time at which `record_id` was stored, or `None` if
+        it is not cached. Expired entries are reported too."""
+        row = self.conn.execute(
+            "SELECT fetched_at FROM records WHERE id = ?", (record_id,)
+        ).fetchone()
+        return None if row is None else float(row[0])
+
+    def _count_cached(self, record_ids: List[RecordId]) -> int:
+        """Return the number of `record_ids` that have entries."""
+        count = 0
+        batch_size = 500
+        for i in range(0, len(record_ids), batch_size):
+            batch = record_ids[i : i + batch_size]
+            placeholders = ",".join("?" * len(batch))
+            (found,) = self.conn.execute(
+                f"SELECT COUNT(*) FROM records WHERE id IN ({placeholders})", batch
+            ).fetchone()
+            count += found
+        return count
+
+    def put_many(self, records: Iterable[Record]) -> None:
+        now = self.clock()
+        by_id = {RecordId(r["id"]): r for r in records}
+        with self.conn:
+            if self._count is None:
+                # Entries are kept for days, so removing old ones on the
+                # first write suffices.
+                self.evict()
+            assert self._count is not None
+            self._count += len(by_id) - self._count_cached(list(by_id))
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO records (id, record, fetched_at, accessed_at) \
+VALUES (?, ?, ?, ?)",
+                ((rid, json.dumps(r), now, now) for rid, r in by_id.items()),
+            )
+            self._evict_excess()
+
+    def evict(self) -> None:
+        """Remove the entries older than the retention period (or the
+        time-to-live, if that is longer), then remove the least recently
+        used entries until the cache holds at most `max_records`
+        records."""
+        now = self.clock()
+        max_age = max(self.ttl, self.retention)
+        self.conn.execute("DELETE FROM records WHERE fetched_at < ?", (now - max_age,))
+        self._count = len(self)
+        self._evict_excess()
+
+    def _evict_excess(self) -> None:
+        assert self._count is not None
+        excess = self._count - self.max_records
+        if excess > 0:
+            self.conn.execute(
+                "DELETE FROM records WHERE id IN \
+(SELECT id FROM records ORDER BY accessed_at, id LIMIT ?)",
+                (excess,),
+            )
+            self._count -= excess
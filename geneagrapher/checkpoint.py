@@ -0,0 +1,105 @@
+"""This module implements `Checkpoint`, which saves the records of a
+build as they are received so that an interrupted build can be resumed
+(the `--checkpoint` and `--resume` options).
+
+A checkpoint file is a JSON Lines file. The first line identifies the
+build by its start nodes, in canonical form. Each following line holds
+the records and status of one completed backend response. Lines are
+flushed as they are written, so a checkpoint survives the build being
+interrupted; a partially written last line is ignored when the
+checkpoint is loaded.
+"""
+
+from .traverse import canonical_start_nodes
+from .types import Geneagraph, Record, RecordId, StartNodeRequest
+
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, TextIO
+
+
+class CheckpointError(Exception):
+    pass
+
+
+class Checkpoint:
+    def __init__(
+        self,
+        path: Path,
+        start_nodes: Iterable[StartNodeRequest],
+        *,
+        resume: bool = False,
+    ) -> None:
+        """Open the checkpoint at `path` for the build of `start_nodes`.
+        If `resume` is true and the checkpoint exists, its records are
+        loaded; otherwise, the checkpoint starts out empty. Raise
+        `CheckpointError` if the checkpoint to resume from belongs to a
+        different build, or if the checkpoint cannot be read or
+        written."""
+        self.path = path
+        self.records: Dict[RecordId, Record] = {}
+        self.truncated = False
+
+        header = {"startNodes": canonical_start_nodes(start_nodes)}
+        self._file: Optional[TextIO] = None
+        try:
+            if resume and path.exists():
+                self._load(header)
+
+            # The checkpoint is rewritten, rather than appended to, in
+            # case its last line was only partially written.
+            self._file = open(path, "w")
+        except OSError as e:
+            raise CheckpointError(f"Cannot open checkpoint {path}: {e}")
+        self._write(header)
+        if self.records:
+            self._write(
+                {
+                    "nodes": list(self.records.values()),
+                    "status": "truncated" if self.truncated else "complete",
+                }
+            )
+
+    def _load(self, header: Dict[str, Any]) -> None:
+        with open(self.path) as f:
+            try:
+                matches = json.loads(f.readline()) == header
+            except json.JSONDecodeError:
+                matches = False
+            if not matches:
+                raise CheckpointError(
+                    f"Checkpoint {self.path} is for a different build. Remove it \
+or omit --resume to start over."
+                )
+
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                self.records.update((RecordId(r["id"]), r) for r in entry["nodes"])
+                if entry["status"] == "truncated":
+                    self.truncated = True
+
+    def _write(self, entry: Dict[str, Any]) -> None:
+        assert self._file is not None
+        try:
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+        except OSError as e:
+            raise CheckpointError(f"Cannot write checkpoint {self.path}: {e}")
+
+    def add(self, graph: Geneagraph) -> None:
+        """Save the records of `graph`, a completed backend response."""
+        self._write({"nodes": list(graph["nodes"].values()), "status": graph["status"]})
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self) -> None:
+        """Close and delete the checkpoint, e.g., once the build has
+        completed."""
+        self.close()
+        self.path.unlink()
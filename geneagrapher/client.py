@@ -0,0 +1,172 @@
+"""This module implements `GeneagrapherClient`, an asynchronous client
+for the Geneagrapher backend that is meant to be embedded in
+long-running programs.
+
+`get_graph` opens a new WebSocket connection for each graph. A
+`GeneagrapherClient` instead keeps a pool of connections open and
+reuses them across requests, so programs that request many graphs pay
+for connection setup only once per pooled connection. Each connection
+carries one request at a time; up to `pool_size` requests run
+concurrently, and further requests wait for a connection to become
+free.
+
+    async with GeneagrapherClient() as client:
+        graph = await client.build_graph(
+            [{"recordId": 18231, "getAdvisors": True, "getDescendants": False}]
+        )
+"""
+
+from .geneagrapher import (
+    CLOSE_MESSAGE_TOO_BIG,
+    GGRAPHER_URI,
+    GgrapherError,
+    ProgressHandler,
+    RequestPayload,
+    backend_errors,
+    connect,
+    request_graph,
+)
+from .timings import Timings
+from .traverse import canonical_start_nodes
+from .types import Geneagraph, StartNodeRequest
+
+import asyncio
+import time
+from types import TracebackType
+from typing import Iterable, List, Optional, Tuple, Type
+import websockets.client
+import websockets.exceptions
+
+DEFAULT_POOL_SIZE = 4
+
+
+class GeneagrapherClient:
+    def __init__(
+        self,
+        uri: str = GGRAPHER_URI,
+        *,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        max_size: Optional[int] = None,
+    ) -> None:
+        """Create a client for the backend at `uri` that keeps at most
+        `pool_size` connections open. Messages larger than `max_size`
+        bytes are rejected; by default, there is no limit. Connections
+        are opened as they are needed."""
+        if pool_size < 1:
+            raise ValueError("pool_size must be at least 1")
+        self.uri = uri
+        self.pool_size = pool_size
+        self.max_size = max_size
+        self._idle: List[websockets.client.WebSocketClientProtocol] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._closed = False
+
+    async def __aenter__(self) -> "GeneagrapherClient":
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        await self.close()
+
+    async def build_graph(
+        self,
+        start_nodes: Iterable[StartNodeRequest],
+        *,
+        progress: Optional[ProgressHandler] = None,
+        timings: Optional[Timings] = None,
+    ) -> Geneagraph:
+        """Request the graph built from `start_nodes`, which are put in
+        canonical form (see `canonical_start_nodes`). If `progress` is
+        given, the backend reports its progress, and `progress` is
+        called with the number of queued, fetching, and done records
+        each time it does. Raise `GgrapherError` if the request
+        fails."""
+        payload: RequestPayload = {
+            "kind": "build-graph",
+            "options": {"reportingCallback": progress is not None},
+            "startNodes": canonical_start_nodes(start_nodes),
+        }
+        return await self.request(payload, progress=progress, timings=timings)
+
+    async def request(
+        self,
+        payload: RequestPayload,
+        *,
+        progress: Optional[ProgressHandler] = None,
+        timings: Optional[Timings] = None,
+    ) -> Geneagraph:
+        """Send `payload` to the backend over a pooled connection and
+        return the graph it answers with."""
+        if self._closed:
+            raise GgrapherError("The client is closed.")
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.pool_size)
+
+        async with self._slots:
+            with backend_errors(self.max_size):
+                ws, reused = await self._acquire(timings)
+                try:
+                    graph = await self._request_on(ws, payload, progress, timings)
+                except websockets.exceptions.ConnectionClosed as e:
+                    too_big = (
+                        e.sent is not None and e.sent.code == CLOSE_MESSAGE_TOO_BIG
+                    )
+                    if not reused or too_big:
+                        raise
+                    # The backend closed the idle connection before the
+                    # request reached it. Requests have no side effects,
+                    # so retry once on a new connection.
+                    ws, _ = await self._acquire(timings, reuse=False)
+                    graph = await self._request_on(ws, payload, progress, timings)
+
+        await self._release(ws)
+        return graph
+
+    async def close(self) -> None:
+        """Close all pooled connections. The client cannot be used
+        afterward."""
+        self._closed = True
+        idle, self._idle = self._idle, []
+        await asyncio.gather(*(ws.close() for ws in idle))
+
+    async def _request_on(
+        self,
+        ws: websockets.client.WebSocketClientProtocol,
+        payload: RequestPayload,
+        progress: Optional[ProgressHandler],
+        timings: Optional[Timings],
+    ) -> Geneagraph:
+        try:
+            return await request_graph(ws, payload, progress=progress, timings=timings)
+        except BaseException:
+            # The connection may still have a response in flight, so it
+            # cannot be reused.
+            await ws.close()
+            raise
+
+    async def _acquire(
+        self, timings: Optional[Timings], *, reuse: bool = True
+    ) -> Tuple[websockets.client.WebSocketClientProtocol, bool]:
+        """Return an open connection and whether it was reused from the
+        pool."""
+        while reuse and self._idle:
+            ws = self._idle.pop()
+            if ws.open:
+                return ws, True
+            await ws.close()
+
+        connect_started = time.perf_counter()
+        ws = await connect(self.uri, self.max_size)
+        if timings is not None:
+            timings.add("connect", time.perf_counter() - connect_started)
+        return ws, False
+
+    async def _release(self, ws: websockets.client.WebSocketClientProtocol) -> None:
+        if self._closed or not ws.open:
+            await ws.close()
+        else:
+            self._idle.append(ws)
@@ -0,0 +1,324 @@
+"""This module implements `CompactGraph`, a memory-efficient container
+that holds the same information as a `Geneagraph`.
+
+A `Geneagraph` stores each record as a dictionary with two lists of
+ints. `CompactGraph` instead stores records in columns: record IDs
+(sorted, so that they double as the id-to-index map), names,
+institutions (as indexes into a pool of interned strings), and years
+are kept in parallel arrays, and advisor and descendant lists are
+kept in compressed sparse row (CSR) form, i.e., one flat array of IDs
+per direction plus an array of offsets into it.
+
+`CompactGraph` can be indexed like a `Geneagraph`
+(`graph["nodes"][record_id]["name"]`), so the output formatters accept
+either. Records are returned as lightweight `CompactRecord` views that
+are created on demand.
+"""
+
+from .types import Geneagraph, Record, RecordId
+
+from array import array
+from bisect import bisect_left
+from itertools import islice
+import sys
+from typing import (
+    Any,
+    Dict,
+    ItemsView,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    cast,
+    overload,
+)
+
+NO_YEAR = -(2**31)
+NO_INSTITUTION = -1
+
+# A column of ints: an `array` when the graph is built in memory, or a
+# `memoryview` of a mapped file.
+IntColumn = Union["array[int]", memoryview]
+
+
+class CompactRecord(Mapping[str, Any]):
+    """A read-only view of one record in a `CompactGraph`."""
+
+    __slots__ = ("_graph", "_index")
+
+    def __init__(self, graph: "CompactGraph", index: int) -> None:
+        self._graph = graph
+        self._index = index
+
+    @overload
+    def __getitem__(self, key: Literal["id"]) -> RecordId: ...
+
+    @overload
+    def __getitem__(self, key: Literal["name"]) -> str: ...
+
+    @overload
+    def __getitem__(self, key: Literal["institution"]) -> Optional[str]: ...
+
+    @overload
+    def __getitem__(self, key: Literal["year"]) -> Optional[int]: ...
+
+    @overload
+    def __getitem__(self, key: Literal["descendants", "advisors"]) -> List[int]: ...
+
+    @overload
+    def __getitem__(self, key: str) -> Any: ...
+
+    def __getitem__(self, key: str) -> Any:
+        g = self._graph
+        i = self._index
+        if key == "id":
+            return RecordId(g.ids[i])
+        elif key == "name":
+            return g.names[i]
+        elif key == "institution":
+            inst = g.institutions[i]
+            return None if inst == NO_INSTITUTION else g.institution_pool[inst]
+        elif key == "year":
+            year = g.years[i]
+            return None if year == NO_YEAR else year
+        elif key == "descendants":
+            return g.descendant_ids[
+                g.descendant_offsets[i] : g.descendant_offsets[i + 1]
+            ].tolist()
+        elif key == "advisors":
+            return g.advisor_ids[
+                g.advisor_offsets[i] : g.advisor_offsets[i + 1]
+            ].tolist()
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(Record.__annotations__)
+
+    def __len__(self) -> int:
+        return len(Record.__annotations__)
+
+    def to_record(self) -> Record:
+        return {
+            "id": self["id"],
+            "name": self["name"],
+            "institution": self["institution"],
+            "year": self["year"],
+            "descendants": self["descendants"],
+            "advisors": self["advisors"],
+        }
+
+
+class CompactNodes(Mapping[RecordId, CompactRecord]):
+    """The `nodes` mapping of a `CompactGraph`, keyed by record ID and
+    iterated in ID order."""
+
+    __slots__ = ("_graph",)
+
+    def __init__(self, graph: "CompactGraph") -> None:
+        self._graph = graph
+
+    def __getitem__(self, record_id: int) -> CompactRecord:
+        index = self._graph.index_of(record_id)
+        if index is None:
+            raise KeyError(record_id)
+        return CompactRecord(self._graph, index)
+
+    def __contains__(self, record_id: object) -> bool:
+        return (
+            isinstance(record_id, int) and self._graph.index_of(record_id) is not None
+        )
+
+    def __iter__(self) -> Iterator[RecordId]:
+        return map(RecordId, self._graph.ids)
+
+    def __len__(self) -> int:
+        return len(self._graph.ids)
+
+
+class CompactGraph:
+    # The columns are arrays, or memoryviews of a mapped file when the
+    # graph was loaded with `map_graph`.
+    start_nodes: IntColumn
+    ids: IntColumn
+    names: Sequence[str]
+    institutions: IntColumn
+    institution_pool: Sequence[str]
+    years: IntColumn
+    advisor_offsets: IntColumn
+    advisor_ids: IntColumn
+    descendant_offsets: IntColumn
+    descendant_ids: IntColumn
+
+    def __init__(
+        self,
+        records: Iterable[Record],
+        start_nodes: Iterable[int],
+        status: Literal["complete", "truncated"],
+    ) -> None:
+        """Store `records`, which are consumed in one pass, so that
+        they can be streamed in (see `geneagrapher.load`)."""
+        self.start_nodes = array("i", start_nodes)
+        self.status: Literal["complete", "truncated"] = status
+        ids = array("i")
+        names: List[str] = []
+        institutions = array("i")
+        years = array("i")
+        advisor_offsets, advisor_ids = array("i", [0]), array("i")
+        descendant_offsets, descendant_ids = array("i", [0]), array("i")
+
+        pool: Dict[str, int] = {}
+        for r in records:
+            ids.append(r["id"])
+            names.append(sys.intern(r["name"]))
+            institutions.append(
+                NO_INSTITUTION
+                if r["institution"] is None
+                else pool.setdefault(sys.intern(r["institution"]), len(pool))
+            )
+            years.append(NO_YEAR if r["year"] is None else r["year"])
+            advisor_ids.extend(r["advisors"])
+            advisor_offsets.append(len(advisor_ids))
+            descendant_ids.extend(r["descendants"])
+            descendant_offsets.append(len(descendant_ids))
+
+        self.ids = ids
+        self.names = names
+        self.institutions = institutions
+        self.institution_pool = list(pool)
+        self.years = years
+        self.advisor_offsets, self.advisor_ids = advisor_offsets, advisor_ids
+        self.descendant_offsets, self.descendant_ids = (
+            descendant_offsets,
+            descendant_ids,
+        )
+        if any(a > b for a, b in zip(ids, islice(ids, 1, None))):
+            self._sort()
+
+    def _sort(self) -> None:
+        """Reorder the columns by record ID."""
+        order = array("i", sorted(range(len(self.ids)), key=self.ids.__getitem__))
+        self.ids = array("i", (self.ids[i] for i in order))
+        self.names = [self.names[i] for i in order]
+        self.institutions = array("i", (self.institutions[i] for i in order))
+        self.years = array("i", (self.years[i] for i in order))
+        self.advisor_offsets, self.advisor_ids = make_csr(
+            self.advisor_ids[self.advisor_offsets[i] : self.advisor_offsets[i + 1]]
+            for i in order
+        )
+        self.descendant_offsets, self.descendant_ids = make_csr(
+            self.descendant_ids[
+                self.descendant_offsets[i] : self.descendant_offsets[i + 1]
+            ]
+            for i in order
+        )
+
+    @classmethod
+    def from_geneagraph(cls, graph: Geneagraph) -> "CompactGraph":
+        # Sorting the records up front is cheaper than reordering the
+        # columns afterward.
+        records = sorted(graph["nodes"].values(), key=lambda r: r["id"])
+        return cls(records, graph["start_nodes"], graph["status"])
+
+    @classmethod
+    def from_columns(
+        cls,
+        status: Literal["complete", "truncated"],
+        *,
+        start_nodes: IntColumn,
+        ids: IntColumn,
+        names: Sequence[str],
+        institutions: IntColumn,
+        institution_pool: Sequence[str],
+        years: IntColumn,
+        advisor_offsets: IntColumn,
+        advisor_ids: IntColumn,
+        descendant_offsets: IntColumn,
+        descendant_ids: IntColumn,
+    ) -> "CompactGraph":
+        """Return the graph stored in the given columns, which must be
+        ordered by record ID. The columns are used as they are, not
+        copied."""
+        graph = cls.__new__(cls)
+        graph.status = status
+        graph.start_nodes = start_nodes
+        graph.ids = ids
+        graph.names = names
+        graph.institutions = institutions
+        graph.institution_pool = institution_pool
+        graph.years = years
+        graph.advisor_offsets = advisor_offsets
+        graph.advisor_ids = advisor_ids
+        graph.descendant_offsets = descendant_offsets
+        graph.descendant_ids = descendant_ids
+        return graph
+
+    def to_geneagraph(self) -> Geneagraph:
+        return {
+            "start_nodes": self["start_nodes"],
+            "nodes": {
+                record_id: r.to_record() for record_id, r in self["nodes"].items()
+            },
+            "status": self.status,
+        }
+
+    def index_of(self, record_id: int) -> Optional[int]:
+        """Return the position of `record_id` in the graph's columns,
+        or `None` if the record is not in the graph."""
+        i = bisect_left(self.ids, record_id)
+        return i if i < len(self.ids) and self.ids[i] == record_id else None
+
+    @overload
+    def __getitem__(self, key: Literal["start_nodes"]) -> List[RecordId]: ...
+
+    @overload
+    def __getitem__(self, key: Literal["nodes"]) -> CompactNodes: ...
+
+    @overload
+    def __getitem__(
+        self, key: Literal["status"]
+    ) -> Literal["complete", "truncated"]: ...
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "start_nodes":
+            return [RecordId(rid) for rid in self.start_nodes]
+        elif key == "nodes":
+            return CompactNodes(self)
+        elif key == "status":
+            return self.status
+        raise KeyError(key)
+
+    def items(self) -> ItemsView[str, Any]:
+        graph: Dict[str, Any] = {
+            "start_nodes": self["start_nodes"],
+            "nodes": self["nodes"],
+            "status": self.status,
+        }
+        return graph.items()
+
+
+def make_csr(rows: Iterable[Iterable[int]]) -> Tuple["array[int]", "array[int]"]:
+    """Return the offsets and values arrays of `rows` in compressed
+    sparse row form. Row `i` is `values[offsets[i]:offsets[i + 1]]`."""
+    offsets = array("i", [0])
+    values = array("i")
+    for row in rows:
+        values.extend(row)
+        offsets.append(len(values))
+    return offsets, values
+
+
+GraphLike = Union[Geneagraph, CompactGraph]
+# Either a `Record` or a `CompactRecord`.
+RecordLike = Mapping[str, Any]
+
+
+def as_record(record: RecordLike) -> Record:
+    """Return `record` as a plain `Record` dictionary."""
+    if isinstance(record, CompactRecord):
+        return record.to_record()
+    return cast(Record, record)
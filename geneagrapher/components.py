@@ -0,0 +1,204 @@
+"""This module splits a graph into its connected components and writes
+each to its own DOT file (`ggrapher convert --split-components DIR`).
+
+Graphviz lays out a DOT file as a whole, and its layout time grows
+much faster than the size of the graph, so a combined genealogy of
+mostly disconnected families is far quicker to lay out one component
+at a time, and the components can be laid out in parallel.
+
+Components are found with a union-find over the advisor edges, the
+edges that `DotOutput` draws, in nearly linear time. Each component is
+written to `component-N.dot`, largest first, by a pool of worker
+processes. Components with fewer than `min_size` records can instead
+be written together to `small-components.dot`, so that a graph with
+many tiny components does not produce as many tiny files. The file
+`index.json` lists the files written, with the number of records and
+components in each and the start nodes that they contain.
+"""
+
+from .compact import GraphLike, as_record
+from .output.dot import DotOutput
+from .types import Geneagraph, RecordId
+
+from array import array
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Literal, Optional, Set, TypedDict
+
+INDEX_FILE = "index.json"
+SMALL_COMPONENTS_FILE = "small-components.dot"
+
+
+class DisjointSets:
+    """Disjoint sets of the integers 0 to `size - 1`. Sets are merged by
+    size and paths are halved on lookup, so that any sequence of
+    operations takes nearly linear time."""
+
+    def __init__(self, size: int) -> None:
+        self.parent = array("i", range(size))
+        self.size = array("i", [1]) * size
+
+    def find(self, i: int) -> int:
+        """Return the representative of the set containing `i`."""
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, i: int, j: int) -> None:
+        """Merge the sets containing `i` and `j`."""
+        i, j = self.find(i), self.find(j)
+        if i == j:
+            return
+        if self.size[i] < self.size[j]:
+            i, j = j, i
+        self.parent[j] = i
+        self.size[i] += self.size[j]
+
+
+def connected_components(graph: GraphLike) -> List[List[RecordId]]:
+    """Return the record IDs of each connected component of `graph`,
+    each sorted, with the largest components first (ties broken by
+    smallest record ID)."""
+    nodes = graph["nodes"]
+    ids = sorted(nodes)
+    index = {record_id: i for i, record_id in enumerate(ids)}
+    sets = DisjointSets(len(ids))
+    for i, record_id in enumerate(ids):
+        for advisor_id in nodes[record_id]["advisors"]:
+            j = index.get(RecordId(advisor_id))
+            if j is not None:
+                sets.union(i, j)
+
+    components: Dict[int, List[RecordId]] = {}
+    for i, record_id in enumerate(ids):
+        components.setdefault(sets.find(i), []).append(record_id)
+    return sorted(components.values(), key=lambda c: (-len(c), c[0]))
+
+
+@dataclass
+class Part:
+    """The records written to one DOT file."""
+
+    file: str
+    record_ids: List[RecordId]
+    components: int
+
+
+def plan_parts(components: List[List[RecordId]], min_size: int = 1) -> List[Part]:
+    """Return the files to write for `components` (as returned by
+    `connected_components`): one for each component of at least
+    `min_size` records, and one for all the smaller ones together."""
+    large = [c for c in components if len(c) >= min_size]
+    small = [c for c in components if len(c) < min_size]
+    width = len(str(len(large)))
+    parts = [
+        Part(f"component-{n:0{width}d}.dot", component, 1)
+        for n, component in enumerate(large, start=1)
+    ]
+    if small:
+        record_ids = sorted(record_id for c in small for record_id in c)
+        parts.append(Part(SMALL_COMPONENTS_FILE, record_ids, len(small)))
+    return parts
+
+
+def subgraph(
+    graph: GraphLike, record_ids: List[RecordId], start_nodes: Set[RecordId]
+) -> Geneagraph:
+    """Return the graph of the records of `graph` in `record_ids`, whose
+    start nodes are those of `record_ids` in `start_nodes`."""
+    nodes = graph["nodes"]
+    return {
+        "start_nodes": [rid for rid in record_ids if rid in start_nodes],
+        "nodes": {rid: as_record(nodes[rid]) for rid in record_ids},
+        "status": graph["status"],
+    }
+
+
+def write_dot(path: Path, graph: Geneagraph) -> None:
+    """Write `graph` as DOT to `path`. This runs in the worker
+    processes."""
+    with open(path, "w") as f:
+        DotOutput(graph).write(f)
+        f.write("\n")
+
+
+class IndexEntry(TypedDict):
+    file: str
+    records: int
+    components: int
+    start_nodes: List[RecordId]
+
+
+class Index(TypedDict):
+    status: Literal["complete", "truncated"]
+    records: int
+    components: int
+    files: List[IndexEntry]
+
+
+def write_components(
+    graph: GraphLike,
+    directory: Path,
+    *,
+    min_size: int = 1,
+    jobs: Optional[int] = None,
+) -> Index:
+    """Write each connected component of `graph` (or, for those with
+    fewer than `min_size` records, all of them together) to its own
+    DOT file in `directory`, using `jobs` worker processes (by default,
+    one per CPU), and write the index of the files. Return the index.
+
+    To bound memory use, the subgraph of each file is built only
+    shortly before a worker is free to write it."""
+    components = connected_components(graph)
+    parts = plan_parts(components, min_size)
+    start_nodes = set(graph["start_nodes"])
+    directory.mkdir(parents=True, exist_ok=True)
+    jobs = jobs or os.cpu_count() or 1
+
+    if jobs == 1 or len(parts) <= 1:
+        for part in parts:
+            write_dot(
+                directory / part.file, subgraph(graph, part.record_ids, start_nodes)
+            )
+    else:
+        with ProcessPoolExecutor(min(jobs, len(parts))) as pool:
+            pending: Set["Future[None]"] = set()
+            for part in parts:
+                if len(pending) >= 2 * jobs:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                pending.add(
+                    pool.submit(
+                        write_dot,
+                        directory / part.file,
+                        subgraph(graph, part.record_ids, start_nodes),
+                    )
+                )
+            for future in pending:
+                future.result()
+
+    index: Index = {
+        "status": graph["status"],
+        "records": len(graph["nodes"]),
+        "components": len(components),
+        "files": [
+            {
+                "file": part.file,
+                "records": len(part.record_ids),
+                "components": part.components,
+                "start_nodes": [rid for rid in part.record_ids if rid in start_nodes],
+            }
+            for part in parts
+        ],
+    }
+    with open(directory / INDEX_FILE, "w") as f:
+        json.dump(index, f, indent=4)
+        f.write("\n")
+    return index
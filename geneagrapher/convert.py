@@ -0,0 +1,140 @@
+"""This module implements the `ggrapher convert` subcommand, which
+writes a graph saved with `--format json` or `--format bin` in another
+output format without contacting the backend, or splits it into one
+DOT file per connected component (see `geneagrapher.components`).
+
+Saved JSON graphs are streamed into a `CompactGraph`, and binary
+graphs are memory-mapped (see `geneagrapher.load`), so large graphs
+convert with bounded memory.
+"""
+
+from .compact import CompactGraph
+from .geneagrapher import FORMATS, write_graph
+from .load import load_graph, map_graph
+from .output.binary import MAGIC
+
+from argparse import ArgumentParser
+import os
+from pathlib import Path
+import sys
+from typing import List
+
+
+def read_graph(path: str) -> CompactGraph:
+    """Load the graph saved at `path`, or on stdin if `path` is "-", in
+    either the JSON or the binary format. Raise `ValueError` if the
+    file holds neither."""
+    if path == "-":
+        return load_graph(sys.stdin)
+    with open(path, "rb") as f:
+        binary = f.read(len(MAGIC)) == MAGIC
+    if binary:
+        return map_graph(Path(path))
+    with open(path) as f:
+        return load_graph(f)
+
+
+def run_convert(argv: List[str]) -> int:
+    parser = ArgumentParser(
+        prog="ggrapher convert",
+        description="Write a graph saved with '--format json' or '--format bin' \
+in another format, without contacting the backend.",
+    )
+    parser.add_argument(
+        "infile",
+        metavar="GRAPH",
+        help="saved graph file, or '-' for a JSON graph on stdin",
+    )
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=FORMATS,
+        default="dot",
+        help="graph output format (default: dot)",
+    )
+    destination = parser.add_mutually_exclusive_group()
+    destination.add_argument(
+        "-o",
+        "--out",
+        dest="outfile",
+        help="write output to FILE, which may be GRAPH [default: stdout]",
+        type=Path,
+        metavar="FILE",
+    )
+    destination.add_argument(
+        "--split-components",
+        help="write each connected component of the graph to its own DOT file \
+in DIR, with an index of the files in DIR/index.json",
+        type=Path,
+        metavar="DIR",
+    )
+    parser.add_argument(
+        "--min-component-size",
+        type=int,
+        default=1,
+        help="with --split-components, write the components of fewer than N \
+records together to one file (default: %(default)s)",
+        metavar="N",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        help="with --split-components, write files in N processes (default: \
+the number of CPUs)",
+        metavar="N",
+    )
+    args = parser.parse_args(argv)
+    if args.split_components is not None and args.format != "dot":
+        parser.error("argument --split-components: requires --format dot")
+    if args.min_component_size < 1:
+        parser.error("argument --min-component-size: must be at least 1")
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("argument --jobs: must be at least 1")
+
+    try:
+        graph = read_graph(args.infile)
+    except (OSError, ValueError) as e:
+        print(f"Cannot read graph {args.infile}: {e}", file=sys.stderr)
+        return 1
+
+    if args.split_components is not None:
+        from .components import write_components
+
+        try:
+            write_components(
+                graph,
+                args.split_components,
+                min_size=args.min_component_size,
+                jobs=args.jobs,
+            )
+        except OSError as e:
+            print(
+                f"Cannot write components to {args.split_components}: {e}",
+                file=sys.stderr,
+            )
+            return 1
+        return 0
+
+    if args.outfile is None:
+        write_graph(args.format, graph, sys.stdout)
+        return 0
+    try:
+        if (
+            args.infile != "-"
+            and args.outfile.exists()
+            and args.outfile.samefile(args.infile)
+        ):
+            # A binary graph is read from its memory-mapped file while
+            # the output is written, so the file is only replaced once
+            # the output is complete.
+            partial = args.outfile.with_name(f".{args.outfile.name}.partial")
+            with open(partial, "w") as outfile:
+                write_graph(args.format, graph, outfile)
+            os.replace(partial, args.outfile)
+        else:
+            with open(args.outfile, "w") as outfile:
+                write_graph(args.format, graph, outfile)
+    except OSError as e:
+        print(f"Cannot write graph {args.outfile}: {e}", file=sys.stderr)
+        return 1
+    return 0
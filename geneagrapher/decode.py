@@ -0,0 +1,97 @@
+"""This module decodes messages received from the Geneagrapher backend.
+
+JSON object keys are strings, but the `Geneagraph` type expects the
+keys of its `nodes` object to be integers. Rather than inspecting
+every decoded object, only the `nodes` object of a graph message's
+payload is converted.
+
+The cyclic garbage collector is paused while a message is decoded.
+
+If [orjson](https://pypi.org/project/orjson/) or
+[msgspec](https://pypi.org/project/msgspec/) is installed, it is used
+to parse messages, which is substantially faster than the standard
+library's `json` module for large graphs. Neither is required.
+"""
+
+from .types import Geneagraph
+
+from contextlib import contextmanager
+from functools import lru_cache
+import gc
+import importlib
+import json
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple, Union, cast
+
+JSON_BACKENDS = ("orjson", "msgspec", "json")
+
+Loads = Callable[[Union[str, bytes]], Any]
+
+
+def load_backend(name: str) -> Loads:
+    """Return the `loads` function of JSON backend `name`. Raise
+    `ImportError` if the backend is not installed."""
+    if name == "json":
+        return json.loads
+    module = importlib.import_module(name)
+    if name == "msgspec":
+        return module.json.decode  # type: ignore[no-any-return]
+    return module.loads  # type: ignore[no-any-return]
+
+
+def find_backend(preferred: Optional[str] = None) -> Tuple[str, Loads]:
+    """Return the name and `loads` function of the fastest installed
+    JSON backend, or of `preferred` if it is given."""
+    for name in (preferred,) if preferred is not None else JSON_BACKENDS:
+        try:
+            return name, load_backend(name)
+        except ImportError:
+            continue
+    raise ImportError(f"JSON backend {preferred} is not installed")
+
+
+@lru_cache(maxsize=None)
+def default_loads() -> Loads:
+    return find_backend()[1]
+
+
+@contextmanager
+def gc_paused() -> Iterator[None]:
+    """Pause the cyclic garbage collector. Decoding a large graph
+    allocates millions of containers, none of which are part of a
+    reference cycle, and the collector's repeated passes over them
+    would otherwise take longer than the parsing itself."""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def decode_response(message: Union[str, bytes]) -> Dict[str, Any]:
+    """Decode a message from the backend, converting the keys of a
+    graph payload's `nodes` object to integers."""
+    with gc_paused():
+        response: Dict[str, Any] = default_loads()(message)
+        payload = response.get("payload")
+        if isinstance(payload, dict) and isinstance(payload.get("nodes"), dict):
+            payload["nodes"] = {int(k): v for k, v in payload["nodes"].items()}
+    return response
+
+
+def decode_graph(document: Union[str, bytes]) -> Geneagraph:
+    """Decode a graph saved with `--format json`, converting the keys
+    of its `nodes` object to integers. Raise `ValueError` if
+    `document` is not a graph."""
+    with gc_paused():
+        graph = default_loads()(document)
+        if not (
+            isinstance(graph, dict)
+            and isinstance(graph.get("start_nodes"), list)
+            and isinstance(graph.get("nodes"), dict)
+            and graph.get("status") in ("complete", "truncated")
+        ):
+            raise ValueError("not a Geneagraph JSON document")
+        graph["nodes"] = {int(k): v for k, v in graph["nodes"].items()}
+    return cast(Geneagraph, graph)
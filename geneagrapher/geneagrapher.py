@@ -1,54 +1,106 @@
-from .output.dot import DotOutput
-from .output.identity import IdentityOutput
-from .types import Geneagraph
+from .cache import DEFAULT_CACHE_TTL, RecordCache, default_cache_dir
+from .checkpoint import Checkpoint, CheckpointError
+from .compact import GraphLike
+from .decode import decode_response
+from .progress import PROGRESS_MODES, ThrottledProgress, bar_str, make_progress
+from .timings import TimedWriter, Timings, phase
+from .traverse import (
+    LocalTraversal,
+    RecordLookup,
+    canonical_start_nodes,
+    traverse_local,
+)
+from .types import Geneagraph, Record, RecordId, StartNodeRequest
 
-from argparse import ArgumentParser, FileType
-import asyncio
-from importlib.metadata import PackageNotFoundError, version
+from argparse import SUPPRESS, Action, ArgumentParser, FileType, Namespace
+from contextlib import AsyncExitStack, contextmanager
+from functools import lru_cache
 import json
-import platform
+from pathlib import Path
 import textwrap
+import time
 from typing import (
+    TYPE_CHECKING,
     Any,
+    Callable,
     Dict,
+    Iterable,
+    Iterator,
     List,
     Literal,
+    Mapping,
+    Optional,
     Protocol,
+    Sequence,
+    Set,
+    TextIO,
+    Tuple,
     Type,
     TypedDict,
     Union,
     cast,
+    get_args,
 )
 import re
 import sys
-import websockets
-import websockets.client
 
+# websockets and asyncio, the output formatters, and the package
+# metadata are imported where they are used, so that `ggrapher --help`,
+# `ggrapher --version` and the offline subcommands start quickly.
+if TYPE_CHECKING:
+    import websockets.client
+
+    from .client import GeneagrapherClient
 
 GGRAPHER_URI = "wss://ggrphr.davidalber.net"
+OutputFormat = Literal["dot", "json", "ndjson", "bin"]
+FORMATS = get_args(OutputFormat)
+# The formats that are written as text by an `OutputFormatter`.
+TextFormat = Literal["dot", "json", "ndjson"]
+TEXT_FORMATS = get_args(TextFormat)
 TEXTWRAP_WIDTH = 79
+# How many times, and after how long, a failed shard of a sharded
+# request is retried.
+SHARD_RETRIES = 2
+SHARD_RETRY_DELAY = 1.0  # seconds
+# Requests for more start nodes than this are split into several
+# requests, so that no one request or response grows without bound.
+MAX_REQUEST_START_NODES = 1000
+# The WebSocket close code sent when a received message exceeds the
+# maximum message size.
+CLOSE_MESSAGE_TOO_BIG = 1009
 
 
 class OutputFormatter(Protocol):
     """This defines an interface that output classes must implement."""
 
-    def __init__(self, graph: Geneagraph) -> None: ...
+    def __init__(self, graph: GraphLike) -> None: ...
 
     @property
     def output(self) -> str:
         """Return the graph's formatted output."""
         ...
 
+    def write(self, fp: TextIO) -> None:
+        """Write the graph's formatted output to `fp`. The output is
+        identical to `output`."""
+        ...
+
+
+class _RequestOptions(TypedDict):
+    reportingCallback: bool
 
-class StartNodeRequest(TypedDict):
-    recordId: int
-    getAdvisors: bool
-    getDescendants: bool
+
+class RequestOptions(_RequestOptions, total=False):
+    # Limits on the graph, which backends that support them apply. The
+    # client applies them as well (see `get_graph_cached`).
+    maxNodes: int
+    maxDepth: int
 
 
 class RequestPayload(TypedDict):
     kind: Literal["build-graph"]
-    options: Dict[Literal["reportingCallback"], bool]
+    options: RequestOptions
     startNodes: List[StartNodeRequest]
 
 
@@ -58,6 +110,10 @@ class ProgressCallback(TypedDict):
     done: int
 
 
+# Called with the number of queued, fetching, and done records.
+ProgressHandler = Callable[[int, int, int], None]
+
+
 class GgrapherError(Exception):
     def __init__(self, msg: str, *, extra: Dict[str, str] = {}) -> None:
         self.msg = msg
@@ -115,98 +171,728 @@ class StartNodeArg:
         }
 
 
-def make_payload(start_nodes: List[StartNodeArg], quiet: bool) -> RequestPayload:
+def make_payload(
+    start_nodes: Iterable[StartNodeRequest],
+    quiet: bool,
+    *,
+    max_nodes: Optional[int] = None,
+    max_depth: Optional[int] = None,
+) -> RequestPayload:
+    options: RequestOptions = {"reportingCallback": not quiet}
+    if max_nodes is not None:
+        options["maxNodes"] = max_nodes
+    if max_depth is not None:
+        options["maxDepth"] = max_depth
     return {
         "kind": "build-graph",
-        "options": {"reportingCallback": not quiet},
-        "startNodes": [sn.start_node for sn in start_nodes],
+        "options": options,
+        "startNodes": canonical_start_nodes(start_nodes),
     }
 
 
 def display_progress(queued: int, doing: int, done: int) -> None:
-    prefix = "Progress: "
-    size = 60
-    count = queued + doing + done
-
-    x = int(size * done / count)
-    y = int(size * doing / count)
-
-    print(
-        f"{prefix}[{u'█'*x}{u':'*y}{('.'*(size - x - y))}] {done}/{count}",
-        end="\r",
-        file=sys.stderr,
-        flush=True,
-    )
+    print(bar_str(queued, doing, done), end="\r", file=sys.stderr, flush=True)
 
 
-async def get_graph(payload: RequestPayload) -> Geneagraph:
-    def intify_record_keys(d: Dict[Any, Any]) -> Dict[Any, Any]:
-        """JSON object keys are strings, but the Geneagraph type
-        expects the keys of the nodes object to be integers. This
-        function converts those keys to ints during deserialization.
-        """
-        if "nodes" in d:
-            ret = {k: v for k, v in d.items() if k != "nodes"}
-            ret["nodes"] = {int(k): v for k, v in d["nodes"].items()}
-            return ret
+def connect(uri: str, max_size: Optional[int]) -> "websockets.client.connect":
+    """Return an awaitable async context manager that opens a WebSocket
+    connection to the backend at `uri`."""
+    import platform
+    import websockets.client
+
+    return websockets.client.connect(
+        uri,
+        user_agent_header=f"Python/{platform.python_version()} \
+Geneagrapher/{get_version()}",
+        max_size=max_size,
+    )
 
-        return d
+
+@contextmanager
+def backend_errors(max_size: Optional[int]) -> Iterator[None]:
+    """Translate WebSocket errors raised in the `with` block into
+    `GgrapherError`s."""
+    import websockets.exceptions
 
     try:
-        async with websockets.client.connect(
-            GGRAPHER_URI,
-            user_agent_header=f"Python/{platform.python_version()} \
-Geneagrapher/{get_version()}",
-        ) as ws:
-            await ws.send(json.dumps(payload))
-            while True:
-                response_json = await ws.recv()
-                response = json.loads(response_json, object_hook=intify_record_keys)
-                response_payload: Union[Geneagraph, ProgressCallback, None] = (
-                    response.get("payload")
+        yield
+    except websockets.exceptions.ConnectionClosed as e:
+        if e.sent is not None and e.sent.code == CLOSE_MESSAGE_TOO_BIG:
+            raise GgrapherError(
+                f"The response from the Geneagrapher backend is larger than the \
+maximum message size of {(max_size or 0) / 2**20:g} MiB. Use the \
+--max-message-size option to raise the limit."
+            )
+        raise GgrapherError("Geneagrapher backend is currently unavailable.")
+    except (websockets.exceptions.WebSocketException, OSError):
+        raise GgrapherError("Geneagrapher backend is currently unavailable.")
+
+
+async def request_graph(
+    ws: "websockets.client.WebSocketClientProtocol",
+    payload: RequestPayload,
+    *,
+    progress: Optional[ProgressHandler] = None,
+    timings: Optional[Timings] = None,
+) -> Geneagraph:
+    """Send `payload` over the open connection `ws` and wait for the
+    backend's graph. Progress messages are passed to `progress`."""
+    await ws.send(json.dumps(payload))
+    while True:
+        with phase(timings, "backend"):
+            response_json = await ws.recv()
+        with phase(timings, "decode"):
+            response = decode_response(response_json)
+        response_payload: Union[Geneagraph, ProgressCallback, None] = response.get(
+            "payload"
+        )
+        if timings is not None:
+            timings.received(response_json)
+
+        if response["kind"] == "graph":
+            if timings is not None:
+                timings.graph_received()
+            return cast(Geneagraph, response_payload)
+        elif response["kind"] == "progress":
+            if timings is not None:
+                timings.progress_received()
+            if progress is not None:
+                report = cast(ProgressCallback, response_payload)
+                progress(report["queued"], report["fetching"], report["done"])
+        else:
+            raise GgrapherError(
+                "Request to Geneagrapher backend failed.",
+                extra={"Response": str(response_json)},
+            )
+
+
+async def get_graph(
+    payload: RequestPayload,
+    *,
+    uri: Optional[str] = None,
+    max_size: Optional[int] = None,
+    timings: Optional[Timings] = None,
+    progress: Optional[ProgressHandler] = None,
+    client: Optional["GeneagrapherClient"] = None,
+) -> Geneagraph:
+    """Request a graph from the backend at `uri` (by default,
+    `GGRAPHER_URI`). Messages larger than `max_size` bytes are
+    rejected; by default, there is no limit. If `timings` is given,
+    the time spent connecting, waiting for, and decoding messages is
+    recorded in it. Progress is passed to `progress` (by default,
+    `display_progress`). If `client` is given, the request is sent over
+    one of its pooled connections, and `uri` and `max_size` are those
+    of the client."""
+    if client is not None:
+        return await client.request(
+            payload, progress=progress or display_progress, timings=timings
+        )
+    with backend_errors(max_size):
+        connect_started = time.perf_counter()
+        async with connect(uri or GGRAPHER_URI, max_size) as ws:
+            if timings is not None:
+                timings.add("connect", time.perf_counter() - connect_started)
+            return await request_graph(
+                ws, payload, progress=progress or display_progress, timings=timings
+            )
+
+
+def shard_start_nodes(
+    start_nodes: List[StartNodeRequest],
+    shards: int,
+    max_shard_size: Optional[int] = None,
+) -> List[List[StartNodeRequest]]:
+    """Split `start_nodes` into at most `shards` non-empty shards of
+    nearly equal size, or into more if that is needed to keep each
+    shard within `max_shard_size` start nodes."""
+    if max_shard_size is not None:
+        shards = max(shards, -(-len(start_nodes) // max_shard_size))
+    return [part for part in (start_nodes[i::shards] for i in range(shards)) if part]
+
+
+def merge_graphs(
+    start_nodes: List[StartNodeRequest], graphs: Iterable[Geneagraph]
+) -> Geneagraph:
+    """Return the graph for `start_nodes`, given the graphs for shards
+    of them. The merged graph is truncated if any of `graphs` is."""
+    nodes: Dict[RecordId, Record] = {}
+    status: Literal["complete", "truncated"] = "complete"
+    for graph in graphs:
+        nodes.update(graph["nodes"])
+        if graph["status"] == "truncated":
+            status = "truncated"
+    return {
+        "start_nodes": [RecordId(sn["recordId"]) for sn in start_nodes],
+        "nodes": nodes,
+        "status": status,
+    }
+
+
+async def get_graph_sharded(
+    payload: RequestPayload,
+    shards: int,
+    *,
+    uri: Optional[str] = None,
+    max_size: Optional[int] = None,
+    timings: Optional[Timings] = None,
+    retries: int = SHARD_RETRIES,
+    retry_delay: float = SHARD_RETRY_DELAY,
+    on_result: Optional[Callable[[Geneagraph], None]] = None,
+    progress: Optional[ProgressHandler] = None,
+    max_start_nodes: int = MAX_REQUEST_START_NODES,
+    client: Optional["GeneagrapherClient"] = None,
+) -> Geneagraph:
+    """Request the graph for `payload` from the backend as up to
+    `shards` concurrent requests, each for a shard of the start nodes
+    and each on its own connection (or, if `client` is given, on its
+    pooled connections), and merge the results. Shards have
+    at most `max_start_nodes` start nodes; if there are more shards
+    than `shards`, they are requested `shards` at a time. A shard
+    that fails is retried up to `retries` times, after waiting
+    `retry_delay` seconds (doubling with each retry). The progress of
+    all shards is passed together to `progress` (by default,
+    `display_progress`). If `on_result` is given, it is called with
+    each shard's graph as soon as that shard completes."""
+    import asyncio
+
+    parts = shard_start_nodes(payload["startNodes"], shards, max_start_nodes)
+    if len(parts) <= 1:
+        graph = await get_graph(
+            payload,
+            uri=uri,
+            max_size=max_size,
+            timings=timings,
+            progress=progress,
+            client=client,
+        )
+        if on_result is not None:
+            on_result(graph)
+        return graph
+
+    reports = [(0, 0, 0)] * len(parts)
+    report = progress or display_progress
+    slots = asyncio.Semaphore(shards)
+
+    def shard_progress(index: int) -> ProgressHandler:
+        def progress(queued: int, fetching: int, done: int) -> None:
+            reports[index] = (queued, fetching, done)
+            queued, fetching, done = (sum(counts) for counts in zip(*reports))
+            report(queued, fetching, done)
+
+        return progress
+
+    async def fetch(index: int, part: List[StartNodeRequest]) -> Geneagraph:
+        async with slots:
+            return await fetch_shard(index, part)
+
+    async def fetch_shard(index: int, part: List[StartNodeRequest]) -> Geneagraph:
+        for attempt in range(retries + 1):
+            try:
+                graph = await get_graph(
+                    {
+                        "kind": "build-graph",
+                        "options": payload["options"],
+                        "startNodes": part,
+                    },
+                    uri=uri,
+                    max_size=max_size,
+                    timings=timings,
+                    progress=shard_progress(index),
+                    client=client,
                 )
+            except GgrapherError:
+                if attempt == retries:
+                    raise
+                await asyncio.sleep(retry_delay * 2**attempt)
+                continue
+            if on_result is not None:
+                on_result(graph)
+            return graph
+        raise AssertionError("unreachable")
+
+    graphs = await asyncio.gather(*(fetch(i, part) for i, part in enumerate(parts)))
+    return merge_graphs(payload["startNodes"], graphs)
+
+
+async def get_graph_cached(
+    payload: RequestPayload,
+    cache: Optional[RecordCache],
+    *,
+    uri: Optional[str] = None,
+    max_size: Optional[int] = None,
+    timings: Optional[Timings] = None,
+    shards: int = 1,
+    checkpoint: Optional[Checkpoint] = None,
+    records: Optional[Mapping[RecordId, Record]] = None,
+    progress: Optional[ProgressHandler] = None,
+    timeout: Optional[float] = None,
+    client: Optional["GeneagrapherClient"] = None,
+) -> Geneagraph:
+    """Build the graph on the client from `records`, which are known
+    to be current, and the records in `cache` and `checkpoint`,
+    requesting from the backend only the frontier of records that they
+    lack. Records received from the backend are stored in `cache` and
+    `checkpoint` as each request completes. Without any of them, the
+    whole graph is requested from the backend. Requests are split into
+    up to `shards` concurrent requests (see `get_graph_sharded`), whose
+    progress is passed to `progress`, and are sent over the pooled
+    connections of `client`, if given.
+
+    The graph is limited by the `maxNodes` and `maxDepth` options of
+    `payload` (see `traverse_local`), and the build is stopped after
+    `timeout` seconds. A graph cut short by these limits is marked
+    `truncated`. When there are limits, or a `checkpoint`, the records
+    are requested one generation at a time, without traversal, so that
+    each request stays within the limits and each generation is saved
+    as it arrives: a build that times out or fails keeps the
+    generations that were received, even if it has only one start
+    node."""
+    max_nodes = payload["options"].get("maxNodes")
+    max_depth = payload["options"].get("maxDepth")
+    limited = max_nodes is not None or max_depth is not None or timeout is not None
+    by_generation = limited or checkpoint is not None
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    if cache is None and checkpoint is None and records is None and not limited:
+        return await get_graph_sharded(
+            payload,
+            shards,
+            uri=uri,
+            max_size=max_size,
+            timings=timings,
+            progress=progress,
+            client=client,
+        )
+
+    fetched: Dict[RecordId, Record] = {}
+    status: Literal["complete", "truncated"] = "complete"
+    if records is not None:
+        fetched.update(records)
+    if checkpoint is not None:
+        fetched.update(checkpoint.records)
+        if checkpoint.truncated:
+            status = "truncated"
+
+    def lookup(record_ids: Iterable[RecordId]) -> Dict[RecordId, Record]:
+        ids = list(record_ids)
+        found = {rid: fetched[rid] for rid in ids if rid in fetched}
+        if cache is not None:
+            found.update(cache.get_many(rid for rid in ids if rid not in fetched))
+        return found
+
+    def store(partial: Geneagraph) -> None:
+        nonlocal status
+        with phase(timings, "cache"):
+            if cache is not None:
+                cache.put_many(partial["nodes"].values())
+            if checkpoint is not None:
+                checkpoint.add(partial)
+        fetched.update(partial["nodes"])
+        if partial["status"] == "truncated":
+            status = "truncated"
+
+    if by_generation:
+        graph = await get_generations(
+            payload,
+            lookup,
+            store,
+            uri=uri,
+            max_size=max_size,
+            timings=timings,
+            shards=shards,
+            progress=progress,
+            deadline=deadline,
+            client=client,
+        )
+    else:
+        requested: Set[Tuple[int, bool, bool]] = set()
+        while True:
+            with phase(timings, "cache"):
+                graph, frontier = traverse_local(payload["startNodes"], lookup)
+
+            # Records that the backend did not return when they were
+            # requested (e.g., invalid record IDs) are left out of the
+            # graph, just as the backend does.
+            frontier = [
+                sn
+                for sn in frontier
+                if (sn["recordId"], sn["getAdvisors"], sn["getDescendants"])
+                not in requested
+            ]
+            if not frontier:
+                break
+            requested.update(
+                (sn["recordId"], sn["getAdvisors"], sn["getDescendants"])
+                for sn in frontier
+            )
+            await get_graph_sharded(
+                {
+                    "kind": "build-graph",
+                    "options": payload["options"],
+                    "startNodes": frontier,
+                },
+                shards,
+                uri=uri,
+                max_size=max_size,
+                timings=timings,
+                on_result=store,
+                progress=progress,
+                client=client,
+            )
+
+    if graph["status"] == "truncated":
+        status = "truncated"
+    graph["status"] = status
+    return graph
+
+
+async def get_generations(
+    payload: RequestPayload,
+    lookup: RecordLookup,
+    on_result: Callable[[Geneagraph], None],
+    *,
+    uri: Optional[str],
+    max_size: Optional[int],
+    timings: Optional[Timings],
+    shards: int,
+    progress: Optional[ProgressHandler],
+    deadline: Optional[float],
+    client: Optional["GeneagrapherClient"],
+) -> Geneagraph:
+    """Build the graph for `payload` from the records returned by
+    `lookup`, requesting the records that it lacks one generation at a
+    time, without traversal, and passing each response to `on_result`,
+    which must make its records available to `lookup`. The traversal
+    continues from each new generation rather than starting over (see
+    `LocalTraversal`), and the requests are sent over the pooled
+    connections of `client`, or of a client opened for the build.
+    Requesting stops at the monotonic time `deadline`, and the graph
+    is built from the records received until then and marked
+    `truncated`."""
+    import asyncio
+
+    from .client import GeneagrapherClient
+
+    traversal = LocalTraversal(
+        payload["startNodes"],
+        lookup,
+        max_depth=payload["options"].get("maxDepth"),
+        max_nodes=payload["options"].get("maxNodes"),
+    )
+    async with AsyncExitStack() as stack:
+        if client is None:
+            client = await stack.enter_async_context(
+                GeneagrapherClient(
+                    uri or GGRAPHER_URI, pool_size=shards, max_size=max_size
+                )
+            )
+        while True:
+            with phase(timings, "cache"):
+                record_ids = traversal.advance()
+            if not record_ids:
+                break
+            request = get_graph_sharded(
+                {
+                    "kind": "build-graph",
+                    "options": payload["options"],
+                    "startNodes": [
+                        {"recordId": rid, "getAdvisors": False, "getDescendants": False}
+                        for rid in record_ids
+                    ],
+                },
+                shards,
+                uri=uri,
+                max_size=max_size,
+                timings=timings,
+                on_result=on_result,
+                progress=progress,
+                client=client,
+            )
+            if deadline is None:
+                await request
+                continue
+            try:
+                await asyncio.wait_for(request, max(deadline - time.monotonic(), 0))
+            except asyncio.TimeoutError:
+                # Take in the records received in time, including those
+                # of shards that completed.
+                with phase(timings, "cache"):
+                    traversal.advance()
+                graph = traversal.graph()
+                graph["status"] = "truncated"
+                return graph
+    return traversal.graph()
 
-                if response["kind"] == "graph":
-                    return cast(Geneagraph, response_payload)
-                elif response["kind"] == "progress":
-                    progress = cast(ProgressCallback, response_payload)
-                    display_progress(
-                        progress["queued"], progress["fetching"], progress["done"]
-                    )
-                else:
-                    raise GgrapherError(
-                        "Request to Geneagrapher backend failed.",
-                        extra={"Response": str(response_json)},
-                    )
-    except websockets.exceptions.WebSocketException:
-        raise GgrapherError("Geneagrapher backend is currently unavailable.")
 
+def get_formatter(format: TextFormat, graph: GraphLike) -> OutputFormatter:
+    from .output.dot import DotOutput
+    from .output.identity import IdentityOutput
+    from .output.ndjson import NdjsonOutput
 
-def get_formatter(format: Literal["dot", "json"], graph: Geneagraph) -> OutputFormatter:
     format_map: Dict[str, Type[OutputFormatter]] = {
         "dot": DotOutput,
         "json": IdentityOutput,
+        "ndjson": NdjsonOutput,
     }
     return format_map[format](graph)
 
 
+@lru_cache(maxsize=None)
 def get_version() -> str:
+    from importlib.metadata import PackageNotFoundError, version
+
     try:
         return version("geneagrapher")
     except PackageNotFoundError:
         return "dev"
 
 
+class VersionAction(Action):
+    """Like argparse's "version" action, but the version is looked up
+    only when the option is given."""
+
+    def __init__(
+        self,
+        option_strings: Sequence[str],
+        dest: str = SUPPRESS,
+        default: Any = SUPPRESS,
+        help: str = "show program's version number and exit",
+    ) -> None:
+        super().__init__(
+            option_strings=option_strings,
+            dest=dest,
+            default=default,
+            nargs=0,
+            help=help,
+        )
+
+    def __call__(
+        self,
+        parser: ArgumentParser,
+        namespace: Namespace,
+        values: Any,
+        option_string: Optional[str] = None,
+    ) -> None:
+        print(f"{parser.prog} {get_version()}")
+        parser.exit()
+
+
+def add_progress_arguments(parser: ArgumentParser) -> None:
+    parser.add_argument(
+        "-q",
+        "--quiet",
+        action="store_true",
+        default=False,
+        help="do not report progress (same as '--progress none')",
+    )
+    parser.add_argument(
+        "--progress",
+        choices=PROGRESS_MODES,
+        default="bar",
+        help="report the backend's progress on stderr as a progress bar, which \
+is redrawn in place only on a terminal, or as JSON Lines events (default: bar)",
+    )
+
+
+def open_progress(args: Namespace) -> Optional[ThrottledProgress]:
+    return make_progress("none" if args.quiet else args.progress)
+
+
+def add_cache_arguments(parser: ArgumentParser) -> None:
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=default_cache_dir(),
+        help="store fetched records in DIR [default: %(default)s]",
+        metavar="DIR",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=DEFAULT_CACHE_TTL / (24 * 60 * 60),
+        help="treat cached records older than DAYS as missing (default: \
+%(default)g)",
+        metavar="DAYS",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        default=False,
+        help="do not read or write the record cache",
+    )
+
+
+def add_backend_arguments(parser: ArgumentParser) -> None:
+    parser.add_argument(
+        "--backend-uri",
+        default=GGRAPHER_URI,
+        help="request graphs from the backend at URI (default: %(default)s)",
+        metavar="URI",
+    )
+    parser.add_argument(
+        "--max-message-size",
+        type=float,
+        default=None,
+        help="reject backend messages larger than MIB mebibytes (default: no \
+limit)",
+        metavar="MIB",
+    )
+
+
+def add_shards_argument(parser: ArgumentParser) -> None:
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help="split each backend request into up to N concurrent requests, \
+retrying failed ones (default: %(default)s)",
+        metavar="N",
+    )
+
+
+def check_shards_argument(parser: ArgumentParser, args: Namespace) -> None:
+    if args.shards < 1:
+        parser.error("argument --shards: must be at least 1")
+
+
+def add_limit_arguments(parser: ArgumentParser) -> None:
+    parser.add_argument(
+        "--max-nodes",
+        type=int,
+        help="stop the graph at N records",
+        metavar="N",
+    )
+    parser.add_argument(
+        "--max-depth",
+        type=int,
+        help="follow advisors and descendants at most N generations from each \
+start node",
+        metavar="N",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        help="stop requesting records after SECONDS and output the graph \
+received so far",
+        metavar="SECONDS",
+    )
+
+
+def check_limit_arguments(parser: ArgumentParser, args: Namespace) -> None:
+    if args.max_nodes is not None and args.max_nodes < 1:
+        parser.error("argument --max-nodes: must be at least 1")
+    if args.max_depth is not None and args.max_depth < 0:
+        parser.error("argument --max-depth: must not be negative")
+    if args.timeout is not None and args.timeout <= 0:
+        parser.error("argument --timeout: must be positive")
+
+
+def read_ids_from(path: str) -> List[StartNodeRequest]:
+    """Return the start nodes listed in the file at `path`, or on
+    stdin if `path` is "-" (see `geneagrapher.ids`), deduplicated."""
+    from .ids import read_start_nodes
+
+    if path == "-":
+        return canonical_start_nodes(read_start_nodes(sys.stdin))
+    with open(path) as f:
+        return canonical_start_nodes(read_start_nodes(f))
+
+
+def max_message_size(args: Namespace) -> Optional[int]:
+    """Return the maximum message size, in bytes, configured by the
+    arguments added in `add_backend_arguments`."""
+    if args.max_message_size is None:
+        return None
+    return int(args.max_message_size * 2**20)
+
+
+def open_cache(args: Namespace) -> Optional[RecordCache]:
+    """Open the record cache configured by the arguments added in
+    `add_cache_arguments`. If the cache cannot be opened (e.g., its
+    directory is not writable), warn and continue without it."""
+    if args.no_cache:
+        return None
+    import sqlite3
+
+    try:
+        return RecordCache.open(args.cache_dir, ttl=args.cache_ttl * 24 * 60 * 60)
+    except (OSError, sqlite3.Error) as e:
+        print(
+            f"Warning: cannot open the record cache in {args.cache_dir} ({e}); \
+continuing without it.",
+            file=sys.stderr,
+        )
+        return None
+
+
+def write_graph(
+    format: OutputFormat,
+    graph: GraphLike,
+    outfile: TextIO,
+    *,
+    timings: Optional[Timings] = None,
+) -> None:
+    """Write `graph` to `outfile`. The binary format is written to the
+    binary buffer underlying `outfile`. If `timings` is given, the time
+    spent writing to `outfile` and the time spent generating the output
+    are recorded in it."""
+    if timings is not None:
+        written = timings.phases.get("write", 0.0)
+        started = time.perf_counter()
+
+    if format == "bin":
+        from .output.binary import BinaryOutput
+
+        outfile.flush()
+        binary = outfile.buffer
+        for chunk in BinaryOutput(graph).chunks():
+            with phase(timings, "write"):
+                binary.write(chunk)
+        with phase(timings, "write"):
+            binary.flush()
+    else:
+        if timings is not None:
+            outfile = cast(TextIO, TimedWriter(outfile, timings))
+        formatter: OutputFormatter = get_formatter(format, graph)
+        formatter.write(outfile)
+        outfile.write("\n")
+
+    if timings is not None:
+        writing = timings.phases.get("write", 0.0) - written
+        timings.add("format", time.perf_counter() - started - writing)
+
+
 def run() -> None:
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        from .batch import run_batch
+
+        sys.exit(run_batch(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        from .serve import run_serve
+
+        sys.exit(run_serve(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "refresh":
+        from .refresh import run_refresh
+
+        sys.exit(run_refresh(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "convert":
+        from .convert import run_convert
+
+        sys.exit(run_convert(sys.argv[2:]))
+
     description = 'Create a Graphviz "dot" file for a mathematics \
 genealogy, where ID is a record identifier from the Mathematics Genealogy \
 Project.'
-    parser = ArgumentParser(description=description)
+    epilog = "To build many graphs from a job file, see 'ggrapher batch --help'. \
+To update a saved JSON graph or convert it to another format, see 'ggrapher \
+refresh --help' and 'ggrapher convert --help'. To run a local caching proxy for \
+the backend, see 'ggrapher serve --help'."
+    parser = ArgumentParser(description=description, epilog=epilog)
 
     parser.add_argument(
         "-f",
         "--format",
-        choices=("dot", "json"),
+        choices=FORMATS,
         default="dot",
         help="graph output format (default: dot)",
     )
@@ -219,43 +905,140 @@ Project.'
         metavar="FILE",
         default=sys.stdout,
     )
+    add_progress_arguments(parser)
+    add_cache_arguments(parser)
+    add_backend_arguments(parser)
+    add_shards_argument(parser)
+    add_limit_arguments(parser)
     parser.add_argument(
-        "-q",
-        "--quiet",
+        "--checkpoint",
+        type=Path,
+        help="save the records of the build to FILE as they are received; the \
+file is removed once the build completes",
+        metavar="FILE",
+    )
+    parser.add_argument(
+        "--resume",
         action="store_true",
         default=False,
-        help="do not display the progress bar",
+        help="resume an interrupted build from the --checkpoint file, fetching \
+only the records that it lacks",
     )
     parser.add_argument(
-        "--version", action="version", version=f"%(prog)s {get_version()}"
+        "--timings",
+        action="store_true",
+        default=False,
+        help="report the wall-clock time spent in each phase of the run on \
+stderr; with concurrent requests (e.g., --shards), phases can overlap",
+    )
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        help="write cProfile statistics for the run to FILE",
+        metavar="FILE",
     )
+    parser.add_argument("--version", action=VersionAction)
     parser.add_argument(
         "ids",
         metavar="ID",
         type=StartNodeArg,
-        nargs="+",
+        nargs="*",
         help="mathematician record ID; valid formats are 'ID:a' for advisor \
 traversal, 'ID:d' for descendant traversal, or 'ID:ad' for advisor and descendant \
 traversal",
     )
+    parser.add_argument(
+        "--ids-from",
+        help="also read start nodes from FILE, or from stdin if FILE is '-', as \
+whitespace-separated IDs in the ID syntax or as CSV with ID and direction columns",
+        metavar="FILE",
+    )
 
     args = parser.parse_args()
-    payload = make_payload(args.ids, args.quiet)
+    start_nodes = [sn.start_node for sn in args.ids]
+    if args.ids_from is not None:
+        try:
+            start_nodes.extend(read_ids_from(args.ids_from))
+        except (OSError, ValueError) as e:
+            parser.error(f"argument --ids-from: {e}")
+    if not start_nodes:
+        parser.error("the following arguments are required: ID (or --ids-from)")
+    check_shards_argument(parser, args)
+    check_limit_arguments(parser, args)
+    if args.resume and args.checkpoint is None:
+        parser.error("argument --resume: requires --checkpoint")
+    progress = open_progress(args)
+    payload = make_payload(
+        start_nodes,
+        progress is None,
+        max_nodes=args.max_nodes,
+        max_depth=args.max_depth,
+    )
+
+    timings = Timings() if args.timings else None
+    profiler = None
+    if args.profile is not None:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    with phase(timings, "cache"):
+        cache = open_cache(args)
+    checkpoint: Optional[Checkpoint] = None
 
     async def build_graph() -> None:
-        graph = await get_graph(payload)
+        graph = await get_graph_cached(
+            payload,
+            cache,
+            uri=args.backend_uri,
+            max_size=max_message_size(args),
+            timings=timings,
+            shards=args.shards,
+            checkpoint=checkpoint,
+            progress=progress,
+            timeout=args.timeout,
+        )
+        if progress is not None:
+            progress.finish()
+        if graph["status"] == "truncated":
+            print(
+                "The graph is truncated: some of its records were left out.",
+                file=sys.stderr,
+            )
 
-        if not args.quiet:
-            # Output a line break to end the progress bar.
-            print(file=sys.stderr)
+        write_graph(args.format, graph, args.outfile, timings=timings)
+        if checkpoint is not None:
+            checkpoint.remove()
 
-        formatter: OutputFormatter = get_formatter(args.format, graph)
-        print(formatter.output, file=args.outfile)
+    import asyncio
 
     try:
+        if args.checkpoint is not None:
+            checkpoint = Checkpoint(
+                args.checkpoint, payload["startNodes"], resume=args.resume
+            )
         asyncio.run(build_graph())
+    except CheckpointError as e:
+        print(e, file=sys.stderr)
     except GgrapherError as e:
         print(e, file=sys.stderr)
+        if checkpoint is not None:
+            print(
+                f"\nThe records received so far are saved in {args.checkpoint}. Rerun \
+with --resume to continue the build.",
+                file=sys.stderr,
+            )
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+        if cache is not None:
+            cache.close()
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+        if timings is not None:
+            print(timings.report(), file=sys.stderr)
 
 
 if __name__ == "__main__":
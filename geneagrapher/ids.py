@@ -0,0 +1,79 @@
+"""This module reads start nodes from a file (the `--ids-from` option),
+for graphs with more start nodes than fit on a command line.
+
+Two formats are accepted:
+
+- Start nodes in the syntax of `ggrapher`'s arguments (e.g.,
+  `15648:ad`), separated by whitespace. Text after a `#` is a comment.
+- CSV, detected by a comma on the first line, with the record ID in
+  the first column and the traversal direction (`a`, `d`, or `ad`) in
+  an optional second column. A first row that does not start with a
+  record ID is taken to be a header and skipped.
+
+In both formats, a record ID without a direction requests its
+advisors. The file is read a line at a time, and start nodes are
+yielded as they are read; `canonical_start_nodes` deduplicates them
+and merges their directions.
+"""
+
+from .types import StartNodeRequest
+
+import csv
+from itertools import chain
+from typing import Dict, Iterator, Optional, TextIO, Tuple
+
+DIRECTIONS: Dict[str, Tuple[bool, bool]] = {
+    "": (True, False),
+    "a": (True, False),
+    "d": (False, True),
+    "ad": (True, True),
+    "da": (True, True),
+}
+
+
+def make_start_node(record_id: str, direction: str) -> Optional[StartNodeRequest]:
+    """Return the start node request for `record_id` in `direction`,
+    or `None` if either is invalid."""
+    flags = DIRECTIONS.get(direction)
+    if flags is None or not record_id.isascii() or not record_id.isdigit():
+        return None
+    return {
+        "recordId": int(record_id),
+        "getAdvisors": flags[0],
+        "getDescendants": flags[1],
+    }
+
+
+def read_start_nodes(fp: TextIO) -> Iterator[StartNodeRequest]:
+    """Generate the start nodes listed in `fp`. Raise `ValueError` at
+    the first invalid one."""
+    first = fp.readline()
+    lines = chain([first], fp)
+    if "," in first:
+        yield from read_csv(lines)
+        return
+
+    for line_number, line in enumerate(lines, start=1):
+        for token in line.partition("#")[0].split():
+            record_id, _, direction = token.partition(":")
+            start_node = make_start_node(record_id, direction)
+            if start_node is None:
+                raise ValueError(f"line {line_number}: invalid start node {token!r}")
+            yield start_node
+
+
+def read_csv(lines: Iterator[str]) -> Iterator[StartNodeRequest]:
+    reader = csv.reader(lines)
+    for row in reader:
+        if not row or not "".join(row).strip():
+            continue
+        record_id = row[0].strip()
+        direction = row[1].strip() if len(row) > 1 else ""
+        start_node = make_start_node(record_id, direction)
+        if start_node is None:
+            if reader.line_num == 1 and not record_id.isdigit():
+                continue  # The header.
+            raise ValueError(
+                f"line {reader.line_num}: invalid start node {','.join(row)!r}"
+            )
+        yield start_node
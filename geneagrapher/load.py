@@ -0,0 +1,300 @@
+"""This module loads saved graphs into a `CompactGraph` without
+decoding the whole file up front.
+
+Graphs saved with `--format json` are read a chunk at a time, and the
+records of their `nodes` object are decoded one by one and stored in
+the `CompactGraph` as they are decoded. Memory use is therefore
+bounded by the size of the `CompactGraph` plus a chunk of the file,
+rather than by the size of the file, which lets multi-gigabyte graphs
+be converted to other formats (see `ggrapher convert`).
+
+Graphs saved with `--format bin` are not decoded at all: the file is
+memory-mapped, and the columns of the `CompactGraph` are views of it.
+Records are read from the file when they are accessed, and names and
+institutions are decoded then.
+"""
+
+from .compact import CompactGraph, IntColumn
+from .decode import gc_paused
+from .output.binary import HEADER, MAGIC, STATUSES, VERSION
+from .types import Record
+
+from array import array
+import json
+import mmap
+from pathlib import Path
+import re
+import sys
+from typing import (
+    Any,
+    Iterator,
+    List,
+    Literal,
+    Match,
+    Optional,
+    Pattern,
+    Sequence,
+    TextIO,
+    Union,
+    cast,
+    overload,
+)
+
+CHUNK_SIZE = 2**20  # characters
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+# The key of a record in the `nodes` object, through the colon, and the
+# separator that follows a record.
+RECORD_KEY = re.compile(r'[ \t\n\r]*"\d+"[ \t\n\r]*:[ \t\n\r]*')
+RECORD_SEPARATOR = re.compile(r"[ \t\n\r]*([,}])")
+
+
+class GraphReader:
+    def __init__(self, fp: TextIO, *, chunk_size: int = CHUNK_SIZE) -> None:
+        """Read the graph saved in `fp`, `chunk_size` characters at a
+        time. The graph's start nodes and status are available once
+        `records` has been exhausted."""
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.start_nodes: Optional[List[int]] = None
+        self.status: Optional[Literal["complete", "truncated"]] = None
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def records(self) -> Iterator[Record]:
+        """Generate the records of the graph. Raise `ValueError` if the
+        file is not a graph."""
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+        else:
+            while True:
+                key = self._value()
+                self._expect(":")
+                if key == "nodes":
+                    yield from self._nodes()
+                elif key == "start_nodes":
+                    self.start_nodes = self._value()
+                elif key == "status":
+                    self.status = self._value()
+                else:
+                    self._value()
+                if self._expect(",}") == "}":
+                    break
+
+        if self._peek():
+            raise ValueError("unexpected data after the graph")
+        if not isinstance(self.start_nodes, list) or self.status not in (
+            "complete",
+            "truncated",
+        ):
+            raise ValueError("not a Geneagraph JSON document")
+
+    def _nodes(self) -> Iterator[Record]:
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            # The key is the record ID, which the record repeats.
+            if self._match(RECORD_KEY) is None:
+                raise ValueError("expected a record ID")
+            record = self._decode()
+            if not isinstance(record, dict):
+                raise ValueError("records must be JSON objects")
+            yield cast(Record, record)
+            separator = self._match(RECORD_SEPARATOR)
+            if separator is None:
+                raise ValueError("expected ',' or '}' after a record")
+            if separator.group(1) == "}":
+                return
+
+    def _fill(self) -> bool:
+        """Read another chunk, discarding the data that has been
+        consumed. Return whether there was more to read."""
+        chunk = self.fp.read(self.chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos :] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """Skip whitespace and return the next character, or "" at the
+        end of the file."""
+        while True:
+            match = WHITESPACE.match(self._buffer, self._pos)
+            assert match is not None
+            self._pos = match.end()
+            if self._pos < len(self._buffer) or not self._fill():
+                return self._buffer[self._pos : self._pos + 1]
+
+    def _match(self, pattern: Pattern[str]) -> Optional[Match[str]]:
+        """Consume a match of `pattern`, reading more of the file if the
+        match might continue past the data read so far. Return `None`
+        if there is no match."""
+        while True:
+            match = pattern.match(self._buffer, self._pos)
+            if match is not None and match.end() < len(self._buffer):
+                break
+            if not self._fill():
+                break
+        if match is not None:
+            self._pos = match.end()
+        return match
+
+    def _expect(self, chars: str) -> str:
+        c = self._peek()
+        if not c or c not in chars:
+            raise ValueError(f"expected one of {chars!r}, found {c!r}")
+        self._pos += 1
+        return c
+
+    def _value(self) -> Any:
+        self._peek()
+        return self._decode()
+
+    def _decode(self) -> Any:
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError as e:
+                # The value may continue in the next chunk.
+                if self._fill():
+                    continue
+                raise ValueError(e.msg) from e
+            # So may a number that ends the chunk.
+            if end == len(self._buffer) and not self._eof and self._fill():
+                continue
+            self._pos = end
+            return value
+
+
+def load_graph(fp: TextIO, *, chunk_size: int = CHUNK_SIZE) -> CompactGraph:
+    """Load the graph saved in `fp`. Raise `ValueError` if it is not a
+    graph."""
+    reader = GraphReader(fp, chunk_size=chunk_size)
+    with gc_paused():
+        try:
+            graph = CompactGraph(reader.records(), [], "complete")
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"malformed record ({e})") from e
+    assert reader.start_nodes is not None and reader.status is not None
+    graph.start_nodes = array("i", reader.start_nodes)
+    graph.status = reader.status
+    return graph
+
+
+class StringTable(Sequence[str]):
+    """The strings stored in `data` between consecutive `offsets`,
+    decoded as they are accessed."""
+
+    def __init__(self, data: memoryview, offsets: IntColumn) -> None:
+        self.data = data
+        self.offsets = offsets
+
+    @overload
+    def __getitem__(self, index: int) -> str: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[str]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return str(self.data[self.offsets[index] : self.offsets[index + 1]], "utf-8")
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+
+def int_column(data: memoryview) -> IntColumn:
+    """Return the little-endian int32s in `data`. They are viewed in
+    place, except on big-endian systems, where they are copied."""
+    if sys.byteorder == "little":
+        return data.cast("i")
+    column = array("i", data.tobytes())
+    column.byteswap()
+    return column
+
+
+def map_graph(path: Path) -> CompactGraph:
+    """Memory-map the graph saved with `--format bin` at `path`. Raise
+    `ValueError` if the file is not such a graph."""
+    with open(path, "rb") as f:
+        try:
+            data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        except ValueError:
+            raise ValueError("not a binary graph (the file is empty)")
+
+    if len(data) < HEADER.size or bytes(data[: len(MAGIC)]) != MAGIC:
+        raise ValueError("not a binary graph")
+    (
+        _,
+        version,
+        status,
+        num_start_nodes,
+        num_records,
+        num_institutions,
+        num_advisors,
+        num_descendants,
+        strings_size,
+    ) = HEADER.unpack_from(data)
+    if version != VERSION:
+        raise ValueError(f"unsupported binary graph version {version}")
+    if status >= len(STATUSES):
+        raise ValueError(f"invalid status {status}")
+
+    lengths = [
+        num_start_nodes,
+        num_records,
+        num_records,
+        num_records,
+        num_records + 1,
+        num_advisors,
+        num_records + 1,
+        num_descendants,
+        num_records + 1,
+        num_institutions + 1,
+    ]
+    if len(data) != HEADER.size + 4 * sum(lengths) + strings_size:
+        raise ValueError("the binary graph is truncated or corrupt")
+
+    columns: List[IntColumn] = []
+    pos = HEADER.size
+    for length in lengths:
+        columns.append(int_column(data[pos : pos + 4 * length]))
+        pos += 4 * length
+    (
+        start_nodes,
+        ids,
+        years,
+        institutions,
+        advisor_offsets,
+        advisor_ids,
+        descendant_offsets,
+        descendant_ids,
+        name_offsets,
+        institution_offsets,
+    ) = columns
+    strings = data[pos:]
+
+    return CompactGraph.from_columns(
+        STATUSES[status],
+        start_nodes=start_nodes,
+        ids=ids,
+        names=StringTable(strings, name_offsets),
+        institutions=institutions,
+        institution_pool=StringTable(strings, institution_offsets),
+        years=years,
+        advisor_offsets=advisor_offsets,
+        advisor_ids=advisor_ids,
+        descendant_offsets=descendant_offsets,
+        descendant_ids=descendant_ids,
+    )
@@ -0,0 +1,128 @@
+"""This module implements `BinaryOutput`, a class that outputs a
+Geneagraph in a binary format that can be loaded without being parsed
+(see `geneagrapher.load.map_graph`).
+
+The format stores the columns of a `CompactGraph` one after another.
+All integers are little-endian, and all columns are int32 arrays:
+
+    header               HEADER: MAGIC, VERSION, the status, and the
+                         number of start nodes, records, institutions,
+                         advisor IDs, and descendant IDs and the size
+                         of the string pool
+    start_nodes          [start nodes]
+    ids                  [records], in ascending order
+    years                [records], NO_YEAR if unknown
+    institutions         [records], the index of the record's
+                         institution, or NO_INSTITUTION
+    advisor_offsets      [records + 1]
+    advisor_ids          [advisor IDs]
+    descendant_offsets   [records + 1]
+    descendant_ids       [descendant IDs]
+    name_offsets         [records + 1]
+    institution_offsets  [institutions + 1]
+    strings              the string pool: the UTF-8 encoded names, then
+                         the institutions
+
+The fixed-width columns are indexed by a record's position, which is
+found by binary search in `ids`. Variable-length data is reached
+through offsets: record `i`'s advisors are
+`advisor_ids[advisor_offsets[i]:advisor_offsets[i + 1]]`, and its name
+is `strings[name_offsets[i]:name_offsets[i + 1]]`. Each institution is
+stored once.
+"""
+
+from ..compact import CompactGraph, GraphLike, IntColumn
+
+from array import array
+from itertools import islice
+import struct
+import sys
+from typing import BinaryIO, Iterable, Iterator, List, Literal, Sequence, Tuple
+
+MAGIC = b"GGRAPHB\0"
+VERSION = 1
+HEADER = struct.Struct("<8sII6Q")
+STATUSES: Tuple[Literal["complete", "truncated"], ...] = ("complete", "truncated")
+CHUNK_STRINGS = 4096
+
+
+def column_bytes(column: IntColumn) -> bytes:
+    """Return `column` as little-endian int32s."""
+    if isinstance(column, memoryview) or sys.byteorder == "little":
+        # Columns of mapped graphs are only used as they are on
+        # little-endian systems.
+        return column.tobytes()
+    swapped = array("i", column)
+    swapped.byteswap()
+    return swapped.tobytes()
+
+
+def offsets_of(strings: Iterable[bytes]) -> "array[int]":
+    offsets = array("i", [0])
+    for s in strings:
+        offsets.append(offsets[-1] + len(s))
+    return offsets
+
+
+def pool_chunks(strings: Sequence[bytes]) -> Iterator[bytes]:
+    it = iter(strings)
+    while True:
+        chunk = b"".join(islice(it, CHUNK_STRINGS))
+        if not chunk:
+            return
+        yield chunk
+
+
+class BinaryOutput:
+    def __init__(self, graph: GraphLike) -> None:
+        self.graph = graph
+
+    def chunks(self) -> Iterator[bytes]:
+        """Generate the graph's binary encoding in pieces."""
+        graph = self.graph
+        g = (
+            graph
+            if isinstance(graph, CompactGraph)
+            else CompactGraph.from_geneagraph(graph)
+        )
+        names: List[bytes] = [name.encode() for name in g.names]
+        institutions: List[bytes] = [inst.encode() for inst in g.institution_pool]
+        name_offsets = offsets_of(names)
+        institution_offsets = array(
+            "i", (name_offsets[-1] + offset for offset in offsets_of(institutions))
+        )
+
+        yield HEADER.pack(
+            MAGIC,
+            VERSION,
+            STATUSES.index(g.status),
+            len(g.start_nodes),
+            len(g.ids),
+            len(institutions),
+            len(g.advisor_ids),
+            len(g.descendant_ids),
+            institution_offsets[-1],
+        )
+        for column in (
+            g.start_nodes,
+            g.ids,
+            g.years,
+            g.institutions,
+            g.advisor_offsets,
+            g.advisor_ids,
+            g.descendant_offsets,
+            g.descendant_ids,
+            name_offsets,
+            institution_offsets,
+        ):
+            yield column_bytes(column)
+        yield from pool_chunks(names)
+        yield from pool_chunks(institutions)
+
+    def write(self, fp: BinaryIO) -> None:
+        for chunk in self.chunks():
+            fp.write(chunk)
+
+    @property
+    def output(self) -> bytes:
+        return b"".join(self.chunks())
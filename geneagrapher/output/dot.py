@@ -7,60 +7,105 @@ used. It was decided to not take on a dependency since the DOT files
 being generated in this project are very simple.
 """
 
+from ..compact import GraphLike, RecordLike
 from ..types import Geneagraph, Record
 
-from typing import Generator
+from itertools import islice
+from operator import itemgetter
+from typing import Container, Iterable, Iterator, TextIO, Tuple
+
+HEADER = """digraph {
+    graph [ordering="out"];
+    node [shape=plaintext];
+    edge [style=bold];
+
+    """
+FOOTER = "\n}"
+SEPARATOR = "\n    "
+CHUNK_LINES = 4096
 
 
-def make_node_str(record: Record) -> str:
-    label = record["name"]
+def make_node_str(record: RecordLike) -> str:
+    name = record["name"]
     institution = record["institution"]
     year = record["year"]
-    if institution is not None or year is not None:
-        inst_comp = [institution] if institution is not None else []
-        year_comp = [f"({year})"] if year is not None else []
-        label += "\\n" + " ".join(inst_comp + year_comp)
+    if institution is not None and year is not None:
+        label = f"{name}\\n{institution} ({year})"
+    elif institution is not None:
+        label = f"{name}\\n{institution}"
+    elif year is not None:
+        label = f"{name}\\n({year})"
+    else:
+        label = name
 
     return f'{record["id"]} [label="{label}"];'
 
 
-def make_edge_str(record: Record, graph: Geneagraph) -> Generator[str, None, None]:
-    for advisor_id in filter(
-        lambda aid: aid in graph["nodes"],
-        set(
-            record["advisors"]
-        ),  # make `set` to eliminate the occasional duplicate advisor (e.g., at this
-        # time, 125886)
-    ):  # filter out advisors that are not part of the graph
-        yield f'{advisor_id} -> {record["id"]};'
+def make_edge_strs(
+    records: Iterable[RecordLike], node_ids: Container[int]
+) -> Iterator[str]:
+    """Generate the edges from each record's advisors to the record, in
+    the order of `records`. Advisors that are not in `node_ids` are
+    skipped."""
+    return (
+        f"{advisor_id} -> {record_id};"
+        for record_id, advisors in ((r["id"], r["advisors"]) for r in records)
+        # make `set` to eliminate the occasional duplicate advisor (e.g., at
+        # this time, 125886)
+        for advisor_id in set(advisors)
+        if advisor_id in node_ids  # filter out advisors that are not in the graph
+    )
+
+
+def make_edge_str(record: Record, graph: Geneagraph) -> Iterator[str]:
+    return make_edge_strs((record,), graph["nodes"])
+
+
+def join_lines(lines: Iterable[str], size: int = CHUNK_LINES) -> Iterator[str]:
+    """Join `lines` with the DOT file's statement separator, yielding
+    the result in chunks of at most `size` lines."""
+    it = iter(lines)
+    batch = SEPARATOR.join(islice(it, size))
+    while batch:
+        yield batch
+        batch = SEPARATOR.join(islice(it, size))
+        if batch:
+            yield SEPARATOR
+
+
+def edge_sort_key(record: RecordLike) -> Tuple[int, str]:
+    return (record["year"] or -10000, record["name"])
 
 
 class DotOutput:
-    def __init__(self, graph: Geneagraph) -> None:
+    def __init__(self, graph: GraphLike) -> None:
         self.graph = graph
 
+    def chunks(self) -> Iterator[str]:
+        """Generate the graph's DOT output in pieces, without
+        materializing the whole document.
+
+        Node statements are ordered by record ID and edge statements
+        by the `edge_sort_key` of their records, so the records are
+        sorted once for each section. Each section is then produced by
+        a single generator over its sorted records. Building a
+        deduplicated adjacency up front was measured to be slower: it
+        adds a pass over the records, and the per-record work remains."""
+        nodes = self.graph["nodes"]
+        yield HEADER
+        yield from join_lines(
+            map(make_node_str, sorted(nodes.values(), key=itemgetter("id")))
+        )
+        yield "\n" + SEPARATOR
+        yield from join_lines(
+            make_edge_strs(sorted(nodes.values(), key=edge_sort_key), nodes)
+        )
+        yield FOOTER
+
+    def write(self, fp: TextIO) -> None:
+        """Write the graph's DOT output to `fp`."""
+        fp.writelines(self.chunks())
+
     @property
     def output(self) -> str:
-        template = """digraph {{
-    graph [ordering="out"];
-    node [shape=plaintext];
-    edge [style=bold];
-
-    {nodes}
-
-    {edges}
-}}"""
-        nodes = [
-            make_node_str(record)
-            for record in sorted(self.graph["nodes"].values(), key=lambda r: r["id"])
-        ]
-        edges = [
-            edge_str
-            for record in sorted(
-                self.graph["nodes"].values(),
-                key=lambda r: (r["year"] or -10000, r["name"]),
-            )
-            for edge_str in make_edge_str(record, self.graph)
-        ]
-        prefix = "\n    "
-        return template.format(nodes=prefix.join(nodes), edges=prefix.join(edges))
+        return "".join(self.chunks())
@@ -1,17 +1,54 @@
 """This module implements `IdentityOutput`, a class that outputs a
 Geneagraph JSON structure. This is simply the structure that is
 returned by the Geneagrapher backend.
+
+The JSON document is encoded incrementally, a batch of records at a
+time, so that it can be written to a file without holding the whole
+encoded document in memory. The result is identical to `json.dumps`
+of the graph.
 """
 
-from ..types import Geneagraph
+from ..compact import GraphLike, as_record
 
+from itertools import islice
 import json
+from typing import Iterator, TextIO
+
+CHUNK_RECORDS = 1024
 
 
 class IdentityOutput:
-    def __init__(self, graph: Geneagraph) -> None:
+    def __init__(self, graph: GraphLike) -> None:
         self.graph = graph
 
+    def chunks(self) -> Iterator[str]:
+        """Generate the graph's JSON encoding in pieces."""
+        encode = json.JSONEncoder().encode
+        yield "{"
+        for i, (key, value) in enumerate(self.graph.items()):
+            yield f"{', ' if i else ''}{encode(key)}: "
+            if key != "nodes":
+                yield encode(value)
+                continue
+
+            yield "{"
+            items = iter(self.graph["nodes"].items())
+            sep = ""
+            while True:
+                batch = ", ".join(
+                    f"{encode(str(record_id))}: {encode(as_record(record))}"
+                    for record_id, record in islice(items, CHUNK_RECORDS)
+                )
+                if not batch:
+                    break
+                yield sep + batch
+                sep = ", "
+            yield "}"
+        yield "}"
+
+    def write(self, fp: TextIO) -> None:
+        fp.writelines(self.chunks())
+
     @property
     def output(self) -> str:
-        return json.dumps(self.graph)
+        return "".join(self.chunks())
@@ -0,0 +1,30 @@
+"""This module implements `NdjsonOutput`, a class that outputs the
+records of a Geneagraph as newline-delimited JSON: one `Record` object
+per line. Consumers can process the records one at a time without
+loading the whole graph.
+"""
+
+from ..compact import GraphLike, as_record
+
+import json
+from typing import Iterator, TextIO
+
+
+class NdjsonOutput:
+    def __init__(self, graph: GraphLike) -> None:
+        self.graph = graph
+
+    def chunks(self) -> Iterator[str]:
+        """Generate one line per record. The final line is not
+        newline-terminated, matching the other formatters' output."""
+        encode = json.JSONEncoder().encode
+        for i, record in enumerate(self.graph["nodes"].values()):
+            line = encode(as_record(record))
+            yield f"\n{line}" if i else line
+
+    def write(self, fp: TextIO) -> None:
+        fp.writelines(self.chunks())
+
+    @property
+    def output(self) -> str:
+        return "".join(self.chunks())
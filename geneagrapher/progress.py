@@ -0,0 +1,184 @@
+"""This module implements the progress reporters of `ggrapher` (the
+`--progress` option).
+
+The backend may send many progress messages a second for a large
+graph, so reporters rate-limit their output: a report is rendered only
+if enough time has passed since the previous one, and otherwise kept
+until the next report or until the reporter is finished.
+
+- `ProgressBar` redraws a progress bar in place if its stream is a
+  terminal. Otherwise (e.g., if stderr is redirected to a log file),
+  it writes a plain line, much less often.
+- `JsonlProgress` writes one JSON object per line, for monitoring
+  builds from other programs. Each `progress` event holds the Unix
+  time, the seconds elapsed, the backend's record counts, and the rate
+  at which records were done since the previous event. A final
+  `finish` event holds the totals of the build.
+"""
+
+from abc import ABC, abstractmethod
+import json
+import sys
+import time
+from typing import Callable, Literal, Optional, TextIO, Tuple, get_args
+
+ProgressMode = Literal["bar", "jsonl", "none"]
+PROGRESS_MODES = get_args(ProgressMode)
+BAR_WIDTH = 60
+TTY_INTERVAL = 0.1  # seconds
+LOG_INTERVAL = 10.0  # seconds
+JSONL_INTERVAL = 1.0  # seconds
+
+
+def bar_str(queued: int, doing: int, done: int) -> str:
+    count = queued + doing + done
+    x = BAR_WIDTH * done // count if count else 0
+    y = BAR_WIDTH * doing // count if count else 0
+    return f"Progress: [{'█' * x}{':' * y}{'.' * (BAR_WIDTH - x - y)}] {done}/{count}"
+
+
+class ThrottledProgress(ABC):
+    """A progress handler (see `ProgressHandler`) that renders reports
+    at most once every `interval` seconds."""
+
+    def __init__(
+        self,
+        stream: TextIO,
+        interval: float,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.stream = stream
+        self.interval = interval
+        self.clock = clock
+        self.started = clock()
+        self.counts: Tuple[int, int, int] = (0, 0, 0)
+        self._rendered_at: Optional[float] = None
+        self._pending = False
+
+    def __call__(self, queued: int, doing: int, done: int) -> None:
+        self.counts = (queued, doing, done)
+        now = self.clock()
+        if self._rendered_at is None or now - self._rendered_at >= self.interval:
+            self._render_at(now)
+        else:
+            self._pending = True
+
+    def finish(self) -> None:
+        """Render the last report, if it has not been rendered, and end
+        the output."""
+        now = self.clock()
+        if self._pending:
+            self._render_at(now)
+        self.end(now)
+
+    def _render_at(self, now: float) -> None:
+        self.render(now)
+        self._rendered_at = now
+        self._pending = False
+
+    @abstractmethod
+    def render(self, now: float) -> None:
+        """Render the current report (`counts`)."""
+
+    def end(self, now: float) -> None:
+        pass
+
+
+class ProgressBar(ThrottledProgress):
+    def __init__(
+        self,
+        stream: TextIO,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.tty = stream.isatty()
+        super().__init__(
+            stream, TTY_INTERVAL if self.tty else LOG_INTERVAL, clock=clock
+        )
+        self._drawn = False
+
+    def render(self, now: float) -> None:
+        if self.tty:
+            self.stream.write(bar_str(*self.counts) + "\r")
+        else:
+            queued, doing, done = self.counts
+            self.stream.write(f"Progress: {done}/{queued + doing + done}\n")
+        self.stream.flush()
+        self._drawn = True
+
+    def end(self, now: float) -> None:
+        if self.tty and self._drawn:
+            # Move past the progress bar.
+            self.stream.write("\n")
+            self.stream.flush()
+
+
+class JsonlProgress(ThrottledProgress):
+    def __init__(
+        self,
+        stream: TextIO,
+        *,
+        interval: float = JSONL_INTERVAL,
+        clock: Callable[[], float] = time.monotonic,
+        wall_clock: Callable[[], float] = time.time,
+    ) -> None:
+        super().__init__(stream, interval, clock=clock)
+        self.wall_clock = wall_clock
+        self.records = 0
+        self._done = 0
+        self._last_time = self.started
+        self._last_records = 0
+
+    def __call__(self, queued: int, doing: int, done: int) -> None:
+        # Each backend request counts its records from zero, so a drop
+        # in `done` starts a new request. Every report is counted, not
+        # only those that are rendered, so that no request is missed.
+        self.records += done - self._done if done >= self._done else done
+        self._done = done
+        super().__call__(queued, doing, done)
+
+    def _event(self, event: str, now: float, **fields: object) -> None:
+        line = {
+            "event": event,
+            "time": round(self.wall_clock(), 3),
+            "elapsed": round(now - self.started, 3),
+            **fields,
+        }
+        self.stream.write(json.dumps(line) + "\n")
+        self.stream.flush()
+
+    def render(self, now: float) -> None:
+        queued, doing, done = self.counts
+        new = self.records - self._last_records
+        seconds = now - self._last_time
+        self._event(
+            "progress",
+            now,
+            queued=queued,
+            fetching=doing,
+            done=done,
+            total=queued + doing + done,
+            rate=round(new / seconds, 1) if seconds > 0 else None,
+        )
+        self._last_time = now
+        self._last_records = self.records
+
+    def end(self, now: float) -> None:
+        seconds = now - self.started
+        self._event(
+            "finish",
+            now,
+            records=self.records,
+            rate=round(self.records / seconds, 1) if seconds > 0 else None,
+        )
+
+
+def make_progress(mode: ProgressMode) -> Optional[ThrottledProgress]:
+    """Return the progress reporter for `mode`, writing to stderr, or
+    `None` if progress is not reported."""
+    if mode == "bar":
+        return ProgressBar(sys.stderr)
+    if mode == "jsonl":
+        return JsonlProgress(sys.stderr)
+    return None
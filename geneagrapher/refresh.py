@@ -0,0 +1,392 @@
+"""This module implements the `ggrapher refresh` subcommand, which
+brings a graph saved with `--format json` up to date.
+
+Rather than requesting the whole graph again, a refresh requests only
+the records that are stale, each on its own (without traversing from
+it). A record's age is the time since it was stored in the record
+cache, if the cache holds a copy at least as new as the saved graph,
+and otherwise the age of the saved graph file. The graph is then
+traversed again on the client from the current records: advisors and
+descendants that were added since the graph was saved form the
+frontier, which is requested from the backend as usual (see
+`get_graph_cached`), and records that are no longer connected to the
+start nodes are left out. The cost of a refresh therefore depends on
+how many records are stale and on how much the genealogy changed, not
+on the size of the graph.
+
+The traversal directions of the start nodes are not saved with the
+graph, so they are inferred from it unless they are given on the
+command line. A graph whose directions are ambiguous is not refreshed
+until they are given.
+"""
+
+from .cache import DEFAULT_CACHE_TTL, RecordCache
+from .decode import decode_graph
+from .geneagrapher import (
+    FORMATS,
+    GgrapherError,
+    ProgressHandler,
+    RequestPayload,
+    StartNodeArg,
+    add_backend_arguments,
+    add_cache_arguments,
+    add_progress_arguments,
+    add_shards_argument,
+    check_shards_argument,
+    get_graph_cached,
+    get_graph_sharded,
+    max_message_size,
+    open_cache,
+    open_progress,
+    write_graph,
+)
+from .traverse import canonical_start_nodes
+from .types import Geneagraph, Record, RecordId, StartNodeRequest
+
+from argparse import ArgumentParser
+import asyncio
+import os
+from pathlib import Path
+import sys
+import time
+from typing import Dict, Iterable, List, Literal, Optional, Set, Tuple
+
+DEFAULT_MAX_AGE = DEFAULT_CACHE_TTL  # seconds
+Neighbors = Literal["advisors", "descendants"]
+NEIGHBORS: Tuple[Neighbors, Neighbors] = ("advisors", "descendants")
+
+
+def infer_start_nodes(graph: Geneagraph) -> List[StartNodeRequest]:
+    """Return the start node requests that `graph` was built from.
+
+    Advisors and descendants are traversed separately, so each
+    direction is inferred on its own. A start node's advisors were
+    requested if the graph holds ancestors of it that only its
+    advisors account for. For example, in a graph built from `1:a 2:a`,
+    where 1 advised 2, 2 is among 1's descendants, but 2 is a start
+    node, so 1 is inferred to be `1:a`. Descendants are inferred
+    likewise. In a complete graph, a direction whose traversal would
+    have needed records that are not in the graph was not requested. A
+    start node with neither direction is assumed to have requested its
+    advisors, as `ggrapher` does by default, unless only its
+    descendants are possible.
+
+    Raise `ValueError` if the graph could have been built from
+    different start node requests, i.e., if some records could have
+    been reached from any of several start nodes and from no other."""
+    nodes = graph["nodes"]
+    complete = graph["status"] == "complete"
+    start_ids = list(graph["start_nodes"])
+    starts = set(start_ids)
+
+    def closure(
+        record_ids: Iterable[RecordId], edges: Dict[RecordId, List[RecordId]]
+    ) -> Set[RecordId]:
+        reached: Set[RecordId] = set()
+        stack = list(record_ids)
+        while stack:
+            for neighbor in edges.get(stack.pop(), []):
+                if neighbor not in reached:
+                    reached.add(neighbor)
+                    stack.append(neighbor)
+        return reached
+
+    # For each direction, the start nodes whose traversals are
+    # candidates, and, for each record reached by them, the start node
+    # that reaches it, or None if several do. A start node that is
+    # reached by another's traversal in the same direction adds nothing
+    # to it, so it is not a candidate, and neither is one whose
+    # traversal reaches no records besides start nodes.
+    possible: Dict[RecordId, Set[Neighbors]] = {rid: set() for rid in start_ids}
+    candidates: Set[Tuple[RecordId, Neighbors]] = set()
+    edges: Dict[Neighbors, Dict[RecordId, List[RecordId]]] = {}
+    sources: Dict[Neighbors, Dict[RecordId, Optional[RecordId]]] = {}
+    for direction in NEIGHBORS:
+        forward: Dict[RecordId, List[RecordId]] = {}
+        reverse: Dict[RecordId, List[RecordId]] = {}
+        incomplete: Set[RecordId] = set()
+        for record_id, record in nodes.items():
+            for neighbor in map(RecordId, record[direction]):
+                if neighbor in nodes:
+                    forward.setdefault(record_id, []).append(neighbor)
+                    reverse.setdefault(neighbor, []).append(record_id)
+                elif complete:
+                    incomplete.add(record_id)
+        impossible = incomplete | closure(incomplete, reverse)
+        productive = closure((rid for rid in reverse if rid not in starts), reverse)
+
+        traversed = [rid for rid in start_ids if rid not in impossible]
+        for record_id in traversed:
+            possible[record_id].add(direction)
+        reachable = closure(traversed, forward)
+        tops = [rid for rid in traversed if rid not in reachable and rid in productive]
+        candidates.update((rid, direction) for rid in tops)
+
+        source: Dict[RecordId, Optional[RecordId]] = {}
+        stack: List[Tuple[RecordId, Optional[RecordId]]] = [
+            (neighbor, top) for top in tops for neighbor in forward.get(top, [])
+        ]
+        while stack:
+            record_id, top = stack.pop()
+            if record_id in source and source[record_id] in (top, None):
+                continue
+            source[record_id] = top if record_id not in source else None
+            stack.extend(
+                (neighbor, source[record_id]) for neighbor in forward.get(record_id, [])
+            )
+        edges[direction] = forward
+        sources[direction] = source
+
+    def default(record_id: RecordId) -> Neighbors:
+        return "descendants" if possible[record_id] == {"descendants"} else "advisors"
+
+    # A candidate is inferred if it alone reaches some record, or if it
+    # is its start node's only candidate and default direction, which
+    # is inferred in any case. The rest are left out.
+    inferred: Dict[RecordId, Set[Neighbors]] = {rid: set() for rid in start_ids}
+    for record_id in nodes.keys() - starts:
+        reached_from = [
+            (sources[d][record_id], d) for d in NEIGHBORS if record_id in sources[d]
+        ]
+        if len(reached_from) == 1:
+            top, direction = reached_from[0]
+            if top is not None:
+                inferred[top].add(direction)
+    for record_id, direction in candidates:
+        others = {(record_id, d) for d in NEIGHBORS if d != direction}
+        if direction == default(record_id) and not others & candidates:
+            inferred[record_id].add(direction)
+
+    # Records that only the left out candidates reach could have been
+    # reached from any of them.
+    covered = set(starts)
+    for direction in NEIGHBORS:
+        covered |= closure(
+            (rid for rid in start_ids if direction in inferred[rid]), edges[direction]
+        )
+    for direction in NEIGHBORS:
+        ambiguous = sources[direction].keys() - covered
+        if ambiguous:
+            raise ValueError(
+                f"record {min(ambiguous)} could have been reached from several \
+start nodes"
+            )
+
+    start_nodes: List[StartNodeRequest] = []
+    for record_id in start_ids:
+        directions = inferred[record_id] or {default(record_id)}
+        start_nodes.append(
+            {
+                "recordId": record_id,
+                "getAdvisors": "advisors" in directions,
+                "getDescendants": "descendants" in directions,
+            }
+        )
+    return canonical_start_nodes(start_nodes)
+
+
+def split_stale(
+    graph: Geneagraph,
+    saved_at: float,
+    max_age: float,
+    cache: Optional[RecordCache],
+    now: float,
+) -> Tuple[Dict[RecordId, Record], List[RecordId], float]:
+    """Split the records of `graph`, which was saved at `saved_at`,
+    into those at most `max_age` seconds old at `now`, using the newest
+    copies available, and the IDs of the rest. Also return when the
+    oldest of the current records was fetched."""
+    cached = cache.get_many(graph["nodes"]) if cache is not None else {}
+    current: Dict[RecordId, Record] = {}
+    stale: List[RecordId] = []
+    oldest = now
+    for record_id, record in graph["nodes"].items():
+        fetched_at = saved_at
+        if cache is not None and record_id in cached:
+            cached_at = cache.fetched_at(record_id)
+            if cached_at is not None and cached_at >= saved_at:
+                record, fetched_at = cached[record_id], cached_at
+        if now - fetched_at <= max_age:
+            current[record_id] = record
+            oldest = min(oldest, fetched_at)
+        else:
+            stale.append(record_id)
+    return current, stale, oldest
+
+
+async def refresh_graph(
+    graph: Geneagraph,
+    saved_at: float,
+    start_nodes: List[StartNodeRequest],
+    cache: Optional[RecordCache],
+    *,
+    max_age: float = DEFAULT_MAX_AGE,
+    progress: Optional[ProgressHandler] = None,
+    uri: Optional[str] = None,
+    max_size: Optional[int] = None,
+    shards: int = 1,
+) -> Tuple[Geneagraph, int, float]:
+    """Return `graph`, which was saved at `saved_at`, rebuilt from
+    `start_nodes` with its records that are more than `max_age`
+    seconds old requested again. Also return the number of such
+    records and when the oldest record of the result was fetched. The
+    backend's progress is passed to `progress`."""
+    current, stale, oldest = split_stale(graph, saved_at, max_age, cache, time.time())
+
+    def store(partial: Geneagraph) -> None:
+        if cache is not None:
+            cache.put_many(partial["nodes"].values())
+        current.update(partial["nodes"])
+
+    if stale:
+        await get_graph_sharded(
+            {
+                "kind": "build-graph",
+                "options": {"reportingCallback": progress is not None},
+                "startNodes": [
+                    {"recordId": rid, "getAdvisors": False, "getDescendants": False}
+                    for rid in stale
+                ],
+            },
+            shards,
+            uri=uri,
+            max_size=max_size,
+            on_result=store,
+            progress=progress,
+        )
+
+    payload: RequestPayload = {
+        "kind": "build-graph",
+        "options": {"reportingCallback": progress is not None},
+        "startNodes": start_nodes,
+    }
+    refreshed = await get_graph_cached(
+        payload,
+        cache,
+        uri=uri,
+        max_size=max_size,
+        shards=shards,
+        records=current,
+        progress=progress,
+    )
+    # The parts of the graph that were cut off when it was built are
+    # not known, so they are still missing.
+    if graph["status"] == "truncated":
+        refreshed["status"] = "truncated"
+    return refreshed, len(stale), oldest
+
+
+def run_refresh(argv: List[str]) -> int:
+    parser = ArgumentParser(
+        prog="ggrapher refresh",
+        description="Bring a graph saved with '--format json' up to date, \
+requesting only the records that are stale and the records added to the \
+genealogy since.",
+    )
+    parser.add_argument(
+        "graph",
+        type=Path,
+        metavar="GRAPH",
+        help="graph file written with '--format json'",
+    )
+    parser.add_argument(
+        "ids",
+        metavar="ID",
+        type=StartNodeArg,
+        nargs="*",
+        help="start nodes of the graph, as for ggrapher (default: inferred from \
+GRAPH)",
+    )
+    parser.add_argument(
+        "--max-age",
+        type=float,
+        default=DEFAULT_MAX_AGE / (24 * 60 * 60),
+        help="request records older than DAYS again (default: %(default)g)",
+        metavar="DAYS",
+    )
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=FORMATS,
+        default="json",
+        help="graph output format (default: json)",
+    )
+    parser.add_argument(
+        "-o",
+        "--out",
+        type=Path,
+        help="write output to FILE, which may be GRAPH [default: stdout]",
+        metavar="FILE",
+    )
+    add_progress_arguments(parser)
+    add_cache_arguments(parser)
+    add_backend_arguments(parser)
+    add_shards_argument(parser)
+    args = parser.parse_args(argv)
+    check_shards_argument(parser, args)
+
+    try:
+        saved_at = args.graph.stat().st_mtime
+        graph = decode_graph(args.graph.read_bytes())
+    except (OSError, ValueError) as e:
+        print(f"Cannot read graph {args.graph}: {e}", file=sys.stderr)
+        return 1
+    if args.ids:
+        start_nodes = canonical_start_nodes(sn.start_node for sn in args.ids)
+    else:
+        try:
+            start_nodes = infer_start_nodes(graph)
+        except ValueError as e:
+            print(
+                f"Cannot infer the start nodes of {args.graph}: {e}. Give them \
+after the graph, as for ggrapher.",
+                file=sys.stderr,
+            )
+            return 1
+
+    cache = open_cache(args)
+    progress = open_progress(args)
+    try:
+        refreshed, stale, oldest = asyncio.run(
+            refresh_graph(
+                graph,
+                saved_at,
+                start_nodes,
+                cache,
+                max_age=args.max_age * 24 * 60 * 60,
+                progress=progress,
+                uri=args.backend_uri,
+                max_size=max_message_size(args),
+                shards=args.shards,
+            )
+        )
+    except GgrapherError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        if cache is not None:
+            cache.close()
+
+    if progress is not None:
+        progress.finish()
+    if args.out is None:
+        write_graph(args.format, refreshed, sys.stdout)
+    else:
+        try:
+            with open(args.out, "w") as outfile:
+                write_graph(args.format, refreshed, outfile)
+            # Records without a newer copy in the cache are as old as
+            # the file, so date it by its oldest record.
+            os.utime(args.out, (time.time(), oldest))
+        except OSError as e:
+            print(f"Cannot write graph {args.out}: {e}", file=sys.stderr)
+            return 1
+
+    added = refreshed["nodes"].keys() - graph["nodes"].keys()
+    removed = graph["nodes"].keys() - refreshed["nodes"].keys()
+    print(
+        f"Requested {stale} stale records again; {len(added)} records were added \
+and {len(removed)} removed.",
+        file=sys.stderr,
+    )
+    return 0
@@ -0,0 +1,430 @@
+"""This module implements the `ggrapher serve` subcommand, which runs a
+local caching proxy in front of the Geneagrapher backend.
+
+The proxy speaks the same WebSocket protocol as the backend, so
+`ggrapher --backend-uri` and `GeneagrapherClient` can be pointed at
+it. It reduces the load on the backend in two ways:
+
+- Identical requests that arrive while one is already being fetched
+  from the backend wait for that fetch instead of starting their own.
+  Each waiting client still receives progress messages if it asked
+  for them.
+- Graphs are kept in a result cache, bounded in size and age, and
+  repeated requests are answered from it. A request whose start nodes
+  are all covered by a cached graph's start nodes is answered with a
+  subgraph extracted from that graph.
+
+Requests are identified by their start nodes in canonical form (see
+`canonical_start_nodes`) and their limits (`maxNodes` and `maxDepth`),
+so the order and duplication of start nodes does not matter, nor does
+whether the client asked for progress messages. Limits are forwarded
+to the backend and also applied by the proxy, in case the backend
+ignores them. Limited graphs are not used to answer requests for
+subsets of their start nodes.
+"""
+
+from .client import GeneagrapherClient
+from .decode import decode_response
+from .geneagrapher import (
+    GGRAPHER_URI,
+    GgrapherError,
+    ProgressHandler,
+    RequestOptions,
+    RequestPayload,
+    add_backend_arguments,
+    max_message_size,
+)
+from .traverse import canonical_start_nodes, covers, extract_subgraph, traverse_local
+from .types import Geneagraph, StartNodeRequest
+
+from argparse import ArgumentParser
+import asyncio
+from collections import OrderedDict
+import json
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import websockets.server
+
+DEFAULT_HOST = "localhost"
+DEFAULT_PORT = 8766
+DEFAULT_RESULT_CACHE_SIZE = 256 * 2**20  # bytes
+DEFAULT_RESULT_TTL = 60 * 60  # seconds
+DEFAULT_UPSTREAM_CONNECTIONS = 4
+
+# When a message was stored, the message, and the start nodes that it
+# covers, if it can answer requests for subsets of them.
+CacheEntry = Tuple[float, str, Optional[List[StartNodeRequest]]]
+
+
+class ResultCache:
+    def __init__(
+        self,
+        *,
+        max_bytes: int = DEFAULT_RESULT_CACHE_SIZE,
+        ttl: float = DEFAULT_RESULT_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """A least-recently-used cache of encoded graph messages that
+        holds at most `max_bytes` of messages, each for at most `ttl`
+        seconds. Messages are measured by their length, which equals
+        their size in bytes for ASCII messages."""
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self.size = 0
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self.clock() - entry[0] > self.ttl:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def find_covering(self, start_nodes: List[StartNodeRequest]) -> Optional[str]:
+        """Return the most recently used message whose graph contains
+        the graph for `start_nodes` (see `covers`)."""
+        now = self.clock()
+        for key, (stored_at, message, covered) in reversed(self._entries.items()):
+            if (
+                covered is not None
+                and now - stored_at <= self.ttl
+                and covers(covered, start_nodes)
+            ):
+                self._entries.move_to_end(key)
+                return message
+        return None
+
+    def put(
+        self,
+        key: str,
+        message: str,
+        start_nodes: Optional[List[StartNodeRequest]] = None,
+    ) -> None:
+        """Store `message`, evicting the least recently used messages
+        as needed. Messages larger than the cache are not stored. If
+        `start_nodes` is given, the message can answer requests for any
+        start nodes that it covers."""
+        if key in self._entries:
+            self._remove(key)
+        if len(message) > self.max_bytes:
+            return
+        self._entries[key] = (self.clock(), message, start_nodes)
+        self.size += len(message)
+        while self.size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str) -> None:
+        message = self._entries.pop(key)[1]
+        self.size -= len(message)
+
+
+def request_options(options: Any) -> RequestOptions:
+    """Return the options of a client's request, keeping only those
+    that the proxy understands. Raise `ValueError`, `TypeError`, or
+    `KeyError` if they are invalid."""
+    result: RequestOptions = {"reportingCallback": bool(options["reportingCallback"])}
+    max_nodes = options.get("maxNodes")
+    if max_nodes is not None:
+        if type(max_nodes) is not int or max_nodes < 1:
+            raise ValueError(max_nodes)
+        result["maxNodes"] = max_nodes
+    max_depth = options.get("maxDepth")
+    if max_depth is not None:
+        if type(max_depth) is not int or max_depth < 0:
+            raise ValueError(max_depth)
+        result["maxDepth"] = max_depth
+    return result
+
+
+def request_start_nodes(start_nodes: Any) -> List[StartNodeRequest]:
+    """Return the start nodes of a client's request. Raise `ValueError`,
+    `TypeError`, or `KeyError` if they are invalid."""
+    if not isinstance(start_nodes, list):
+        raise TypeError(start_nodes)
+    result: List[StartNodeRequest] = []
+    for start_node in start_nodes:
+        record_id = start_node["recordId"]
+        advisors = start_node["getAdvisors"]
+        descendants = start_node["getDescendants"]
+        if (
+            type(record_id) is not int
+            or type(advisors) is not bool
+            or type(descendants) is not bool
+        ):
+            raise ValueError(start_node)
+        result.append(
+            {
+                "recordId": record_id,
+                "getAdvisors": advisors,
+                "getDescendants": descendants,
+            }
+        )
+    return result
+
+
+def is_limited(options: RequestOptions) -> bool:
+    return "maxNodes" in options or "maxDepth" in options
+
+
+def request_key(payload: RequestPayload) -> str:
+    start_nodes = canonical_start_nodes(payload["startNodes"])
+    options = payload["options"]
+    if not is_limited(options):
+        return json.dumps(start_nodes, sort_keys=True)
+    limits = {
+        "maxNodes": options.get("maxNodes"),
+        "maxDepth": options.get("maxDepth"),
+    }
+    return json.dumps([start_nodes, limits], sort_keys=True)
+
+
+def apply_limits(
+    graph: Geneagraph, start_nodes: List[StartNodeRequest], options: RequestOptions
+) -> Geneagraph:
+    """Return `graph` cut to the limits in `options` (see
+    `traverse_local`)."""
+    nodes = graph["nodes"]
+    limited, _ = traverse_local(
+        start_nodes,
+        lambda record_ids: {rid: nodes[rid] for rid in record_ids if rid in nodes},
+        max_nodes=options.get("maxNodes"),
+        max_depth=options.get("maxDepth"),
+    )
+    if graph["status"] == "truncated":
+        limited["status"] = "truncated"
+    return limited
+
+
+def extract_message(message: str, start_nodes: List[StartNodeRequest]) -> Optional[str]:
+    """Return the graph message for `start_nodes`, extracted from the
+    graph in `message`, or `None` if it cannot be extracted."""
+    graph = decode_response(message)["payload"]
+    subgraph = extract_subgraph(graph, start_nodes)
+    if subgraph is None:
+        return None
+    return json.dumps({"kind": "graph", "payload": subgraph})
+
+
+class Flight:
+    """An upstream request that is in progress, and the progress
+    handlers of the clients waiting for it."""
+
+    def __init__(self) -> None:
+        self.listeners: List[ProgressHandler] = []
+        self.task: "Optional[asyncio.Task[str]]" = None
+
+    def progress(self, queued: int, fetching: int, done: int) -> None:
+        for listener in list(self.listeners):
+            listener(queued, fetching, done)
+
+
+class CachingProxy:
+    def __init__(self, client: GeneagrapherClient, results: ResultCache) -> None:
+        """Answer requests from `results`, or with graphs requested
+        from the backend through `client`."""
+        self.client = client
+        self.results = results
+        self.inflight: Dict[str, Flight] = {}
+        self.upstream_requests = 0
+        self.cache_hits = 0
+        self.subgraph_hits = 0
+        self.coalesced = 0
+
+    async def build_graph(
+        self, payload: RequestPayload, progress: Optional[ProgressHandler] = None
+    ) -> str:
+        """Return the encoded graph message that answers `payload`.
+        Raise `GgrapherError` if the backend request fails."""
+        start_nodes = canonical_start_nodes(payload["startNodes"])
+        options = payload["options"]
+        key = request_key(payload)
+        message = self.results.get(key)
+        if message is not None:
+            self.cache_hits += 1
+            return message
+
+        covering = (
+            None if is_limited(options) else self.results.find_covering(start_nodes)
+        )
+        if covering is not None:
+            # Decoding and extracting can take a while for large graphs,
+            # so keep it off the event loop.
+            message = await asyncio.get_running_loop().run_in_executor(
+                None, extract_message, covering, start_nodes
+            )
+            if message is not None:
+                self.subgraph_hits += 1
+                self.results.put(key, message, start_nodes)
+                return message
+
+        flight = self.inflight.get(key)
+        if flight is None:
+            flight = Flight()
+            flight.task = asyncio.create_task(
+                self._fetch(key, start_nodes, options, flight)
+            )
+            self.inflight[key] = flight
+        else:
+            self.coalesced += 1
+        assert flight.task is not None
+
+        if progress is not None:
+            flight.listeners.append(progress)
+        try:
+            # A waiting client that disconnects must not cancel the
+            # request for the others.
+            return await asyncio.shield(flight.task)
+        finally:
+            if progress is not None:
+                flight.listeners.remove(progress)
+
+    async def _fetch(
+        self,
+        key: str,
+        start_nodes: List[StartNodeRequest],
+        options: RequestOptions,
+        flight: Flight,
+    ) -> str:
+        self.upstream_requests += 1
+        upstream_options: RequestOptions = {**options, "reportingCallback": True}
+        try:
+            graph = await self.client.request(
+                {
+                    "kind": "build-graph",
+                    "options": upstream_options,
+                    "startNodes": start_nodes,
+                },
+                progress=flight.progress,
+            )
+            limited = is_limited(options)
+            if limited:
+                graph = await asyncio.get_running_loop().run_in_executor(
+                    None, apply_limits, graph, start_nodes, options
+                )
+            message = json.dumps({"kind": "graph", "payload": graph})
+            # A truncated or limited graph may lack parts of the graphs
+            # for subsets of its start nodes.
+            covering = graph["status"] == "complete" and not limited
+            self.results.put(key, message, start_nodes if covering else None)
+            return message
+        finally:
+            del self.inflight[key]
+
+    async def handler(self, ws: websockets.server.WebSocketServerProtocol) -> None:
+        async for message in ws:
+            try:
+                request = json.loads(message)
+                if request["kind"] != "build-graph":
+                    raise ValueError(request["kind"])
+                payload: RequestPayload = {
+                    "kind": "build-graph",
+                    "options": request_options(request["options"]),
+                    "startNodes": request_start_nodes(request["startNodes"]),
+                }
+            except (ValueError, TypeError, KeyError):
+                await ws.send(json.dumps({"kind": "error", "payload": "bad request"}))
+                continue
+
+            # Progress messages are sent from tasks, which are awaited
+            # before the graph is sent so that they arrive first.
+            sends: List["asyncio.Future[Any]"] = []
+
+            def send_progress(queued: int, fetching: int, done: int) -> None:
+                progress = {"queued": queued, "fetching": fetching, "done": done}
+                sends.append(
+                    asyncio.ensure_future(
+                        ws.send(json.dumps({"kind": "progress", "payload": progress}))
+                    )
+                )
+
+            reporting = payload["options"]["reportingCallback"]
+            try:
+                response = await self.build_graph(
+                    payload, send_progress if reporting else None
+                )
+            except GgrapherError as e:
+                response = json.dumps({"kind": "error", "payload": e.msg})
+            await asyncio.gather(*sends, return_exceptions=True)
+            await ws.send(response)
+
+    def serve(self, host: str, port: int) -> websockets.server.serve:
+        """Return an async context manager that runs the proxy."""
+        return websockets.server.serve(self.handler, host, port, max_size=None)
+
+
+async def serve_forever(proxy: CachingProxy, host: str, port: int) -> None:
+    async with proxy.client, proxy.serve(host, port):
+        await asyncio.Future()
+
+
+def run_serve(argv: List[str]) -> int:
+    parser = ArgumentParser(
+        prog="ggrapher serve",
+        description="Run a local caching proxy for the Geneagrapher backend. \
+Identical concurrent requests are combined into one backend request, and \
+results are cached.",
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        "--upstream-connections",
+        type=int,
+        default=DEFAULT_UPSTREAM_CONNECTIONS,
+        help="keep at most N connections to the backend open (default: \
+%(default)s)",
+        metavar="N",
+    )
+    parser.add_argument(
+        "--result-cache-size",
+        type=float,
+        default=DEFAULT_RESULT_CACHE_SIZE / 2**20,
+        help="cache at most MIB mebibytes of graphs (default: %(default)g)",
+        metavar="MIB",
+    )
+    parser.add_argument(
+        "--result-ttl",
+        type=float,
+        default=DEFAULT_RESULT_TTL,
+        help="answer from cached graphs at most SECONDS old (default: \
+%(default)g)",
+        metavar="SECONDS",
+    )
+    add_backend_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.upstream_connections < 1:
+        parser.error("argument --upstream-connections: must be at least 1")
+
+    proxy = CachingProxy(
+        GeneagrapherClient(
+            args.backend_uri,
+            pool_size=args.upstream_connections,
+            max_size=max_message_size(args),
+        ),
+        ResultCache(max_bytes=int(args.result_cache_size * 2**20), ttl=args.result_ttl),
+    )
+    upstream = "" if args.backend_uri == GGRAPHER_URI else f" ({args.backend_uri})"
+    print(
+        f"Serving at ws://{args.host}:{args.port}, forwarding to the Geneagrapher \
+backend{upstream}",
+        file=sys.stderr,
+    )
+    try:
+        asyncio.run(serve_forever(proxy, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    print(
+        f"Served {proxy.cache_hits} requests from the cache and \
+{proxy.subgraph_hits} from subgraphs of cached graphs, and combined \
+{proxy.coalesced} with in-flight requests; made {proxy.upstream_requests} backend \
+requests.",
+        file=sys.stderr,
+    )
+    return 0
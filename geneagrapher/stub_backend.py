@@ -0,0 +1,153 @@
+"""This module implements `StubBackend`, a local stand-in for the
+Geneagrapher backend service. It is used to test and benchmark
+Geneagrapher without network access.
+
+The stub speaks the same WebSocket protocol as the real backend: it
+accepts `build-graph` requests, optionally sends `progress` messages,
+and answers with a `graph` message. Instead of the Mathematics
+Genealogy Project, graphs are built from a synthetic genealogy (see
+`geneagrapher.synthetic`). Latency and the number of progress messages
+are configurable.
+
+To run the stub and point `ggrapher` at it:
+
+    python -m geneagrapher.stub_backend --nodes 100000 --port 8765
+    ggrapher --backend-uri ws://localhost:8765 --no-cache ID:a
+"""
+
+from .synthetic import make_geneagraph
+from .traverse import traverse_local
+from .types import Geneagraph, Record, RecordId
+
+from argparse import ArgumentParser
+import asyncio
+import json
+from typing import Any, Dict, Iterable, List, Optional
+import websockets.server
+
+DEFAULT_PORT = 8765
+DEFAULT_PROGRESS_STEPS = 10
+
+
+class StubBackend:
+    def __init__(
+        self,
+        graph: Geneagraph,
+        *,
+        latency: float = 0.0,
+        progress_steps: int = DEFAULT_PROGRESS_STEPS,
+    ) -> None:
+        """Serve graphs built from the records in `graph`. Each request
+        takes at least `latency` seconds to answer, during which
+        `progress_steps` progress messages are sent if the client asked
+        for them."""
+        self.nodes = graph["nodes"]
+        self.latency = latency
+        self.progress_steps = progress_steps
+        self.requests_served = 0
+
+    def lookup(self, record_ids: Iterable[RecordId]) -> Dict[RecordId, Record]:
+        return {rid: self.nodes[rid] for rid in record_ids if rid in self.nodes}
+
+    async def handler(self, ws: websockets.server.WebSocketServerProtocol) -> None:
+        async for message in ws:
+            try:
+                request = json.loads(message)
+                if request["kind"] != "build-graph":
+                    raise ValueError(request["kind"])
+                start_nodes = request["startNodes"]
+                reporting = bool(request["options"]["reportingCallback"])
+            except (ValueError, TypeError, KeyError):
+                await ws.send(json.dumps({"kind": "error", "payload": "bad request"}))
+                continue
+            await self.build_graph(ws, start_nodes, reporting)
+
+    async def build_graph(
+        self,
+        ws: websockets.server.WebSocketServerProtocol,
+        start_nodes: List[Any],
+        reporting: bool,
+    ) -> None:
+        graph, _ = traverse_local(start_nodes, self.lookup)
+        total = len(graph["nodes"])
+
+        steps = self.progress_steps if reporting and total > 0 else 0
+        for step in range(1, steps + 1):
+            await asyncio.sleep(self.latency / steps)
+            done = total * step // steps
+            fetching = min(total - done, max(1, total // steps))
+            progress = {
+                "queued": total - done - fetching,
+                "fetching": fetching,
+                "done": done,
+            }
+            await ws.send(json.dumps({"kind": "progress", "payload": progress}))
+        if steps == 0:
+            await asyncio.sleep(self.latency)
+
+        await ws.send(json.dumps({"kind": "graph", "payload": graph}))
+        self.requests_served += 1
+
+    def serve(self, host: str, port: int) -> websockets.server.serve:
+        """Return an async context manager that runs the server."""
+        return websockets.server.serve(self.handler, host, port, max_size=None)
+
+
+async def serve_forever(backend: StubBackend, host: str, port: int) -> None:
+    async with backend.serve(host, port):
+        await asyncio.Future()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = ArgumentParser(
+        description="Run a local stand-in for the Geneagrapher backend that serves \
+a synthetic genealogy."
+    )
+    parser.add_argument(
+        "--nodes",
+        type=int,
+        default=10000,
+        help="number of records in the synthetic genealogy (default: %(default)s)",
+        metavar="N",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="random seed for the synthetic genealogy (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="seconds to take to answer each request (default: %(default)s)",
+        metavar="SECONDS",
+    )
+    parser.add_argument(
+        "--progress-steps",
+        type=int,
+        default=DEFAULT_PROGRESS_STEPS,
+        help="progress messages to send per request (default: %(default)s)",
+        metavar="N",
+    )
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args(argv)
+
+    graph = make_geneagraph(args.nodes, seed=args.seed)
+    backend = StubBackend(
+        graph, latency=args.latency, progress_steps=args.progress_steps
+    )
+    sample = graph["start_nodes"][0] if graph["start_nodes"] else None
+    print(
+        f"Serving {args.nodes} synthetic records at ws://{args.host}:{args.port} \
+(e.g., try start node {sample}:a)"
+    )
+    try:
+        asyncio.run(serve_forever(backend, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
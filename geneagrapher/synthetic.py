@@ -0,0 +1,64 @@
+"""This module generates synthetic `Geneagraph` objects of arbitrary
+size. They are used to benchmark and load-test Geneagrapher without
+access to the Mathematics Genealogy Project.
+
+Records are created in chronological order, and each record's
+advisors are drawn from the records created before it, so the
+generated graphs are acyclic, like real genealogies.
+"""
+
+from .types import Geneagraph, Record, RecordId
+
+import random
+from typing import Dict, List, Optional
+
+INSTITUTIONS = [
+    "Universität Göttingen",
+    "Université de Paris",
+    "University of Cambridge",
+    "Princeton University",
+    "Universiteit van Amsterdam",
+    "University of Wollongong",
+    "Universität Basel",
+    "Harvard University",
+]
+
+
+def make_geneagraph(
+    num_nodes: int,
+    *,
+    seed: int = 0,
+    max_advisors: int = 3,
+    start_nodes: Optional[List[RecordId]] = None,
+) -> Geneagraph:
+    """Return a graph with `num_nodes` records. The same `seed` always
+    produces the same graph. If `start_nodes` is not given, the last
+    record created is the graph's only start node."""
+    rng = random.Random(seed)
+    ids = [RecordId(i) for i in rng.sample(range(1, 10 * num_nodes + 1), num_nodes)]
+    nodes: Dict[RecordId, Record] = {}
+
+    for i, record_id in enumerate(ids):
+        num_advisors = min(i, rng.randint(0, max_advisors))
+        # Favor recent records as advisors, which keeps years sensible.
+        window = max(1, min(i, 1000))
+        advisors: List[int] = [
+            ids[i - rng.randint(1, window)] for _ in range(num_advisors)
+        ]
+        year = 1500 + i * 500 // max(1, num_nodes) + rng.randint(0, 10)
+        nodes[record_id] = {
+            "id": record_id,
+            "name": f"Mathematician {record_id}",
+            "institution": None if rng.random() < 0.05 else rng.choice(INSTITUTIONS),
+            "year": None if rng.random() < 0.1 else year,
+            "descendants": [],
+            "advisors": advisors,
+        }
+        for advisor_id in dict.fromkeys(advisors):
+            nodes[RecordId(advisor_id)]["descendants"].append(record_id)
+
+    return {
+        "start_nodes": start_nodes if start_nodes is not None else ids[-1:],
+        "nodes": nodes,
+        "status": "complete",
+    }
@@ -0,0 +1,206 @@
+"""This module implements `Timings`, which records where the time of a
+`ggrapher` run goes. It backs the `--timings` option.
+
+A run is divided into phases:
+
+- `connect`: opening WebSocket connections to the backend
+- `backend`: waiting for and receiving backend messages, which covers
+  the backend's crawl of the Mathematics Genealogy Project
+- `decode`: decoding backend messages
+- `cache`: reading and writing the record cache and traversing cached
+  records
+- `format`: generating the graph's output
+- `write`: writing the output to the output file
+
+Phases may be entered many times (e.g., once per backend request),
+including by concurrent tasks (e.g., with `--shards`). A phase's
+duration is the wall-clock time during which at least one task was in
+it, so time that concurrent tasks spent in the same phase is counted
+once. Different phases can still overlap (one request may wait for the
+backend while another's records are cached), in which case the phases
+add up to more than the run's total. `Timings` also counts the
+messages and bytes received from the backend, and notes when the first
+progress message and the final graph arrived.
+"""
+
+from contextlib import contextmanager, nullcontext
+import io
+import time
+from typing import (
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    TextIO,
+    Tuple,
+    Union,
+)
+
+PHASES = ("connect", "backend", "decode", "cache", "format", "write")
+# The number of intervals kept for a phase before they are merged and
+# those that have ended are added to the phase's running total.
+MAX_INTERVALS = 4096
+
+
+def merge_intervals(intervals: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
+    """Return `intervals` sorted, with overlapping intervals merged."""
+    merged: List[Tuple[float, float]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class Timings:
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.intervals: Dict[str, List[Tuple[float, float]]] = {}
+        # For each phase, the seconds of intervals that were merged and
+        # ended before any task still in the phase entered it, and the
+        # time at which the last of them ended.
+        self._folded: Dict[str, float] = {}
+        self._folded_until: Dict[str, float] = {}
+        self._limits: Dict[str, int] = {}
+        self._open: Dict[str, List[float]] = {}
+        self.messages_received = 0
+        self.bytes_received = 0
+        self.first_progress: Optional[float] = None
+        self.final_graph: Optional[float] = None
+
+    def elapsed(self) -> float:
+        """Return the number of seconds since the run started."""
+        return time.perf_counter() - self.start
+
+    @property
+    def phases(self) -> Dict[str, float]:
+        """Return the wall-clock seconds spent in each phase."""
+        return {
+            name: self._folded.get(name, 0.0)
+            + sum(end - start for start, end in merge_intervals(intervals))
+            for name, intervals in self.intervals.items()
+        }
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Add the time spent in the `with` block to phase `name`."""
+        start = time.perf_counter()
+        open_starts = self._open.setdefault(name, [])
+        open_starts.append(start)
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            open_starts.remove(start)
+            self.add_interval(name, start, end)
+
+    def add(self, name: str, seconds: float) -> None:
+        """Add the `seconds` that just ended to phase `name`."""
+        end = time.perf_counter()
+        self.add_interval(name, end - seconds, end)
+
+    def add_interval(self, name: str, start: float, end: float) -> None:
+        """Add the interval from `start` to `end` to phase `name`. The
+        part of it before the phase's folded intervals end is dropped,
+        which `phase` ensures never happens."""
+        intervals = self.intervals.setdefault(name, [])
+        start = max(start, self._folded_until.get(name, start))
+        if end > start:
+            intervals.append((start, end))
+        if len(intervals) > self._limits.get(name, MAX_INTERVALS):
+            self._fold(name)
+
+    def _fold(self, name: str) -> None:
+        """Merge the intervals of phase `name` and move those that no
+        later interval can overlap to its running total, so that adding
+        an interval takes amortized constant time. The last interval is
+        kept, since the next one is likely to adjoin it."""
+        intervals = merge_intervals(self.intervals[name])
+        bound = min(self._open.get(name) or [intervals[-1][1]])
+        folded = 0
+        while folded < len(intervals) - 1 and intervals[folded][1] < bound:
+            folded += 1
+        if folded:
+            self._folded[name] = self._folded.get(name, 0.0) + sum(
+                end - start for start, end in intervals[:folded]
+            )
+            self._folded_until[name] = intervals[folded - 1][1]
+        self.intervals[name] = intervals[folded:]
+        self._limits[name] = max(MAX_INTERVALS, 2 * len(self.intervals[name]))
+
+    def received(self, message: Union[str, bytes]) -> None:
+        """Count a message received from the backend."""
+        self.messages_received += 1
+        if isinstance(message, str) and not message.isascii():
+            message = message.encode()
+        self.bytes_received += len(message)
+
+    def progress_received(self) -> None:
+        if self.first_progress is None:
+            self.first_progress = self.elapsed()
+
+    def graph_received(self) -> None:
+        self.final_graph = self.elapsed()
+
+    def report(self) -> str:
+        """Return a human-readable summary of the run's timings."""
+        total = self.elapsed()
+        phases = self.phases
+        names = [p for p in PHASES if p in phases] + sorted(
+            p for p in phases if p not in PHASES
+        )
+        lines = ["Timings (wall-clock):"]
+        for name in names:
+            seconds = phases[name]
+            share = seconds / total if total else 0.0
+            lines.append(f"  {name + ':':<24}{seconds:>9.3f}s {share:>6.1%}")
+        other = total - sum(phases.values())
+        lines.append(f"  {'other:':<24}{max(0.0, other):>9.3f}s")
+        lines.append(f"  {'total:':<24}{total:>9.3f}s")
+        if other < 0:
+            lines.append(
+                "  (Concurrent requests were in different phases at once, so "
+                "the phases overlap.)"
+            )
+
+        def moment(t: Optional[float]) -> str:
+            return "-" if t is None else f"{t:.3f}s"
+
+        lines += [
+            f"  {'first progress message:':<24}{moment(self.first_progress):>10}",
+            f"  {'final graph:':<24}{moment(self.final_graph):>10}",
+            f"  {'messages received:':<24}{self.messages_received:>10}",
+            f"  {'bytes received:':<24}{self.bytes_received:>10}",
+        ]
+        return "\n".join(lines)
+
+
+def phase(timings: Optional[Timings], name: str) -> ContextManager[None]:
+    """Return `timings.phase(name)`, or a no-op context manager if
+    `timings` is `None`."""
+    return nullcontext() if timings is None else timings.phase(name)
+
+
+class TimedWriter(io.TextIOBase):
+    """A text file that wraps `fp` and adds the time spent writing to it
+    to the `write` phase of `timings`."""
+
+    def __init__(self, fp: TextIO, timings: Timings) -> None:
+        self.fp = fp
+        self.timings = timings
+
+    def write(self, s: str) -> int:
+        with self.timings.phase("write"):
+            return self.fp.write(s)
+
+    def writelines(self, lines: Iterable[str]) -> None:  # type: ignore[override]
+        for line in lines:
+            self.write(line)
+
+    def flush(self) -> None:
+        with self.timings.phase("write"):
+            self.fp.flush()
@@ -0,0 +1,254 @@
+"""This module builds a `Geneagraph` on the client from records that
+are already available locally (e.g., in a `RecordCache`).
+
+The traversal mirrors the one performed by the backend: from each
+start node, advisors are followed in the advisor direction only and
+descendants are followed in the descendant direction only. When a
+record that the traversal needs is not available locally, the
+traversal reports it as part of the frontier. Requesting the frontier
+from the backend yields exactly the records that are missing.
+
+The traversal can be limited to the records within `max_depth`
+generations of the start nodes and to at most `max_nodes` records
+(counting those in the frontier), in which case the graph is marked
+`truncated` if records were left out.
+
+`LocalTraversal` performs the same traversal one generation at a
+time, pausing at each generation that needs records that are not
+available, so that a graph requested generation by generation is
+traversed once rather than once per generation.
+"""
+
+from .types import Geneagraph, Record, RecordId, StartNodeRequest
+
+from typing import Callable, Dict, Iterable, List, Literal, Optional, Set, Tuple
+
+Direction = Literal["", "a", "d"]
+RecordLookup = Callable[[Iterable[RecordId]], Dict[RecordId, Record]]
+
+
+def traverse_local(
+    start_nodes: List[StartNodeRequest],
+    lookup: RecordLookup,
+    *,
+    max_depth: Optional[int] = None,
+    max_nodes: Optional[int] = None,
+) -> Tuple[Geneagraph, List[StartNodeRequest]]:
+    """Build the graph for `start_nodes` using only records returned
+    by `lookup`, following at most `max_depth` generations from each
+    start node and keeping at most `max_nodes` records. Records closer
+    to the start nodes are kept first.
+
+    Return the graph of the records that could be reached and the
+    frontier of start node requests for the records that were needed
+    but unavailable. The graph is complete when the frontier is
+    empty, unless the limits cut it short."""
+    traversal = LocalTraversal(
+        start_nodes, lookup, max_depth=max_depth, max_nodes=max_nodes
+    )
+    while traversal._step() is None:
+        pass
+    return traversal.graph(), list(traversal._frontier.values())
+
+
+class LocalTraversal:
+    """The traversal of `traverse_local`, one generation at a time.
+
+    `advance` traverses until a generation needs records that `lookup`
+    does not return, and returns their IDs. Once they have been
+    fetched, so that `lookup` returns them, the next call to `advance`
+    continues from that generation, so each record is traversed once
+    however many generations are fetched. Records that are still not
+    returned then are left out of the graph, as the backend leaves out
+    records that it cannot find. The graph is the same as the one
+    that `traverse_local` builds once all the records are available."""
+
+    def __init__(
+        self,
+        start_nodes: List[StartNodeRequest],
+        lookup: RecordLookup,
+        *,
+        max_depth: Optional[int] = None,
+        max_nodes: Optional[int] = None,
+    ) -> None:
+        self.start_nodes = start_nodes
+        self.lookup = lookup
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self._nodes: Dict[RecordId, Record] = {}
+        self._frontier: Dict[RecordId, StartNodeRequest] = {}
+        self._truncated = False
+        self._absent: Set[RecordId] = set()
+        self._waiting: Set[RecordId] = set()
+        self._seen: Set[Tuple[RecordId, Direction]] = set()
+        self._depth = 0
+        self._level: List[Tuple[RecordId, Direction]] = []
+        for sn in start_nodes:
+            record_id = RecordId(sn["recordId"])
+            self._level.append((record_id, ""))
+            if sn["getAdvisors"]:
+                self._level.append((record_id, "a"))
+            if sn["getDescendants"]:
+                self._level.append((record_id, "d"))
+
+    def advance(self) -> List[RecordId]:
+        """Traverse until a generation needs records that are neither
+        returned by `lookup` nor were returned by `advance` before, and
+        return their IDs, or an empty list if the traversal is done."""
+        while True:
+            missing = self._step(wait=True)
+            if missing:
+                return missing
+            if missing is not None:
+                return []
+
+    def graph(self) -> Geneagraph:
+        """Return the graph of the records traversed so far."""
+        return {
+            "start_nodes": [RecordId(sn["recordId"]) for sn in self.start_nodes],
+            "nodes": self._nodes,
+            "status": "truncated" if self._truncated else "complete",
+        }
+
+    def _step(self, *, wait: bool = False) -> Optional[List[RecordId]]:
+        """Traverse the next generation and return `None`, or an empty
+        list if the traversal is done. Records that `lookup` does not
+        return are added to the frontier, unless `wait` is true and they
+        were not returned by an earlier step; then their IDs are
+        returned, and the generation is traversed by the next step."""
+        level = [item for item in dict.fromkeys(self._level) if item not in self._seen]
+        if not level:
+            return []
+        nodes, absent = self._nodes, self._absent
+        if self.max_nodes is not None:
+            # Records that are already in the graph (or the frontier)
+            # cost nothing; the rest are kept in order until the graph
+            # is full.
+            room = self.max_nodes - len(nodes) - len(absent)
+            kept: Set[RecordId] = set()
+            for record_id, _ in level:
+                if record_id in nodes or record_id in absent or record_id in kept:
+                    continue
+                if len(kept) < room:
+                    kept.add(record_id)
+                else:
+                    self._truncated = True
+            level = [
+                (record_id, direction)
+                for record_id, direction in level
+                if record_id in nodes or record_id in absent or record_id in kept
+            ]
+        self._level = level
+
+        wanted = {
+            record_id
+            for record_id, _ in level
+            if record_id not in nodes and record_id not in absent
+        }
+        if wanted:
+            found = self.lookup(wanted)
+            nodes.update(found)
+            missing = wanted.difference(found)
+            new = missing - self._waiting if wait else set()
+            if new:
+                self._waiting.update(new)
+                return [
+                    record_id
+                    for record_id in dict.fromkeys(rid for rid, _ in level)
+                    if record_id in new
+                ]
+            absent.update(missing)
+        self._seen.update(level)
+
+        next_level: List[Tuple[RecordId, Direction]] = []
+        # Records at the depth limit are in the graph, but their
+        # relatives are not.
+        follow = self.max_depth is None or self._depth < self.max_depth
+        for record_id, direction in level:
+            if record_id in absent:
+                request = self._frontier.setdefault(
+                    record_id,
+                    {
+                        "recordId": record_id,
+                        "getAdvisors": False,
+                        "getDescendants": False,
+                    },
+                )
+                if follow and direction == "a":
+                    request["getAdvisors"] = True
+                elif follow and direction == "d":
+                    request["getDescendants"] = True
+            elif direction and not follow:
+                record = nodes[record_id]
+                if record["advisors" if direction == "a" else "descendants"]:
+                    self._truncated = True
+            elif direction == "a":
+                next_level.extend(
+                    (RecordId(aid), "a") for aid in nodes[record_id]["advisors"]
+                )
+            elif direction == "d":
+                next_level.extend(
+                    (RecordId(did), "d") for did in nodes[record_id]["descendants"]
+                )
+        self._level = next_level
+        self._depth += 1
+        return None
+
+
+def canonical_start_nodes(
+    start_nodes: Iterable[StartNodeRequest],
+) -> List[StartNodeRequest]:
+    """Return `start_nodes` in canonical form: one request per record,
+    with the directions of duplicate requests merged, sorted by record
+    ID. Requests that differ only in order or duplication have the same
+    canonical form and produce the same graph."""
+    merged: Dict[int, StartNodeRequest] = {}
+    for sn in start_nodes:
+        request = merged.setdefault(
+            sn["recordId"],
+            {
+                "recordId": sn["recordId"],
+                "getAdvisors": False,
+                "getDescendants": False,
+            },
+        )
+        request["getAdvisors"] = request["getAdvisors"] or sn["getAdvisors"]
+        request["getDescendants"] = request["getDescendants"] or sn["getDescendants"]
+    return [merged[record_id] for record_id in sorted(merged)]
+
+
+def covers(
+    superset: Iterable[StartNodeRequest], subset: Iterable[StartNodeRequest]
+) -> bool:
+    """Return whether every start node in `subset` is requested, in at
+    least the same directions, in `superset`. If so, the graph for
+    `superset` contains the graph for `subset`."""
+    directions = {
+        sn["recordId"]: (sn["getAdvisors"], sn["getDescendants"])
+        for sn in canonical_start_nodes(superset)
+    }
+    for sn in subset:
+        if sn["recordId"] not in directions:
+            return False
+        advisors, descendants = directions[sn["recordId"]]
+        if (sn["getAdvisors"] and not advisors) or (
+            sn["getDescendants"] and not descendants
+        ):
+            return False
+    return True
+
+
+def extract_subgraph(
+    graph: Geneagraph, start_nodes: List[StartNodeRequest]
+) -> Optional[Geneagraph]:
+    """Return the graph for `start_nodes` built from the records in
+    `graph`, or `None` if `graph` lacks records that it needs."""
+    nodes = graph["nodes"]
+    subgraph, frontier = traverse_local(
+        start_nodes,
+        lambda record_ids: {rid: nodes[rid] for rid in record_ids if rid in nodes},
+    )
+    if frontier:
+        return None
+    subgraph["status"] = graph["status"]
+    return subgraph
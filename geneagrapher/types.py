@@ -25,3 +25,9 @@ class Geneagraph(TypedDict):
     start_nodes: List[RecordId]
     nodes: Dict[RecordId, Record]
     status: Literal["complete", "truncated"]
+
+
+class StartNodeRequest(TypedDict):
+    recordId: int
+    getAdvisors: bool
+    getDescendants: bool
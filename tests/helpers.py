@@ -0,0 +1,38 @@
+"""Factories for the records, graphs, and start nodes used in tests."""
+
+from geneagrapher.types import Geneagraph, Record, RecordId, StartNodeRequest
+
+from typing import Iterable, Literal, Sequence
+
+
+def make_record(
+    record_id: int, advisors: Sequence[int] = (), descendants: Sequence[int] = ()
+) -> Record:
+    return {
+        "id": RecordId(record_id),
+        "name": f"Name {record_id}",
+        "institution": None,
+        "year": None,
+        "descendants": list(descendants),
+        "advisors": list(advisors),
+    }
+
+
+def make_graph(
+    start_nodes: Iterable[int],
+    records: Iterable[Record],
+    status: Literal["complete", "truncated"] = "complete",
+) -> Geneagraph:
+    return {
+        "start_nodes": [RecordId(rid) for rid in start_nodes],
+        "nodes": {RecordId(r["id"]): r for r in records},
+        "status": status,
+    }
+
+
+def sn(record_id: int, advisors: bool, descendants: bool) -> StartNodeRequest:
+    return {
+        "recordId": record_id,
+        "getAdvisors": advisors,
+        "getDescendants": descendants,
+    }
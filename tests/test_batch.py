@@ -0,0 +1,184 @@
+from geneagrapher.batch import JobError, parse_job, run_batch, run_jobs
+from geneagrapher.client import GeneagrapherClient
+from geneagrapher.geneagrapher import GgrapherError
+from geneagrapher.types import Geneagraph
+from tests.helpers import make_graph, make_record
+
+import asyncio
+import io
+import json
+from pathlib import Path
+import pytest
+from typing import Any, Dict
+from unittest.mock import MagicMock, patch, sentinel as s
+
+
+class TestParseJob:
+    def test_good(self) -> None:
+        job = parse_job(
+            3, '{"ids": ["1:a", "2:ad"], "out": "x.json", "format": "json"}'
+        )
+        assert job.line_number == 3
+        assert [sn.start_node for sn in job.start_nodes] == [
+            {"recordId": 1, "getAdvisors": True, "getDescendants": False},
+            {"recordId": 2, "getAdvisors": True, "getDescendants": True},
+        ]
+        assert job.out == "x.json"
+        assert job.format == "json"
+
+    def test_default_format(self) -> None:
+        assert parse_job(1, '{"ids": ["1:a"], "out": "x.dot"}').format == "dot"
+
+    @pytest.mark.parametrize(
+        "line,message",
+        (
+            ["{", "invalid JSON"],
+            ["[]", "job must be a JSON object"],
+            ['{"out": "x"}', "'ids' must be a non-empty list"],
+            ['{"ids": [], "out": "x"}', "'ids' must be a non-empty list"],
+            ['{"ids": ["1"], "out": "x"}', "invalid ID"],
+            ['{"ids": ["1:a"]}', "'out' must be a path"],
+            ['{"ids": ["1:a"], "out": "x", "format": "png"}', "'format' must be"],
+        ),
+    )
+    def test_bad(self, line: str, message: str) -> None:
+        with pytest.raises(JobError, match=message):
+            parse_job(1, line)
+
+
+class TestRunJobs:
+    @pytest.mark.asyncio
+    @patch("geneagrapher.batch.get_graph_cached")
+    async def test_run_jobs(
+        self,
+        m_get_graph_cached: MagicMock,
+        tmp_path: Path,
+        capsys: pytest.CaptureFixture[str],
+    ) -> None:
+        async def get_graph_cached(
+            payload: Dict[str, Any], cache: Any, **kwargs: Any
+        ) -> Geneagraph:
+            record_id = payload["startNodes"][0]["recordId"]
+            if record_id == 2:
+                raise GgrapherError("Backend said no.")
+            return make_graph([record_id], [make_record(record_id)])
+
+        m_get_graph_cached.side_effect = get_graph_cached
+
+        jobs = [
+            {"ids": ["1:a"], "out": str(tmp_path / "one.json"), "format": "json"},
+            {"ids": ["2:a"], "out": str(tmp_path / "two.dot")},
+            {"ids": ["3:x"], "out": str(tmp_path / "three.dot")},
+            {"ids": ["4:d"], "out": str(tmp_path / "missing" / "four.dot")},
+            {"ids": ["5:d"], "out": str(tmp_path / "five.dot")},
+        ]
+        jobfile = io.StringIO("\n".join(json.dumps(j) for j in jobs) + "\n\n")
+
+        assert (
+            await run_jobs(jobfile, s.cache, 2, uri="ws://test", max_size=10, shards=3)
+            == 3
+        )
+
+        assert json.loads((tmp_path / "one.json").read_text()) == json.loads(
+            json.dumps(make_graph([1], [make_record(1)]))
+        )
+        assert (tmp_path / "five.dot").read_text().startswith("digraph {")
+        assert not (tmp_path / "two.dot").exists()
+
+        err_lines = capsys.readouterr().err.splitlines()
+        assert err_lines[0] == "job 3: failed: invalid ID in ['3:x']"
+        assert err_lines[1] == f"job 1 ({jobs[0]['out']}): done"
+        assert err_lines[2] == f"job 2 ({jobs[1]['out']}): failed: Backend said no."
+        assert err_lines[3].startswith(f"job 4 ({jobs[3]['out']}): failed: ")
+        assert err_lines[4] == f"job 5 ({jobs[4]['out']}): done"
+
+        assert all(c.args[1] is s.cache for c in m_get_graph_cached.call_args_list)
+        # All jobs share one pool of connections.
+        clients = {id(c.kwargs["client"]) for c in m_get_graph_cached.call_args_list}
+        assert len(clients) == 1
+        client = m_get_graph_cached.call_args.kwargs["client"]
+        assert isinstance(client, GeneagrapherClient)
+        assert (client.uri, client.max_size, client.pool_size) == ("ws://test", 10, 6)
+        assert all(
+            c.kwargs == {"shards": 3, "client": client}
+            for c in m_get_graph_cached.call_args_list
+        )
+        assert all(
+            c.args[0]["options"] == {"reportingCallback": False}
+            for c in m_get_graph_cached.call_args_list
+        )
+
+    @pytest.mark.asyncio
+    @patch("geneagrapher.batch.get_graph_cached")
+    async def test_concurrency_limit(
+        self, m_get_graph_cached: MagicMock, tmp_path: Path
+    ) -> None:
+        running = 0
+        max_running = 0
+
+        async def get_graph_cached(
+            payload: Dict[str, Any], cache: Any, **kwargs: Any
+        ) -> Geneagraph:
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            record_id = payload["startNodes"][0]["recordId"]
+            return make_graph([record_id], [make_record(record_id)])
+
+        m_get_graph_cached.side_effect = get_graph_cached
+        jobfile = io.StringIO(
+            "\n".join(
+                json.dumps({"ids": [f"{i}:a"], "out": str(tmp_path / f"{i}.dot")})
+                for i in range(10)
+            )
+        )
+
+        assert await run_jobs(jobfile, None, 3) == 0
+        assert max_running == 3
+
+
+@pytest.mark.parametrize("failures,expected", [(0, 0), (2, 1)])
+@patch("geneagrapher.batch.open_cache")
+@patch("geneagrapher.batch.run_jobs")
+def test_run_batch(
+    m_run_jobs: MagicMock,
+    m_open_cache: MagicMock,
+    failures: int,
+    expected: int,
+    tmp_path: Path,
+) -> None:
+    jobfile = tmp_path / "jobs.jsonl"
+    jobfile.write_text("")
+    cache = MagicMock()
+    m_open_cache.return_value = cache
+
+    async def run_jobs(*args: Any, **kwargs: Any) -> int:
+        return failures
+
+    m_run_jobs.side_effect = run_jobs
+
+    assert (
+        run_batch(
+            [
+                str(jobfile),
+                "-j",
+                "7",
+                "--backend-uri",
+                "ws://localhost:1",
+                "--max-message-size",
+                "2",
+                "--shards",
+                "3",
+            ]
+        )
+        == expected
+    )
+    assert m_run_jobs.call_args.args[1:] == (cache, 7)
+    assert m_run_jobs.call_args.kwargs == {
+        "uri": "ws://localhost:1",
+        "max_size": 2 * 2**20,
+        "shards": 3,
+    }
+    cache.close.assert_called_once_with()
@@ -0,0 +1,79 @@
+from geneagrapher.compact import CompactGraph
+from geneagrapher.output.binary import HEADER, MAGIC, VERSION, BinaryOutput
+from geneagrapher.synthetic import make_geneagraph
+from geneagrapher.types import Geneagraph, RecordId
+
+import io
+import struct
+from typing import List
+from unittest.mock import sentinel as s
+
+
+def ints(data: bytes) -> List[int]:
+    return list(struct.unpack(f"<{len(data) // 4}i", data))
+
+
+class TestBinaryOutput:
+    def test_init(self) -> None:
+        bo = BinaryOutput(s.graph)
+        assert bo.graph == s.graph
+
+    def test_output(self) -> None:
+        graph: Geneagraph = {
+            "start_nodes": [RecordId(30)],
+            "nodes": {
+                RecordId(30): {
+                    "id": RecordId(30),
+                    "name": "Stüdent",
+                    "institution": "Uni",
+                    "year": 1950,
+                    "descendants": [],
+                    "advisors": [10],
+                },
+                RecordId(10): {
+                    "id": RecordId(10),
+                    "name": "Advisor",
+                    "institution": "Uni",
+                    "year": None,
+                    "descendants": [30],
+                    "advisors": [],
+                },
+            },
+            "status": "truncated",
+        }
+        output = BinaryOutput(graph).output
+
+        assert HEADER.unpack_from(output) == (MAGIC, VERSION, 1, 1, 2, 1, 1, 1, 18)
+        strings = output[-18:]
+        assert strings == "AdvisorStüdentUni".encode()
+        assert ints(output[HEADER.size : -18]) == [
+            30,  # start_nodes
+            10,  # ids
+            30,
+            -(2**31),  # years
+            1950,
+            0,  # institutions
+            0,
+            0,  # advisor_offsets
+            0,
+            1,
+            10,  # advisor_ids
+            0,  # descendant_offsets
+            1,
+            1,
+            30,  # descendant_ids
+            0,  # name_offsets
+            7,
+            15,
+            15,  # institution_offsets
+            18,
+        ]
+
+    def test_compact(self) -> None:
+        graph = make_geneagraph(500)
+        output = BinaryOutput(graph).output
+        assert BinaryOutput(CompactGraph.from_geneagraph(graph)).output == output
+
+        fp = io.BytesIO()
+        BinaryOutput(graph).write(fp)
+        assert fp.getvalue() == output
@@ -0,0 +1,149 @@
+from geneagrapher.cache import CACHE_FILENAME, RecordCache, default_cache_dir
+from geneagrapher.types import RecordId
+from tests.helpers import make_record
+
+from pathlib import Path
+import pytest
+from typing import Dict, List
+from unittest.mock import patch
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock() -> Clock:
+    return Clock()
+
+
+@pytest.fixture
+def cache(tmp_path: Path, clock: Clock) -> RecordCache:
+    return RecordCache(
+        tmp_path / "cache.sqlite3",
+        ttl=100,
+        max_records=3,
+        retention=200,
+        clock=clock,
+    )
+
+
+@pytest.mark.parametrize(
+    "platform,env,expected",
+    (
+        ["linux", {"XDG_CACHE_HOME": "/xdg"}, Path("/xdg/geneagrapher")],
+        ["linux", {}, Path("/home/u/.cache/geneagrapher")],
+        ["win32", {"LOCALAPPDATA": "/local"}, Path("/local/geneagrapher")],
+        ["win32", {}, Path("/home/u/AppData/Local/geneagrapher")],
+    ),
+)
+def test_default_cache_dir(platform: str, env: Dict[str, str], expected: Path) -> None:
+    with patch("geneagrapher.cache.sys.platform", platform), patch.dict(
+        "geneagrapher.cache.os.environ", env, clear=True
+    ), patch("geneagrapher.cache.Path.home", return_value=Path("/home/u")):
+        assert default_cache_dir() == expected
+
+
+class TestRecordCache:
+    def test_open(self, tmp_path: Path) -> None:
+        with RecordCache.open(tmp_path / "nested", ttl=5, max_records=7) as cache:
+            assert cache.path == tmp_path / "nested" / CACHE_FILENAME
+            assert cache.ttl == 5
+            assert cache.max_records == 7
+        assert (tmp_path / "nested" / CACHE_FILENAME).exists()
+
+    def test_round_trip(self, cache: RecordCache) -> None:
+        cache.put_many([make_record(1), make_record(2)])
+        assert len(cache) == 2
+        assert cache.get(RecordId(1)) == make_record(1)
+        assert cache.get(RecordId(3)) is None
+        assert cache.get_many([RecordId(1), RecordId(2), RecordId(3)]) == {
+            1: make_record(1),
+            2: make_record(2),
+        }
+
+    def test_persistent(self, tmp_path: Path) -> None:
+        with RecordCache.open(tmp_path) as cache:
+            cache.put_many([make_record(1)])
+        with RecordCache.open(tmp_path) as cache:
+            assert cache.get(RecordId(1)) == make_record(1)
+
+    def test_ttl(self, cache: RecordCache, clock: Clock) -> None:
+        cache.put_many([make_record(1)])
+        assert cache.fetched_at(RecordId(1)) == 1000.0
+
+        clock.now += 100
+        assert cache.get(RecordId(1)) == make_record(1)
+
+        clock.now += 1
+        assert cache.get(RecordId(1)) is None
+        # Expired entries are kept, and still reported by `fetched_at`,
+        # until they are older than the retention period.
+        cache.evict()
+        assert cache.fetched_at(RecordId(1)) == 1000.0
+
+        clock.now += 100
+        cache.evict()
+        assert cache.fetched_at(RecordId(1)) is None
+        assert len(cache) == 0
+
+    def test_shared_ttl(self, tmp_path: Path, clock: Clock) -> None:
+        path = tmp_path / "cache.sqlite3"
+        with RecordCache(path, ttl=100, clock=clock) as long_lived:
+            long_lived.put_many([make_record(1)])
+            clock.now += 50
+            # A run with a shorter time-to-live does not delete entries
+            # that runs with longer ones still use.
+            with RecordCache(path, ttl=10, clock=clock) as short_lived:
+                short_lived.put_many([make_record(2)])
+                assert short_lived.get(RecordId(1)) is None
+            assert long_lived.get(RecordId(1)) == make_record(1)
+
+    def test_ttl_longer_than_retention(self, tmp_path: Path, clock: Clock) -> None:
+        with RecordCache(
+            tmp_path / "cache.sqlite3", ttl=100, retention=10, clock=clock
+        ) as cache:
+            cache.put_many([make_record(1)])
+            clock.now += 50
+            cache.evict()
+            assert cache.get(RecordId(1)) == make_record(1)
+
+    def test_count(self, cache: RecordCache, clock: Clock) -> None:
+        cache.put_many([make_record(1), make_record(2), make_record(1)])
+        cache.put_many([make_record(2), make_record(3)])
+        clock.now += 1
+        cache.get(RecordId(1))
+        cache.put_many([make_record(4)])
+        assert len(cache) == 3
+        assert sorted(cache.get_many(map(RecordId, range(1, 5)))) == [1, 3, 4]
+
+    @pytest.mark.parametrize(
+        "touched,expected_remaining",
+        (
+            [[], [2, 3, 4]],
+            [[1], [1, 3, 4]],
+            [[1, 2], [1, 2, 4]],
+        ),
+    )
+    def test_lru_eviction(
+        self,
+        cache: RecordCache,
+        clock: Clock,
+        touched: List[int],
+        expected_remaining: List[int],
+    ) -> None:
+        cache.put_many([make_record(1), make_record(2), make_record(3)])
+        clock.now += 1
+        cache.get_many([RecordId(rid) for rid in touched])
+        clock.now += 1
+        cache.put_many([make_record(4)])
+
+        assert len(cache) == 3
+        assert (
+            sorted(cache.get_many([RecordId(rid) for rid in range(1, 5)]))
+            == expected_remaining
+        )
@@ -0,0 +1,95 @@
+from geneagrapher.checkpoint import Checkpoint, CheckpointError
+from geneagrapher.types import RecordId, StartNodeRequest
+from tests.helpers import make_graph, make_record
+
+from pathlib import Path
+import pytest
+from typing import List
+from unittest.mock import patch
+
+
+start_nodes: List[StartNodeRequest] = [
+    {"recordId": 2, "getAdvisors": True, "getDescendants": False},
+    {"recordId": 1, "getAdvisors": False, "getDescendants": True},
+]
+
+
+def test_resume(tmp_path: Path) -> None:
+    path = tmp_path / "build.ckpt"
+    checkpoint = Checkpoint(path, start_nodes)
+    assert checkpoint.records == {}
+    checkpoint.add(make_graph([1], map(make_record, [1, 2])))
+    checkpoint.add(make_graph([3], map(make_record, [3]), "truncated"))
+    checkpoint.close()
+
+    # The order of the start nodes does not matter.
+    resumed = Checkpoint(path, reversed(start_nodes), resume=True)
+    assert sorted(resumed.records) == [1, 2, 3]
+    assert resumed.records[RecordId(3)] == make_record(3)
+    assert resumed.truncated
+    resumed.add(make_graph([4], map(make_record, [4])))
+    resumed.close()
+
+    assert sorted(Checkpoint(path, start_nodes, resume=True).records) == [1, 2, 3, 4]
+
+
+def test_resume_missing(tmp_path: Path) -> None:
+    checkpoint = Checkpoint(tmp_path / "build.ckpt", start_nodes, resume=True)
+    assert checkpoint.records == {}
+    assert not checkpoint.truncated
+
+
+def test_no_resume(tmp_path: Path) -> None:
+    path = tmp_path / "build.ckpt"
+    checkpoint = Checkpoint(path, start_nodes)
+    checkpoint.add(make_graph([1], map(make_record, [1, 2])))
+    checkpoint.close()
+
+    assert Checkpoint(path, start_nodes).records == {}
+    assert Checkpoint(path, start_nodes, resume=True).records == {}
+
+
+def test_partial_line(tmp_path: Path) -> None:
+    path = tmp_path / "build.ckpt"
+    checkpoint = Checkpoint(path, start_nodes)
+    checkpoint.add(make_graph([1], map(make_record, [1, 2])))
+    checkpoint.close()
+    with open(path, "a") as f:
+        f.write('{"nodes": [{"id": 3, "na')
+
+    checkpoint = Checkpoint(path, start_nodes, resume=True)
+    assert sorted(checkpoint.records) == [1, 2]
+    checkpoint.close()
+    assert path.read_text().endswith("}\n")
+
+
+@pytest.mark.parametrize("header", ['{"startNodes": []}\n', "nonsense\n", ""])
+def test_different_build(tmp_path: Path, header: str) -> None:
+    path = tmp_path / "build.ckpt"
+    path.write_text(header)
+    with pytest.raises(CheckpointError):
+        Checkpoint(path, start_nodes, resume=True)
+    # The checkpoint is left alone.
+    assert path.read_text() == header
+
+
+def test_remove(tmp_path: Path) -> None:
+    path = tmp_path / "build.ckpt"
+    checkpoint = Checkpoint(path, start_nodes)
+    checkpoint.remove()
+    assert not path.exists()
+
+
+def test_cannot_open(tmp_path: Path) -> None:
+    with pytest.raises(CheckpointError, match="Cannot open checkpoint"):
+        Checkpoint(tmp_path / "missing" / "build.ckpt", start_nodes)
+    with pytest.raises(CheckpointError, match="Cannot open checkpoint"):
+        Checkpoint(tmp_path, start_nodes, resume=True)
+
+
+def test_cannot_write(tmp_path: Path) -> None:
+    checkpoint = Checkpoint(tmp_path / "build.ckpt", start_nodes)
+    with patch.object(checkpoint, "_file") as m_file:
+        m_file.write.side_effect = OSError(28, "No space left on device")
+        with pytest.raises(CheckpointError, match="Cannot write checkpoint"):
+            checkpoint.add(make_graph([1], map(make_record, [1])))
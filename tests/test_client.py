@@ -0,0 +1,142 @@
+from geneagrapher import GeneagrapherClient
+from geneagrapher.geneagrapher import GgrapherError, connect
+from geneagrapher.stub_backend import StubBackend
+from geneagrapher.synthetic import make_geneagraph
+from geneagrapher.timings import Timings
+from geneagrapher.traverse import traverse_local
+from geneagrapher.types import Geneagraph, StartNodeRequest
+
+import asyncio
+import pytest
+import pytest_asyncio
+from typing import AsyncIterator, List, Tuple
+from unittest.mock import MagicMock, patch
+
+
+@pytest.fixture
+def universe() -> Geneagraph:
+    return make_geneagraph(500, seed=3)
+
+
+@pytest_asyncio.fixture
+async def stub(universe: Geneagraph) -> AsyncIterator[Tuple[StubBackend, str]]:
+    backend = StubBackend(universe, latency=0.01, progress_steps=3)
+    async with backend.serve("localhost", 0) as server:
+        port = list(server.sockets)[0].getsockname()[1]
+        yield backend, f"ws://localhost:{port}"
+
+
+@pytest.fixture
+def m_connect() -> MagicMock:
+    return MagicMock(wraps=connect)
+
+
+def start_node(universe: Geneagraph, index: int) -> StartNodeRequest:
+    return {
+        "recordId": list(universe["nodes"])[index],
+        "getAdvisors": True,
+        "getDescendants": False,
+    }
+
+
+def expected(universe: Geneagraph, start_nodes: List[StartNodeRequest]) -> Geneagraph:
+    backend = StubBackend(universe)
+    return traverse_local(start_nodes, backend.lookup)[0]
+
+
+def test_pool_size() -> None:
+    with pytest.raises(ValueError):
+        GeneagrapherClient(pool_size=0)
+
+
+@pytest.mark.asyncio
+async def test_reuses_connection(
+    stub: Tuple[StubBackend, str], universe: Geneagraph, m_connect: MagicMock
+) -> None:
+    backend, uri = stub
+    with patch("geneagrapher.client.connect", m_connect):
+        async with GeneagrapherClient(uri) as client:
+            for i in (-1, -2, -3):
+                sn = start_node(universe, i)
+                assert await client.build_graph([sn]) == expected(universe, [sn])
+
+    assert backend.requests_served == 3
+    m_connect.assert_called_once_with(uri, None)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests(
+    stub: Tuple[StubBackend, str], universe: Geneagraph, m_connect: MagicMock
+) -> None:
+    backend, uri = stub
+    start_nodes = [start_node(universe, i) for i in range(-1, -7, -1)]
+    with patch("geneagrapher.client.connect", m_connect):
+        async with GeneagrapherClient(uri, pool_size=2) as client:
+            graphs = await asyncio.gather(
+                *(client.build_graph([sn]) for sn in start_nodes)
+            )
+
+    assert graphs == [expected(universe, [sn]) for sn in start_nodes]
+    assert backend.requests_served == 6
+    assert m_connect.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_progress(stub: Tuple[StubBackend, str], universe: Geneagraph) -> None:
+    _, uri = stub
+    progress = MagicMock()
+    timings = Timings()
+    async with GeneagrapherClient(uri) as client:
+        await client.build_graph(
+            [start_node(universe, -1)], progress=progress, timings=timings
+        )
+
+    assert progress.call_count == 3
+    assert timings.messages_received == 4
+    assert "connect" in timings.phases
+
+
+@pytest.mark.asyncio
+async def test_reconnects_closed_connection(
+    stub: Tuple[StubBackend, str], universe: Geneagraph, m_connect: MagicMock
+) -> None:
+    _, uri = stub
+    sn = start_node(universe, -1)
+    with patch("geneagrapher.client.connect", m_connect):
+        async with GeneagrapherClient(uri) as client:
+            await client.build_graph([sn])
+            # Simulate the backend dropping the idle connection.
+            await client._idle[0].close()
+            assert await client.build_graph([sn]) == expected(universe, [sn])
+
+    assert m_connect.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_bad_request(stub: Tuple[StubBackend, str]) -> None:
+    _, uri = stub
+    async with GeneagrapherClient(uri) as client:
+        with pytest.raises(GgrapherError) as exc_info:
+            await client.request({"kind": "nonsense"})  # type: ignore[typeddict-item]
+        assert exc_info.value.msg == "Request to Geneagrapher backend failed."
+        # The failed connection is not returned to the pool.
+        assert client._idle == []
+
+
+@pytest.mark.asyncio
+async def test_unavailable() -> None:
+    async with GeneagrapherClient("ws://localhost:1") as client:
+        with pytest.raises(GgrapherError) as exc_info:
+            await client.build_graph([])
+    assert exc_info.value.msg == "Geneagrapher backend is currently unavailable."
+
+
+@pytest.mark.asyncio
+async def test_closed(stub: Tuple[StubBackend, str], universe: Geneagraph) -> None:
+    _, uri = stub
+    client = GeneagrapherClient(uri)
+    await client.build_graph([start_node(universe, -1)])
+    await client.close()
+    assert client._idle == []
+    with pytest.raises(GgrapherError):
+        await client.build_graph([start_node(universe, -1)])
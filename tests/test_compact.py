@@ -0,0 +1,144 @@
+from geneagrapher.compact import (
+    CompactGraph,
+    CompactRecord,
+    as_record,
+    make_csr,
+)
+from geneagrapher.output.dot import DotOutput
+from geneagrapher.output.identity import IdentityOutput
+from geneagrapher.output.ndjson import NdjsonOutput
+from geneagrapher.synthetic import make_geneagraph
+from geneagrapher.types import Geneagraph, RecordId
+
+import json
+import pytest
+from typing import List
+
+
+@pytest.fixture
+def graph() -> Geneagraph:
+    return {
+        "start_nodes": [RecordId(30), RecordId(10)],
+        "nodes": {
+            RecordId(30): {
+                "id": RecordId(30),
+                "name": "Student",
+                "institution": "Uni",
+                "year": 1950,
+                "descendants": [],
+                "advisors": [10, 10, 99],
+            },
+            RecordId(10): {
+                "id": RecordId(10),
+                "name": "Advisor",
+                "institution": None,
+                "year": None,
+                "descendants": [30],
+                "advisors": [],
+            },
+        },
+        "status": "truncated",
+    }
+
+
+@pytest.mark.parametrize(
+    "rows,expected_offsets,expected_values",
+    (
+        [[], [0], []],
+        [[[]], [0, 0], []],
+        [[[1, 2], [], [3]], [0, 2, 2, 3], [1, 2, 3]],
+    ),
+)
+def test_make_csr(
+    rows: List[List[int]], expected_offsets: List[int], expected_values: List[int]
+) -> None:
+    offsets, values = make_csr(rows)
+    assert offsets.tolist() == expected_offsets
+    assert values.tolist() == expected_values
+
+
+class TestCompactGraph:
+    def test_round_trip(self, graph: Geneagraph) -> None:
+        compact = CompactGraph.from_geneagraph(graph)
+        assert compact.to_geneagraph() == graph
+
+    def test_round_trip_synthetic(self) -> None:
+        graph = make_geneagraph(2000)
+        assert CompactGraph.from_geneagraph(graph).to_geneagraph() == graph
+
+    @pytest.mark.parametrize("sort", [True, False])
+    def test_unsorted_records(self, sort: bool) -> None:
+        graph = make_geneagraph(2000)
+        records = list(graph["nodes"].values())
+        if sort:
+            records.sort(key=lambda r: r["id"])
+        compact = CompactGraph(iter(records), graph["start_nodes"], graph["status"])
+        assert list(compact.ids) == sorted(graph["nodes"])
+        assert compact.to_geneagraph() == graph
+
+    def test_indexing(self, graph: Geneagraph) -> None:
+        compact = CompactGraph.from_geneagraph(graph)
+        assert compact["start_nodes"] == [30, 10]
+        assert compact["status"] == "truncated"
+        with pytest.raises(KeyError):
+            compact["other"]  # type: ignore[call-overload]
+
+        nodes = compact["nodes"]
+        assert len(nodes) == 2
+        assert list(nodes) == [10, 30]
+        assert 10 in nodes
+        assert 11 not in nodes
+        assert 0 not in nodes
+        assert 1000 not in nodes
+        with pytest.raises(KeyError):
+            nodes[RecordId(11)]
+
+        record = nodes[RecordId(30)]
+        assert isinstance(record, CompactRecord)
+        assert record["id"] == 30
+        assert record["name"] == "Student"
+        assert record["institution"] == "Uni"
+        assert record["year"] == 1950
+        assert record["advisors"] == [10, 10, 99]
+        assert record["descendants"] == []
+        assert dict(record) == graph["nodes"][RecordId(30)]
+        with pytest.raises(KeyError):
+            record["other"]
+
+        assert nodes[RecordId(10)]["institution"] is None
+        assert nodes[RecordId(10)]["year"] is None
+
+    def test_interning(self) -> None:
+        compact = CompactGraph.from_geneagraph(make_geneagraph(500))
+        assert len(compact.institution_pool) < 10
+        assert len(compact.institutions) == 500
+
+    def test_as_record(self, graph: Geneagraph) -> None:
+        compact = CompactGraph.from_geneagraph(graph)
+        record = as_record(compact["nodes"][RecordId(30)])
+        assert type(record) is dict
+        assert record == graph["nodes"][RecordId(30)]
+
+        plain = graph["nodes"][RecordId(30)]
+        assert as_record(plain) is plain
+
+
+class TestFormatters:
+    def test_dot(self) -> None:
+        graph = make_geneagraph(1000)
+        compact = CompactGraph.from_geneagraph(graph)
+        assert DotOutput(compact).output == DotOutput(graph).output
+
+    def test_identity(self) -> None:
+        graph = make_geneagraph(1000)
+        compact = CompactGraph.from_geneagraph(graph)
+        assert json.loads(IdentityOutput(compact).output) == json.loads(
+            IdentityOutput(graph).output
+        )
+
+    def test_ndjson(self) -> None:
+        graph = make_geneagraph(1000)
+        compact = CompactGraph.from_geneagraph(graph)
+        assert sorted(NdjsonOutput(compact).output.splitlines()) == sorted(
+            NdjsonOutput(graph).output.splitlines()
+        )
@@ -0,0 +1,165 @@
+from geneagrapher.compact import CompactGraph
+from geneagrapher.components import (
+    INDEX_FILE,
+    DisjointSets,
+    Part,
+    connected_components,
+    plan_parts,
+    subgraph,
+    write_components,
+)
+from geneagrapher.output.dot import DotOutput
+from geneagrapher.synthetic import make_geneagraph
+from geneagrapher.types import Geneagraph, RecordId
+from tests.helpers import make_record
+
+import json
+from pathlib import Path
+import pytest
+from typing import Dict, List, Set, Tuple
+
+
+# Components: {1, 2, 3, 4} (4 advised by 3, which was advised by 1 and
+# 2), {5, 6}, and {7}, whose advisor 8 is not in the graph.
+GRAPH: Geneagraph = {
+    "start_nodes": [RecordId(4), RecordId(7)],
+    "nodes": {
+        RecordId(r["id"]): r
+        for r in [
+            make_record(4, [3]),
+            make_record(6, [5]),
+            make_record(3, [1, 2]),
+            make_record(7, [8]),
+            make_record(1, []),
+            make_record(5, []),
+            make_record(2, []),
+        ]
+    },
+    "status": "complete",
+}
+
+
+def reference_components(graph: Geneagraph) -> List[Set[RecordId]]:
+    """Find the components of `graph` by depth-first search."""
+    neighbors: Dict[RecordId, Set[RecordId]] = {rid: set() for rid in graph["nodes"]}
+    for rid, record in graph["nodes"].items():
+        for advisor_id in record["advisors"]:
+            if advisor_id in neighbors:
+                neighbors[rid].add(RecordId(advisor_id))
+                neighbors[RecordId(advisor_id)].add(rid)
+    components = []
+    seen: Set[RecordId] = set()
+    for rid in neighbors:
+        if rid in seen:
+            continue
+        component = set()
+        stack = [rid]
+        while stack:
+            node = stack.pop()
+            if node not in component:
+                component.add(node)
+                stack.extend(neighbors[node] - component)
+        seen |= component
+        components.append(component)
+    return components
+
+
+def test_disjoint_sets() -> None:
+    sets = DisjointSets(6)
+    sets.union(0, 1)
+    sets.union(2, 3)
+    sets.union(1, 3)
+    sets.union(3, 0)
+    assert len({sets.find(i) for i in range(4)}) == 1
+    assert len({sets.find(i) for i in range(6)}) == 3
+    assert sets.size[sets.find(0)] == 4
+
+
+def test_connected_components() -> None:
+    assert connected_components(GRAPH) == [[1, 2, 3, 4], [5, 6], [7]]
+    assert connected_components(CompactGraph.from_geneagraph(GRAPH)) == [
+        [1, 2, 3, 4],
+        [5, 6],
+        [7],
+    ]
+
+
+def test_connected_components_synthetic() -> None:
+    graph = make_geneagraph(2000, seed=3)
+    components = connected_components(graph)
+    assert sorted(map(set, components), key=min) == sorted(
+        reference_components(graph), key=min
+    )
+    assert [len(c) for c in components] == sorted(
+        (len(c) for c in components), reverse=True
+    )
+
+
+@pytest.mark.parametrize(
+    "min_size,expected",
+    (
+        [
+            1,
+            [
+                ("component-1.dot", [1, 2, 3, 4], 1),
+                ("component-2.dot", [5, 6], 1),
+                ("component-3.dot", [7], 1),
+            ],
+        ],
+        [
+            3,
+            [
+                ("component-1.dot", [1, 2, 3, 4], 1),
+                ("small-components.dot", [5, 6, 7], 2),
+            ],
+        ],
+        [5, [("small-components.dot", [1, 2, 3, 4, 5, 6, 7], 3)]],
+    ),
+)
+def test_plan_parts(min_size: int, expected: List[Tuple[str, List[int], int]]) -> None:
+    assert plan_parts(connected_components(GRAPH), min_size) == [
+        Part(file, [RecordId(rid) for rid in record_ids], components)
+        for file, record_ids, components in expected
+    ]
+
+
+def test_plan_parts_names() -> None:
+    components = [[RecordId(i)] for i in range(12)]
+    names = [part.file for part in plan_parts(components)]
+    assert names[0] == "component-01.dot"
+    assert names[-1] == "component-12.dot"
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+@pytest.mark.parametrize("compact", [False, True])
+def test_write_components(tmp_path: Path, jobs: int, compact: bool) -> None:
+    graph = make_geneagraph(500, seed=1)
+    start_node = graph["start_nodes"][0]
+    directory = tmp_path / "components"
+    index = write_components(
+        CompactGraph.from_geneagraph(graph) if compact else graph,
+        directory,
+        min_size=2,
+        jobs=jobs,
+    )
+
+    components = connected_components(graph)
+    parts = plan_parts(components, 2)
+    assert json.loads((directory / INDEX_FILE).read_text()) == index
+    assert index["records"] == 500
+    assert index["components"] == len(components)
+    assert [entry["file"] for entry in index["files"]] == [p.file for p in parts]
+    assert sum(entry["records"] for entry in index["files"]) == 500
+    assert [rid for entry in index["files"] for rid in entry["start_nodes"]] == [
+        start_node
+    ]
+    for part in parts:
+        expected = DotOutput(subgraph(graph, part.record_ids, {start_node}))
+        assert (directory / part.file).read_text() == expected.output + "\n"
+
+
+def test_write_components_empty(tmp_path: Path) -> None:
+    graph: Geneagraph = {"start_nodes": [], "nodes": {}, "status": "truncated"}
+    index = write_components(graph, tmp_path)
+    assert index == {"status": "truncated", "records": 0, "components": 0, "files": []}
+    assert sorted(p.name for p in tmp_path.iterdir()) == [INDEX_FILE]
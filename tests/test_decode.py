@@ -0,0 +1,149 @@
+from geneagrapher.decode import (
+    decode_graph,
+    decode_response,
+    default_loads,
+    find_backend,
+    load_backend,
+)
+
+import gc
+import json
+import pytest
+from typing import Any, Iterator, cast
+from unittest.mock import MagicMock, patch, sentinel as s
+
+
+@pytest.fixture(autouse=True)
+def clear_default_loads() -> Iterator[None]:
+    default_loads.cache_clear()
+    yield
+    default_loads.cache_clear()
+
+
+def test_load_backend_json() -> None:
+    assert load_backend("json") is json.loads
+
+
+@patch("geneagrapher.decode.importlib.import_module")
+def test_load_backend_orjson(m_import_module: MagicMock) -> None:
+    m_import_module.return_value.loads = s.loads
+    assert load_backend("orjson") is s.loads
+    m_import_module.assert_called_once_with("orjson")
+
+
+@patch("geneagrapher.decode.importlib.import_module")
+def test_load_backend_msgspec(m_import_module: MagicMock) -> None:
+    m_import_module.return_value.json.decode = s.decode
+    assert load_backend("msgspec") is s.decode
+    m_import_module.assert_called_once_with("msgspec")
+
+
+@pytest.mark.parametrize(
+    "installed,expected",
+    (
+        [{"orjson", "msgspec"}, "orjson"],
+        [{"msgspec"}, "msgspec"],
+        [set(), "json"],
+    ),
+)
+def test_find_backend(installed: Any, expected: str) -> None:
+    def load_backend(name: str) -> Any:
+        if name != "json" and name not in installed:
+            raise ImportError()
+        return name
+
+    with patch("geneagrapher.decode.load_backend", side_effect=load_backend):
+        name, loads = find_backend()
+        assert name == expected
+        assert loads is cast(Any, expected)
+
+
+@patch("geneagrapher.decode.load_backend", side_effect=ImportError)
+def test_find_backend_preferred_missing(m_load_backend: MagicMock) -> None:
+    with pytest.raises(ImportError):
+        find_backend("orjson")
+    m_load_backend.assert_called_once_with("orjson")
+
+
+@pytest.mark.parametrize("backend", ["json", "orjson", "msgspec"])
+def test_decode_response(backend: str) -> None:
+    try:
+        loads = load_backend(backend)
+    except ImportError:
+        pytest.skip(f"{backend} is not installed")
+
+    record = {
+        "id": 6,
+        "name": "Name",
+        "institution": None,
+        "year": None,
+        "descendants": [],
+        "advisors": [],
+        # An object with a `nodes` key inside a record is left alone.
+        "extra": {"nodes": {"1": 2}},
+    }
+    message = json.dumps(
+        {
+            "kind": "graph",
+            "payload": {
+                "start_nodes": [6],
+                "nodes": {"6": record},
+                "status": "complete",
+            },
+        }
+    )
+
+    with patch("geneagrapher.decode.default_loads", return_value=loads):
+        for m in (message, message.encode()):
+            assert decode_response(m) == {
+                "kind": "graph",
+                "payload": {
+                    "start_nodes": [6],
+                    "nodes": {6: record},
+                    "status": "complete",
+                },
+            }
+
+
+@pytest.mark.parametrize(
+    "message",
+    (
+        {"kind": "progress", "payload": {"queued": 1, "fetching": 2, "done": 3}},
+        {"kind": "something"},
+    ),
+)
+def test_decode_response_other(message: Any) -> None:
+    assert decode_response(json.dumps(message)) == message
+
+
+@pytest.mark.parametrize("enabled", [True, False])
+def test_decode_response_gc(enabled: bool) -> None:
+    def loads(message: str) -> Any:
+        assert not gc.isenabled()
+        return json.loads(message)
+
+    (gc.enable if enabled else gc.disable)()
+    try:
+        with patch("geneagrapher.decode.default_loads", return_value=loads):
+            decode_response('{"kind": "something"}')
+        assert gc.isenabled() is enabled
+    finally:
+        gc.enable()
+
+
+def test_decode_graph() -> None:
+    graph = {"start_nodes": [6], "nodes": {"6": {"id": 6}}, "status": "truncated"}
+    assert decode_graph(json.dumps(graph).encode()) == {
+        "start_nodes": [6],
+        "nodes": {6: {"id": 6}},
+        "status": "truncated",
+    }
+
+
+@pytest.mark.parametrize(
+    "document",
+    ["[]", '{"start_nodes": [], "nodes": [], "status": "complete"}', "{", ""],
+)
+def test_decode_graph_invalid(document: str) -> None:
+    with pytest.raises(ValueError):
+        decode_graph(document)
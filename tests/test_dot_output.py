@@ -1,9 +1,16 @@
-from geneagrapher.output.dot import DotOutput, make_edge_str, make_node_str
+from geneagrapher.output.dot import (
+    DotOutput,
+    join_lines,
+    make_edge_str,
+    make_edge_strs,
+    make_node_str,
+)
 from geneagrapher.types import Geneagraph, Record, RecordId
 
+import io
 from itertools import zip_longest
 import pytest
-from typing import List
+from typing import Container, Dict, Iterable, Iterator, List
 from unittest.mock import MagicMock, call, patch, sentinel as s
 
 
@@ -115,27 +122,64 @@ def test_make_edge_str(
         assert edge_str == expected_edge_str
 
 
+@pytest.mark.parametrize(
+    "num_lines,size,expected",
+    (
+        [0, 2, []],
+        [1, 2, ["l0"]],
+        [2, 2, ["l0\n    l1"]],
+        [3, 2, ["l0\n    l1", "\n    ", "l2"]],
+        [4, 2, ["l0\n    l1", "\n    ", "l2\n    l3"]],
+    ),
+)
+def test_join_lines(num_lines: int, size: int, expected: List[str]) -> None:
+    lines = [f"l{i}" for i in range(num_lines)]
+    assert list(join_lines(lines, size)) == expected
+    assert "".join(join_lines(lines, size)) == "\n    ".join(lines)
+
+
+def test_make_edge_strs() -> None:
+    records: List[Record] = [
+        {
+            "id": RecordId(rid),
+            "name": "The Name",
+            "institution": None,
+            "year": None,
+            "descendants": [],
+            "advisors": advisors,
+        }
+        for rid, advisors in [(3, [1, 2, 1]), (2, [1, 9]), (1, [])]
+    ]
+    assert sorted(make_edge_strs(records, {1, 2, 3})) == [
+        "1 -> 2;",
+        "1 -> 3;",
+        "2 -> 3;",
+    ]
+
+
 class TestDotOutput:
     def test_init(self) -> None:
         do = DotOutput(s.graph)
         assert do.graph == s.graph
 
-    @patch(
-        "geneagrapher.output.dot.make_edge_str",
-        side_effect=[
-            iter(["edge1"]),
-            iter(["edge2"]),
-            iter(["edge3"]),
-            iter(["edge4"]),
-        ],
-    )
+    @patch("geneagrapher.output.dot.make_edge_strs")
     @patch(
         "geneagrapher.output.dot.make_node_str",
         side_effect=["node1", "node2", "node3", "node4"],
     )
     def test_output(
-        self, m_make_node_str: MagicMock, m_make_edge_str: MagicMock
+        self, m_make_node_str: MagicMock, m_make_edge_strs: MagicMock
     ) -> None:
+        edge_records: List[Record] = []
+
+        def make_edge_strs(
+            records: Iterable[Record], node_ids: Container[int]
+        ) -> Iterator[str]:
+            edge_records.extend(records)
+            return iter(["edge1", "edge2", "edge3", "edge4"])
+
+        m_make_edge_strs.side_effect = make_edge_strs
+
         graph: Geneagraph = {
             "start_nodes": [],
             "nodes": {
@@ -198,9 +242,67 @@ class TestDotOutput:
             call(graph["nodes"][RecordId(1002)]),
             call(graph["nodes"][RecordId(1003)]),
         ]
-        assert m_make_edge_str.call_args_list == [
-            call(graph["nodes"][RecordId(999)], graph),
-            call(graph["nodes"][RecordId(1003)], graph),
-            call(graph["nodes"][RecordId(1002)], graph),
-            call(graph["nodes"][RecordId(1000)], graph),
+        m_make_edge_strs.assert_called_once()
+        assert m_make_edge_strs.call_args.args[1] is graph["nodes"]
+        assert edge_records == [
+            graph["nodes"][RecordId(999)],
+            graph["nodes"][RecordId(1003)],
+            graph["nodes"][RecordId(1002)],
+            graph["nodes"][RecordId(1000)],
         ]
+
+    @pytest.mark.parametrize(
+        "nodes,expected",
+        (
+            [
+                {},
+                """digraph {
+    graph [ordering="out"];
+    node [shape=plaintext];
+    edge [style=bold];
+
+    
+
+    
+}""",  # noqa: W293
+            ],
+            [
+                {
+                    RecordId(2): {
+                        "id": RecordId(2),
+                        "name": "Student",
+                        "institution": "Uni",
+                        "year": 1950,
+                        "descendants": [],
+                        "advisors": [1, 1, 3],
+                    },
+                    RecordId(1): {
+                        "id": RecordId(1),
+                        "name": "Advisor",
+                        "institution": None,
+                        "year": 1920,
+                        "descendants": [2],
+                        "advisors": [],
+                    },
+                },
+                r"""digraph {
+    graph [ordering="out"];
+    node [shape=plaintext];
+    edge [style=bold];
+
+    1 [label="Advisor\n(1920)"];
+    2 [label="Student\nUni (1950)"];
+
+    1 -> 2;
+}""",
+            ],
+        ),
+    )
+    def test_write(self, nodes: Dict[RecordId, Record], expected: str) -> None:
+        graph: Geneagraph = {"start_nodes": [], "nodes": nodes, "status": "complete"}
+        do = DotOutput(graph)
+        assert do.output == expected
+
+        fp = io.StringIO()
+        do.write(fp)
+        assert fp.getvalue() == expected
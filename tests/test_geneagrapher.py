@@ -1,24 +1,50 @@
+from benchmarks.bench_import import (
+    DEFERRED_MODULES,
+    IMPORT_BUDGET,
+    STARTUP_MODULES,
+    fastest_import,
+    startup_time,
+)
+from geneagrapher.cache import RecordCache
+from geneagrapher.checkpoint import Checkpoint
+from geneagrapher.client import GeneagrapherClient
 from geneagrapher.geneagrapher import (
     GgrapherError,
     OutputFormatter,
     RequestPayload,
     StartNodeArg,
-    StartNodeRequest,
+    TextFormat,
     get_formatter,
     get_graph,
+    get_graph_cached,
+    get_graph_sharded,
     get_version,
     make_payload,
+    merge_graphs,
+    open_cache,
+    run,
+    shard_start_nodes,
+    write_graph,
 )
+from geneagrapher.output.binary import BinaryOutput
 from geneagrapher.output.dot import DotOutput
 from geneagrapher.output.identity import IdentityOutput
-from geneagrapher.types import Geneagraph, RecordId
+from geneagrapher.output.ndjson import NdjsonOutput
+from geneagrapher.timings import Timings
+from geneagrapher.types import Geneagraph, RecordId, StartNodeRequest
+from tests.helpers import make_record, sn
 
+from argparse import Namespace
+import asyncio
 from importlib.metadata import PackageNotFoundError
+import io
 import json
+from pathlib import Path
 import pytest
-from typing import Dict, List, Literal, Type
+from typing import Any, Dict, Iterator, List, Literal, Optional, Tuple, Type
 from unittest.mock import AsyncMock, MagicMock, patch, sentinel as s
-from websockets.exceptions import WebSocketException
+from websockets.exceptions import ConnectionClosed, WebSocketException
+from websockets.frames import Close
 
 
 class TestStartNodeArg:
@@ -120,24 +146,186 @@ following in the issue body:
             assert str(e) == expected_str.format(command=" ".join(command))
 
 
-@pytest.mark.parametrize("start_nodes", ([], ["32:a"], ["32:d", "14:a"]))
+@pytest.mark.parametrize(
+    "start_nodes,expected",
+    (
+        [[], []],
+        [["32:a"], [(32, True, False)]],
+        [["32:d", "14:a"], [(14, True, False), (32, False, True)]],
+        [["2:a", "1:a", "1:a"], [(1, True, False), (2, True, False)]],
+        [["7:a", "7:d", "3:ad"], [(3, True, True), (7, True, True)]],
+    ),
+)
 @pytest.mark.parametrize("quiet", [True, False])
-def test_make_payload(start_nodes: List[str], quiet: bool) -> None:
+def test_make_payload(
+    start_nodes: List[str], expected: List[Tuple[int, bool, bool]], quiet: bool
+) -> None:
     start_node_args = [StartNodeArg(sn) for sn in start_nodes]
-    assert make_payload(start_node_args, quiet) == {
+    assert make_payload((sn.start_node for sn in start_node_args), quiet) == {
         "kind": "build-graph",
         "options": {"reportingCallback": not quiet},
-        "startNodes": [sn.start_node for sn in start_node_args],
+        "startNodes": [
+            {"recordId": rid, "getAdvisors": a, "getDescendants": d}
+            for rid, a, d in expected
+        ],
+    }
+
+
+def test_make_payload_limits() -> None:
+    payload = make_payload(
+        [StartNodeArg("3:a").start_node], True, max_nodes=10, max_depth=0
+    )
+    assert payload["options"] == {
+        "reportingCallback": False,
+        "maxNodes": 10,
+        "maxDepth": 0,
     }
 
 
+@pytest.mark.parametrize(
+    "args", (["--max-nodes", "0"], ["--max-depth", "-1"], ["--timeout", "0"])
+)
+def test_run_bad_limits(args: List[str], capsys: pytest.CaptureFixture[str]) -> None:
+    with patch("geneagrapher.geneagrapher.sys.argv", ["ggrapher"] + args + ["1:a"]):
+        with pytest.raises(SystemExit) as e:
+            run()
+    assert e.value.code == 2
+    assert f"argument {args[0]}" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize(
+    "args,ids_file,stdin,expected",
+    (
+        [
+            ["--ids-from", "ids.txt"],
+            "3:d 1\n",
+            "",
+            [(1, True, False), (3, False, True)],
+        ],
+        [
+            ["2:a", "--ids-from", "ids.csv"],
+            "id,direction\n2,d\n1,a\n",
+            "",
+            [(1, True, False), (2, True, True)],
+        ],
+        [["--ids-from", "-"], "", "5:ad\n5:a\n", [(5, True, True)]],
+    ),
+)
+@patch("geneagrapher.geneagrapher.get_graph_cached")
+def test_run_ids_from(
+    m_get_graph_cached: AsyncMock,
+    args: List[str],
+    ids_file: str,
+    stdin: str,
+    expected: List[Tuple[int, bool, bool]],
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    ids_path = next((a for a in args if a.startswith("ids.")), None)
+    if ids_path is not None:
+        (tmp_path / ids_path).write_text(ids_file)
+    m_get_graph_cached.return_value = {
+        "start_nodes": [],
+        "nodes": {},
+        "status": "complete",
+    }
+    argv = ["ggrapher", "--no-cache", "-q", "-o", "out.dot"] + args
+    with patch("geneagrapher.geneagrapher.sys.argv", argv), patch(
+        "geneagrapher.geneagrapher.sys.stdin", io.StringIO(stdin)
+    ):
+        run()
+    payload = m_get_graph_cached.call_args.args[0]
+    assert payload["startNodes"] == [
+        {"recordId": rid, "getAdvisors": a, "getDescendants": d}
+        for rid, a, d in expected
+    ]
+
+
+@pytest.mark.parametrize(
+    "args,ids_file,message",
+    (
+        [[], None, "the following arguments are required: ID (or --ids-from)"],
+        [["--ids-from", "ids.txt"], "", "the following arguments are required"],
+        [["--ids-from", "ids.txt"], "1:a\n2:x\n", "line 2: invalid start node"],
+        [["--ids-from", "missing.txt"], None, "argument --ids-from: [Errno 2]"],
+    ),
+)
+def test_run_ids_from_errors(
+    args: List[str],
+    ids_file: Optional[str],
+    message: str,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    if ids_file is not None:
+        (tmp_path / "ids.txt").write_text(ids_file)
+    with patch("geneagrapher.geneagrapher.sys.argv", ["ggrapher"] + args):
+        with pytest.raises(SystemExit) as e:
+            run()
+    assert e.value.code == 2
+    assert message in capsys.readouterr().err
+
+
+@patch("geneagrapher.geneagrapher.get_graph_cached")
+def test_run_checkpoint_unwritable(
+    m_get_graph_cached: AsyncMock,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    argv = ["ggrapher", "--no-cache", "-q", "--checkpoint", "missing/build.ckpt"]
+    with patch("geneagrapher.geneagrapher.sys.argv", argv + ["1:a"]):
+        run()
+    m_get_graph_cached.assert_not_called()
+    assert "Cannot open checkpoint missing/build.ckpt" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("cache_dir", ["file", "file/cache"])
+def test_open_cache_unusable(
+    cache_dir: str, tmp_path: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    (tmp_path / "file").write_text("")
+    args = Namespace(no_cache=False, cache_dir=tmp_path / cache_dir, cache_ttl=1.0)
+    assert open_cache(args) is None
+    assert "Warning: cannot open the record cache" in capsys.readouterr().err
+
+
+def test_open_cache(tmp_path: Path) -> None:
+    args = Namespace(no_cache=False, cache_dir=tmp_path, cache_ttl=1.0)
+    cache = open_cache(args)
+    assert isinstance(cache, RecordCache)
+    cache.close()
+    assert open_cache(Namespace(no_cache=True)) is None
+
+
 class TestGetGraph:
+    @pytest.mark.asyncio
+    @patch("websockets.client.connect")
+    async def test_client(self, m_ws_connect: MagicMock) -> None:
+        client = MagicMock()
+        client.request = AsyncMock(return_value=s.graph)
+        payload: RequestPayload = {
+            "kind": "build-graph",
+            "options": {"reportingCallback": True},
+            "startNodes": [],
+        }
+        graph = await get_graph(
+            payload, timings=s.timings, progress=s.progress, client=client
+        )
+        assert graph is s.graph
+        client.request.assert_awaited_once_with(
+            payload, progress=s.progress, timings=s.timings
+        )
+        m_ws_connect.assert_not_called()
+
     @pytest.mark.asyncio
     @patch("geneagrapher.geneagrapher.get_version", return_value="test")
-    @patch(
-        "geneagrapher.geneagrapher.platform.python_version", return_value="python-test"
-    )
-    @patch("geneagrapher.geneagrapher.websockets.client.connect")
+    @patch("platform.python_version", return_value="python-test")
+    @patch("websockets.client.connect")
     async def test_good(
         self,
         m_ws_connect: AsyncMock,
@@ -175,7 +363,9 @@ class TestGetGraph:
             assert await get_graph(request_payload) == response_payload["payload"]
 
         m_ws_connect.assert_called_once_with(
-            s.uri, user_agent_header="Python/python-test Geneagrapher/test"
+            s.uri,
+            user_agent_header="Python/python-test Geneagrapher/test",
+            max_size=None,
         )
         m_python_version.assert_called_once_with()
         m_get_version.assert_called_once_with()
@@ -184,10 +374,8 @@ class TestGetGraph:
 
     @pytest.mark.asyncio
     @patch("geneagrapher.geneagrapher.get_version", return_value="test")
-    @patch(
-        "geneagrapher.geneagrapher.platform.python_version", return_value="python-test"
-    )
-    @patch("geneagrapher.geneagrapher.websockets.client.connect")
+    @patch("platform.python_version", return_value="python-test")
+    @patch("websockets.client.connect")
     async def test_bad_request(
         self,
         m_ws_connect: AsyncMock,
@@ -215,7 +403,9 @@ class TestGetGraph:
         assert exc_info.value.extra == {"Response": response_payload_json}
 
         m_ws_connect.assert_called_once_with(
-            s.uri, user_agent_header="Python/python-test Geneagrapher/test"
+            s.uri,
+            user_agent_header="Python/python-test Geneagrapher/test",
+            max_size=None,
         )
         m_python_version.assert_called_once_with()
         m_get_version.assert_called_once_with()
@@ -224,10 +414,8 @@ class TestGetGraph:
 
     @pytest.mark.asyncio
     @patch("geneagrapher.geneagrapher.get_version", return_value="test")
-    @patch(
-        "geneagrapher.geneagrapher.platform.python_version", return_value="python-test"
-    )
-    @patch("geneagrapher.geneagrapher.websockets.client.connect")
+    @patch("platform.python_version", return_value="python-test")
+    @patch("websockets.client.connect")
     async def test_bad_socket(
         self,
         m_ws_connect: AsyncMock,
@@ -251,28 +439,682 @@ class TestGetGraph:
         assert exc_info.value.msg == "Geneagrapher backend is currently unavailable."
 
         m_ws_connect.assert_called_once_with(
-            s.uri, user_agent_header="Python/python-test Geneagrapher/test"
+            s.uri,
+            user_agent_header="Python/python-test Geneagrapher/test",
+            max_size=None,
         )
 
         m_python_version.assert_called_once_with()
         m_get_version.assert_called_once_with()
 
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        "sent,expected_msg",
+        (
+            [
+                Close(1009, ""),
+                "The response from the Geneagrapher backend is larger than the \
+maximum message size of 1.5 MiB. Use the --max-message-size option to raise the \
+limit.",
+            ],
+            [Close(1011, ""), "Geneagrapher backend is currently unavailable."],
+            [None, "Geneagrapher backend is currently unavailable."],
+        ),
+    )
+    @patch("websockets.client.connect")
+    async def test_connection_closed(
+        self, m_ws_connect: AsyncMock, sent: Optional[Close], expected_msg: str
+    ) -> None:
+        request_payload: RequestPayload = {
+            "kind": "build-graph",
+            "options": {"reportingCallback": True},
+            "startNodes": [
+                {"recordId": 6, "getAdvisors": True, "getDescendants": False}
+            ],
+        }
+
+        ws_conn = AsyncMock()
+        ws_conn.recv.side_effect = ConnectionClosed(None, sent)
+        m_ws_connect.return_value.__aenter__.return_value = ws_conn
+
+        with pytest.raises(GgrapherError) as exc_info:
+            await get_graph(request_payload, max_size=3 * 2**19)
+
+        assert exc_info.value.msg == expected_msg
+        assert m_ws_connect.call_args.kwargs["max_size"] == 3 * 2**19
+
+    @pytest.mark.asyncio
+    @patch("geneagrapher.geneagrapher.display_progress")
+    @patch("websockets.client.connect")
+    async def test_timings(
+        self, m_ws_connect: AsyncMock, m_display_progress: MagicMock
+    ) -> None:
+        request_payload: RequestPayload = {
+            "kind": "build-graph",
+            "options": {"reportingCallback": True},
+            "startNodes": [
+                {"recordId": 6, "getAdvisors": True, "getDescendants": False}
+            ],
+        }
+        graph: Geneagraph = {
+            "start_nodes": [RecordId(6)],
+            "nodes": {},
+            "status": "complete",
+        }
+        messages = [
+            json.dumps(
+                {"kind": "progress", "payload": {"queued": 1, "fetching": 0, "done": 0}}
+            ),
+            json.dumps({"kind": "graph", "payload": graph}),
+        ]
+
+        ws_conn = AsyncMock()
+        ws_conn.recv.side_effect = messages
+        m_ws_connect.return_value.__aenter__.return_value = ws_conn
+
+        timings = Timings()
+        assert await get_graph(request_payload, timings=timings) == graph
+
+        assert set(timings.phases) == {"connect", "backend", "decode"}
+        assert timings.messages_received == 2
+        assert timings.bytes_received == sum(len(m) for m in messages)
+        assert timings.first_progress is not None
+        assert timings.final_graph is not None
+        assert timings.first_progress <= timings.final_graph
+
 
 @pytest.mark.parametrize(
-    "format,formatter_type", [("dot", DotOutput), ("json", IdentityOutput)]
+    "num_start_nodes,shards,expected",
+    (
+        [0, 3, []],
+        [1, 3, [[0]]],
+        [5, 1, [[0, 1, 2, 3, 4]]],
+        [5, 2, [[0, 2, 4], [1, 3]]],
+        [3, 5, [[0], [1], [2]]],
+    ),
+)
+def test_shard_start_nodes(
+    num_start_nodes: int, shards: int, expected: List[List[int]]
+) -> None:
+    start_nodes = [sn(i, True, False) for i in range(num_start_nodes)]
+    assert shard_start_nodes(start_nodes, shards) == [
+        [sn(i, True, False) for i in part] for part in expected
+    ]
+
+
+@pytest.mark.parametrize(
+    "num_start_nodes,shards,max_shard_size,expected",
+    (
+        [4, 2, 2, [[0, 2], [1, 3]]],
+        [5, 1, 2, [[0, 3], [1, 4], [2]]],
+        [5, 2, 10, [[0, 2, 4], [1, 3]]],
+    ),
+)
+def test_shard_start_nodes_max_size(
+    num_start_nodes: int, shards: int, max_shard_size: int, expected: List[List[int]]
+) -> None:
+    start_nodes = [sn(i, True, False) for i in range(num_start_nodes)]
+    assert shard_start_nodes(start_nodes, shards, max_shard_size) == [
+        [sn(i, True, False) for i in part] for part in expected
+    ]
+
+
+def test_merge_graphs() -> None:
+    a: Geneagraph = {
+        "start_nodes": [RecordId(1)],
+        "nodes": {RecordId(1): make_record(1, [3]), RecordId(3): make_record(3, [])},
+        "status": "complete",
+    }
+    b: Geneagraph = {
+        "start_nodes": [RecordId(2)],
+        "nodes": {RecordId(2): make_record(2, [3]), RecordId(3): make_record(3, [])},
+        "status": "complete",
+    }
+    merged = merge_graphs([sn(1, True, False), sn(2, True, False)], [a, b])
+    assert merged == {
+        "start_nodes": [1, 2],
+        "nodes": {
+            1: make_record(1, [3]),
+            2: make_record(2, [3]),
+            3: make_record(3, []),
+        },
+        "status": "complete",
+    }
+
+    b["status"] = "truncated"
+    assert (
+        merge_graphs([sn(1, True, False), sn(2, True, False)], [a, b])["status"]
+        == "truncated"
+    )
+
+
+class TestGetGraphSharded:
+    payload: RequestPayload = {
+        "kind": "build-graph",
+        "options": {"reportingCallback": True},
+        "startNodes": [sn(1, True, False), sn(2, True, False), sn(3, True, False)],
+    }
+
+    @staticmethod
+    def graph_for(payload: RequestPayload) -> Geneagraph:
+        ids = [RecordId(n["recordId"]) for n in payload["startNodes"]]
+        return {
+            "start_nodes": ids,
+            "nodes": {rid: make_record(rid, []) for rid in ids},
+            "status": "complete",
+        }
+
+    @pytest.mark.asyncio
+    @patch("geneagrapher.geneagrapher.get_graph")
+    async def test_one_shard(self, m_get_graph: AsyncMock) -> None:
+        m_get_graph.return_value = s.graph
+        assert (
+            await get_graph_sharded(
+                self.payload,
+                1,
+                uri=s.uri,
+                max_size=s.max_size,
+                timings=s.timings,
+                progress=s.progress,
+                client=s.client,
+            )
+            == s.graph
+        )
+        m_get_graph.assert_called_once_with(
+            self.payload,
+            uri=s.uri,
+            max_size=s.max_size,
+            timings=s.timings,
+            progress=s.progress,
+            client=s.client,
+        )
+
+    @pytest.mark.asyncio
+    @patch("geneagrapher.geneagrapher.display_progress")
+    @patch("geneagrapher.geneagrapher.get_graph")
+    async def test_shards(
+        self, m_get_graph: AsyncMock, m_display_progress: MagicMock
+    ) -> None:
+        async def get_graph(payload: RequestPayload, **kwargs: Any) -> Geneagraph:
+            kwargs["progress"](len(payload["startNodes"]), 0, 1)
+            return self.graph_for(payload)
+
+        m_get_graph.side_effect = get_graph
+        on_result = MagicMock()
+        graph = await get_graph_sharded(self.payload, 2, uri=s.uri, on_result=on_result)
+
+        assert graph == self.graph_for(self.payload)
+        # Each shard's graph was passed on as it completed.
+        assert sorted(sorted(c.args[0]["nodes"]) for c in on_result.call_args_list) == [
+            [1, 3],
+            [2],
+        ]
+        assert [c.args[0]["startNodes"] for c in m_get_graph.call_args_list] == [
+            [sn(1, True, False), sn(3, True, False)],
+            [sn(2, True, False)],
+        ]
+        assert all(c.kwargs["uri"] is s.uri for c in m_get_graph.call_args_list)
+        # Progress is summed over the shards.
+        assert m_display_progress.call_args_list[-1].args == (3, 0, 2)
+
+    @pytest.mark.asyncio
+    @patch("geneagrapher.geneagrapher.get_graph")
+    async def test_max_start_nodes(self, m_get_graph: AsyncMock) -> None:
+        active = 0
+        most_active = 0
+
+        async def get_graph(payload: RequestPayload, **kwargs: Any) -> Geneagraph:
+            nonlocal active, most_active
+            active += 1
+            most_active = max(most_active, active)
+            await asyncio.sleep(0)
+            active -= 1
+            return self.graph_for(payload)
+
+        m_get_graph.side_effect = get_graph
+        payload: RequestPayload = {
+            "kind": "build-graph",
+            "options": {"reportingCallback": False},
+            "startNodes": [sn(i, True, False) for i in range(1, 8)],
+        }
+        graph = await get_graph_sharded(
+            payload, 2, uri=s.uri, progress=MagicMock(), max_start_nodes=2
+        )
+
+        assert graph == self.graph_for(payload)
+        # The start nodes were split into requests of at most two, of
+        # which at most two were in flight at a time.
+        assert sorted(
+            len(c.args[0]["startNodes"]) for c in m_get_graph.call_args_list
+        ) == [
+            1,
+            2,
+            2,
+            2,
+        ]
+        assert most_active == 2
+
+    @pytest.mark.asyncio
+    @patch("geneagrapher.geneagrapher.get_graph")
+    async def test_retry(self, m_get_graph: AsyncMock) -> None:
+        failures = {2: 2}
+
+        async def get_graph(payload: RequestPayload, **kwargs: Any) -> Geneagraph:
+            first = payload["startNodes"][0]["recordId"]
+            if failures.get(first, 0) > 0:
+                failures[first] -= 1
+                raise GgrapherError("Shard failed.")
+            return self.graph_for(payload)
+
+        m_get_graph.side_effect = get_graph
+        graph = await get_graph_sharded(self.payload, 2, retry_delay=0)
+
+        assert graph == self.graph_for(self.payload)
+        # Only the failed shard was retried.
+        assert [
+            c.args[0]["startNodes"][0]["recordId"] for c in m_get_graph.call_args_list
+        ] == [1, 2, 2, 2]
+
+    @pytest.mark.asyncio
+    @patch("geneagrapher.geneagrapher.get_graph")
+    async def test_retries_exhausted(self, m_get_graph: AsyncMock) -> None:
+        async def get_graph(payload: RequestPayload, **kwargs: Any) -> Geneagraph:
+            if payload["startNodes"][0]["recordId"] == 2:
+                raise GgrapherError("Shard failed.")
+            return self.graph_for(payload)
+
+        m_get_graph.side_effect = get_graph
+        with pytest.raises(GgrapherError) as exc_info:
+            await get_graph_sharded(self.payload, 2, retries=1, retry_delay=0)
+        assert exc_info.value.msg == "Shard failed."
+        assert m_get_graph.call_count == 3
+
+
+class TestGetGraphCached:
+    payload: RequestPayload = {
+        "kind": "build-graph",
+        "options": {"reportingCallback": True},
+        "startNodes": [{"recordId": 6, "getAdvisors": True, "getDescendants": False}],
+    }
+
+    @pytest.fixture
+    def cache(self, tmp_path: Path) -> Iterator[RecordCache]:
+        with RecordCache.open(tmp_path) as cache:
+            yield cache
+
+    @pytest.mark.asyncio
+    @patch("geneagrapher.geneagrapher.get_graph")
+    async def test_no_cache(self, m_get_graph: AsyncMock) -> None:
+        m_get_graph.return_value = s.graph
+        assert (
+            await get_graph_cached(
+                self.payload,
+                None,
+                uri=s.uri,
+                max_size=s.max_size,
+                timings=s.timings,
+                progress=s.progress,
+                client=s.client,
+            )
+            == s.graph
+        )
+        m_get_graph.assert_called_once_with(
+            self.payload,
+            uri=s.uri,
+            max_size=s.max_size,
+            timings=s.timings,
+            progress=s.progress,
+            client=s.client,
+        )
+
+    @pytest.mark.asyncio
+    @patch("geneagrapher.geneagrapher.get_graph")
+    async def test_hit(self, m_get_graph: AsyncMock, cache: RecordCache) -> None:
+        cache.put_many([make_record(6, [5]), make_record(5, [])])
+        assert await get_graph_cached(self.payload, cache) == {
+            "start_nodes": [6],
+            "nodes": {6: make_record(6, [5]), 5: make_record(5, [])},
+            "status": "complete",
+        }
+        m_get_graph.assert_not_called()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("status", ["complete", "truncated"])
+    @patch("geneagrapher.geneagrapher.get_graph")
+    async def test_frontier(
+        self,
+        m_get_graph: AsyncMock,
+        cache: RecordCache,
+        status: Literal["complete", "truncated"],
+    ) -> None:
+        cache.put_many([make_record(6, [5]), make_record(5, [4])])
+        m_get_graph.return_value = {
+            "start_nodes": [4],
+            "nodes": {4: make_record(4, [3]), 3: make_record(3, [])},
+            "status": status,
+        }
+
+        timings = Timings()
+        graph = await get_graph_cached(
+            self.payload,
+            cache,
+            uri=s.uri,
+            max_size=s.max_size,
+            timings=timings,
+            progress=s.progress,
+            client=s.client,
+        )
+        assert graph["start_nodes"] == [6]
+        assert sorted(graph["nodes"]) == [3, 4, 5, 6]
+        assert graph["status"] == status
+
+        # Only the missing part of the graph was requested.
+        m_get_graph.assert_called_once_with(
+            {
+                "kind": "build-graph",
+                "options": {"reportingCallback": True},
+                "startNodes": [
+                    {"recordId": 4, "getAdvisors": True, "getDescendants": False}
+                ],
+            },
+            uri=s.uri,
+            max_size=s.max_size,
+            timings=timings,
+            progress=s.progress,
+            client=s.client,
+        )
+        assert set(timings.phases) == {"cache"}
+        # The fetched records were added to the cache.
+        assert sorted(cache.get_many([RecordId(3), RecordId(4)])) == [3, 4]
+
+    @pytest.mark.asyncio
+    @patch("geneagrapher.geneagrapher.get_graph")
+    async def test_frontier_not_returned(
+        self, m_get_graph: AsyncMock, cache: RecordCache
+    ) -> None:
+        m_get_graph.return_value = {
+            "start_nodes": [6],
+            "nodes": {},
+            "status": "complete",
+        }
+
+        graph = await get_graph_cached(self.payload, cache)
+        assert graph == {"start_nodes": [6], "nodes": {}, "status": "complete"}
+        m_get_graph.assert_called_once()
+
+    @pytest.mark.asyncio
+    @patch("geneagrapher.geneagrapher.get_graph")
+    async def test_checkpoint(self, m_get_graph: AsyncMock, tmp_path: Path) -> None:
+        path = tmp_path / "build.ckpt"
+        checkpoint = Checkpoint(path, self.payload["startNodes"])
+        checkpoint.add(
+            {
+                "start_nodes": [RecordId(6)],
+                "nodes": {
+                    RecordId(6): make_record(6, [5]),
+                    RecordId(5): make_record(5, [4]),
+                },
+                "status": "complete",
+            }
+        )
+        checkpoint.close()
+        self.limited_backend(m_get_graph)
+
+        checkpoint = Checkpoint(path, self.payload["startNodes"], resume=True)
+        graph = await get_graph_cached(self.payload, None, checkpoint=checkpoint)
+        assert sorted(graph["nodes"]) == [1, 2, 3, 4, 5, 6]
+        assert graph["status"] == "complete"
+        # Only the records missing from the checkpoint were requested, one
+        # generation at a time.
+        assert [call.args[0]["startNodes"] for call in m_get_graph.call_args_list] == [
+            [{"recordId": rid, "getAdvisors": False, "getDescendants": False}]
+            for rid in (4, 3, 2, 1)
+        ]
+        # The fetched records were added to the checkpoint.
+        checkpoint.close()
+        assert sorted(
+            Checkpoint(path, self.payload["startNodes"], resume=True).records
+        ) == [1, 2, 3, 4, 5, 6]
+
+    @pytest.mark.asyncio
+    @patch("geneagrapher.geneagrapher.get_graph")
+    async def test_checkpoint_failed(
+        self, m_get_graph: AsyncMock, tmp_path: Path
+    ) -> None:
+        # A build with one start node that fails part way keeps the
+        # generations received before the failure.
+        records = {rid: make_record(rid, [rid - 1]) for rid in (4, 5, 6)}
+
+        async def get_graph(payload: RequestPayload, **kwargs: Any) -> Geneagraph:
+            ids = [RecordId(sn["recordId"]) for sn in payload["startNodes"]]
+            if ids == [3]:
+                raise GgrapherError("connection lost")
+            return {
+                "start_nodes": ids,
+                "nodes": {rid: records[rid] for rid in ids},
+                "status": "complete",
+            }
+
+        m_get_graph.side_effect = get_graph
+        path = tmp_path / "build.ckpt"
+        checkpoint = Checkpoint(path, self.payload["startNodes"])
+        with pytest.raises(GgrapherError):
+            await get_graph_cached(self.payload, None, checkpoint=checkpoint)
+        checkpoint.close()
+        assert sorted(
+            Checkpoint(path, self.payload["startNodes"], resume=True).records
+        ) == [4, 5, 6]
+
+    def limited_backend(self, m_get_graph: AsyncMock, delay: float = 0) -> None:
+        # 6 was advised by 5, who was advised by 4, and so on.
+        records = {
+            rid: make_record(rid, [rid - 1] if rid > 1 else []) for rid in range(1, 7)
+        }
+
+        async def get_graph(payload: RequestPayload, **kwargs: Any) -> Geneagraph:
+            if m_get_graph.await_count > 1:
+                await asyncio.sleep(delay)
+            ids = [RecordId(sn["recordId"]) for sn in payload["startNodes"]]
+            return {
+                "start_nodes": ids,
+                "nodes": {rid: records[rid] for rid in ids},
+                "status": "complete",
+            }
+
+        m_get_graph.side_effect = get_graph
+
+    @pytest.mark.asyncio
+    @patch("geneagrapher.geneagrapher.get_graph")
+    async def test_limits(self, m_get_graph: AsyncMock) -> None:
+        self.limited_backend(m_get_graph)
+        payload: RequestPayload = {
+            "kind": "build-graph",
+            "options": {"reportingCallback": False, "maxDepth": 2},
+            "startNodes": self.payload["startNodes"],
+        }
+        graph = await get_graph_cached(payload, None)
+        assert sorted(graph["nodes"]) == [4, 5, 6]
+        assert graph["status"] == "truncated"
+
+        # The records were requested one generation at a time, with the
+        # limits passed on to the backend.
+        assert [call.args[0] for call in m_get_graph.call_args_list] == [
+            {
+                "kind": "build-graph",
+                "options": {"reportingCallback": False, "maxDepth": 2},
+                "startNodes": [
+                    {"recordId": rid, "getAdvisors": False, "getDescendants": False}
+                ],
+            }
+            for rid in (6, 5, 4)
+        ]
+
+    @pytest.mark.asyncio
+    @patch("geneagrapher.geneagrapher.get_graph")
+    async def test_limits_client(self, m_get_graph: AsyncMock) -> None:
+        self.limited_backend(m_get_graph)
+        payload: RequestPayload = {
+            "kind": "build-graph",
+            "options": {"reportingCallback": False, "maxDepth": 2},
+            "startNodes": self.payload["startNodes"],
+        }
+        await get_graph_cached(payload, None, uri="ws://test", max_size=10, shards=2)
+        # The generations were requested over one pooled client.
+        clients = [call.kwargs["client"] for call in m_get_graph.call_args_list]
+        assert len(clients) == 3 and len(set(map(id, clients))) == 1
+        client = clients[0]
+        assert isinstance(client, GeneagrapherClient)
+        assert (client.uri, client.pool_size, client.max_size) == ("ws://test", 2, 10)
+
+        # A client that is given is used instead.
+        m_get_graph.reset_mock()
+        await get_graph_cached(payload, None, client=s.client)
+        assert [call.kwargs["client"] for call in m_get_graph.call_args_list] == [
+            s.client
+        ] * 3
+
+    @pytest.mark.asyncio
+    @patch("geneagrapher.geneagrapher.get_graph")
+    async def test_timeout(self, m_get_graph: AsyncMock) -> None:
+        self.limited_backend(m_get_graph, delay=10)
+        graph = await get_graph_cached(self.payload, None, timeout=0.1)
+        # The first generation arrived in time, but the second did not.
+        assert sorted(graph["nodes"]) == [6]
+        assert graph["status"] == "truncated"
+        assert m_get_graph.await_count == 2
+
+
+@pytest.mark.parametrize(
+    "format,formatter_type",
+    [("dot", DotOutput), ("json", IdentityOutput), ("ndjson", NdjsonOutput)],
 )
 def test_get_formatter(
-    format: Literal["dot", "json"], formatter_type: Type[OutputFormatter]
+    format: TextFormat, formatter_type: Type[OutputFormatter]
 ) -> None:
     formatter = get_formatter(format, s.graph)
     assert isinstance(formatter, formatter_type)
 
 
-@patch("geneagrapher.geneagrapher.version", return_value="the-version")
-def test_get_version(m_version: MagicMock) -> None:
+@pytest.mark.parametrize("format", ["dot", "json", "ndjson"])
+def test_write_graph(format: TextFormat) -> None:
+    graph: Geneagraph = {
+        "start_nodes": [RecordId(1)],
+        "nodes": {RecordId(1): make_record(1, [])},
+        "status": "complete",
+    }
+    outfile = io.StringIO()
+    write_graph(format, graph, outfile)
+    assert outfile.getvalue() == get_formatter(format, graph).output + "\n"
+
+
+@pytest.mark.parametrize("timings", [None, Timings()])
+def test_write_graph_bin(timings: Optional[Timings]) -> None:
+    graph: Geneagraph = {
+        "start_nodes": [RecordId(1)],
+        "nodes": {RecordId(1): make_record(1, [])},
+        "status": "complete",
+    }
+    buffer = io.BytesIO()
+    outfile = io.TextIOWrapper(buffer, write_through=True)
+    outfile.write("text ")
+    write_graph("bin", graph, outfile, timings=timings)
+    assert buffer.getvalue() == b"text " + BinaryOutput(graph).output
+    if timings is not None:
+        assert set(timings.phases) == {"format", "write"}
+
+
+def test_write_graph_timings() -> None:
+    graph: Geneagraph = {
+        "start_nodes": [RecordId(1)],
+        "nodes": {RecordId(1): make_record(1, [])},
+        "status": "complete",
+    }
+    outfile = io.StringIO()
+    timings = Timings()
+    write_graph("dot", graph, outfile, timings=timings)
+    assert outfile.getvalue() == get_formatter("dot", graph).output + "\n"
+    assert set(timings.phases) == {"format", "write"}
+
+
+@pytest.fixture
+def clear_version() -> Iterator[None]:
+    get_version.cache_clear()
+    yield
+    get_version.cache_clear()
+
+
+@patch("importlib.metadata.version", return_value="the-version")
+def test_get_version(m_version: MagicMock, clear_version: None) -> None:
     assert get_version() == "the-version"
+    assert get_version() == "the-version"
+    m_version.assert_called_once_with("geneagrapher")
 
 
-@patch("geneagrapher.geneagrapher.version", side_effect=PackageNotFoundError)
-def test_get_version_dev(m_version: MagicMock) -> None:
+@patch("importlib.metadata.version", side_effect=PackageNotFoundError)
+def test_get_version_dev(m_version: MagicMock, clear_version: None) -> None:
     assert get_version() == "dev"
+
+
+@patch("geneagrapher.geneagrapher.get_version", return_value="the-version")
+def test_run_version(
+    m_get_version: MagicMock, capsys: pytest.CaptureFixture[str]
+) -> None:
+    with patch("geneagrapher.geneagrapher.sys.argv", ["ggrapher", "--version"]):
+        with pytest.raises(SystemExit) as e:
+            run()
+    assert e.value.code == 0
+    assert capsys.readouterr().out == "ggrapher the-version\n"
+
+
+def test_run_help_skips_version(capsys: pytest.CaptureFixture[str]) -> None:
+    with patch("geneagrapher.geneagrapher.get_version") as m_get_version, patch(
+        "geneagrapher.geneagrapher.sys.argv", ["ggrapher", "--help"]
+    ):
+        with pytest.raises(SystemExit):
+            run()
+    m_get_version.assert_not_called()
+    assert "--version" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("module", STARTUP_MODULES)
+def test_startup_imports(module: str) -> None:
+    times = fastest_import(module, 3)
+    assert not {t.name for t in times} & set(DEFERRED_MODULES)
+    assert startup_time(times) <= IMPORT_BUDGET
+
+
+@pytest.mark.parametrize(
+    "args,events",
+    (
+        [["--progress", "jsonl"], ["progress", "finish"]],
+        [["-q", "--progress", "jsonl"], []],
+    ),
+)
+@patch("geneagrapher.geneagrapher.get_graph_cached")
+def test_run_progress(
+    m_get_graph_cached: AsyncMock,
+    args: List[str],
+    events: List[str],
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    graph: Geneagraph = {
+        "start_nodes": [RecordId(1)],
+        "nodes": {},
+        "status": "complete",
+    }
+
+    async def get_graph_cached(
+        payload: RequestPayload, *a: Any, **kwargs: Any
+    ) -> Geneagraph:
+        assert payload["options"]["reportingCallback"] == bool(events)
+        if kwargs["progress"] is not None:
+            kwargs["progress"](0, 0, 1)
+        return graph
+
+    m_get_graph_cached.side_effect = get_graph_cached
+    argv = ["ggrapher", "--no-cache", "-o", str(tmp_path / "out.dot")] + args + ["1:a"]
+    with patch("geneagrapher.geneagrapher.sys.argv", argv):
+        run()
+    err = capsys.readouterr().err
+    assert [json.loads(line)["event"] for line in err.splitlines()] == events
@@ -1,6 +1,11 @@
 from geneagrapher.output.identity import IdentityOutput
+from geneagrapher.synthetic import make_geneagraph
+from geneagrapher.types import Geneagraph, RecordId
 
-from unittest.mock import MagicMock, patch, sentinel as s
+import io
+import json
+import pytest
+from unittest.mock import patch, sentinel as s
 
 
 class TestIdentityOutput:
@@ -8,11 +13,39 @@ class TestIdentityOutput:
         do = IdentityOutput(s.graph)
         assert do.graph == s.graph
 
-    @patch("geneagrapher.output.identity.json")
-    def test_output(self, m_json: MagicMock) -> None:
-        m_json.dumps = MagicMock(return_value=s.the_json)
+    @pytest.mark.parametrize(
+        "graph",
+        (
+            {"start_nodes": [], "nodes": {}, "status": "complete"},
+            {
+                "start_nodes": [RecordId(1)],
+                "status": "truncated",
+                "nodes": {
+                    RecordId(1): {
+                        "id": RecordId(1),
+                        "name": 'Gauß "Carl"',
+                        "institution": None,
+                        "year": 1799,
+                        "descendants": [],
+                        "advisors": [2],
+                    },
+                },
+            },
+            make_geneagraph(3000),
+        ),
+    )
+    def test_output(self, graph: Geneagraph) -> None:
+        do = IdentityOutput(graph)
+        assert do.output == json.dumps(graph)
 
-        do = IdentityOutput(s.graph)
-        assert do.output == s.the_json
+        fp = io.StringIO()
+        do.write(fp)
+        assert fp.getvalue() == json.dumps(graph)
 
-        m_json.dumps.assert_called_once_with(s.graph)
+    @patch("geneagrapher.output.identity.CHUNK_RECORDS", 2)
+    def test_chunks(self) -> None:
+        graph = make_geneagraph(5)
+        chunks = list(IdentityOutput(graph).chunks())
+        # Five records in batches of two.
+        assert sum(1 for c in chunks if '"id": ' in c) == 3
+        assert "".join(chunks) == json.dumps(graph)
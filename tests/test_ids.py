@@ -0,0 +1,94 @@
+from geneagrapher.ids import make_start_node, read_start_nodes
+
+import io
+import pytest
+from typing import List, Optional, Tuple
+
+
+def flags(record_id: int, advisors: bool, descendants: bool) -> Tuple[int, bool, bool]:
+    return (record_id, advisors, descendants)
+
+
+def read(text: str) -> List[Tuple[int, bool, bool]]:
+    return [
+        (n["recordId"], n["getAdvisors"], n["getDescendants"])
+        for n in read_start_nodes(io.StringIO(text))
+    ]
+
+
+@pytest.mark.parametrize(
+    "record_id,direction,expected",
+    (
+        ["15648", "", flags(15648, True, False)],
+        ["15648", "a", flags(15648, True, False)],
+        ["15648", "d", flags(15648, False, True)],
+        ["15648", "ad", flags(15648, True, True)],
+        ["15648", "da", flags(15648, True, True)],
+        ["15648", "x", None],
+        ["", "a", None],
+        ["-1", "a", None],
+        ["1.5", "a", None],
+        ["١٢", "a", None],  # Non-ASCII digits.
+    ),
+)
+def test_make_start_node(
+    record_id: str, direction: str, expected: Optional[Tuple[int, bool, bool]]
+) -> None:
+    start_node = make_start_node(record_id, direction)
+    if expected is None:
+        assert start_node is None
+    else:
+        assert start_node == {
+            "recordId": expected[0],
+            "getAdvisors": expected[1],
+            "getDescendants": expected[2],
+        }
+
+
+def test_read_tokens() -> None:
+    text = """# Start nodes for the department graph.
+15648:ad 7401
+  99:d\t12:a  # Trailing comment.
+
+7401:d
+"""
+    assert read(text) == [
+        flags(15648, True, True),
+        flags(7401, True, False),
+        flags(99, False, True),
+        flags(12, True, False),
+        flags(7401, False, True),
+    ]
+
+
+@pytest.mark.parametrize(
+    "text",
+    (
+        "id,direction\n15648,ad\n7401\n\n99, d\n",
+        "15648,ad\n7401,\n99,d\n",
+    ),
+)
+def test_read_csv(text: str) -> None:
+    assert read(text) == [
+        flags(15648, True, True),
+        flags(7401, True, False),
+        flags(99, False, True),
+    ]
+
+
+@pytest.mark.parametrize(
+    "text,message",
+    (
+        ["1:a\n2:a 3:x\n", "line 2: invalid start node '3:x'"],
+        ["1:a\nfoo\n", "line 2: invalid start node 'foo'"],
+        ["1,a\n2,x\n", "line 2: invalid start node '2,x'"],
+        ["id,direction\nfoo,a\n", "line 2: invalid start node 'foo,a'"],
+    ),
+)
+def test_read_invalid(text: str, message: str) -> None:
+    with pytest.raises(ValueError, match=message):
+        read(text)
+
+
+def test_read_empty() -> None:
+    assert read("") == []
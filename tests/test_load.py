@@ -0,0 +1,224 @@
+from geneagrapher.compact import CompactGraph
+from geneagrapher.convert import run_convert
+from geneagrapher.load import StringTable, int_column, load_graph, map_graph
+from geneagrapher.output.binary import HEADER, BinaryOutput
+from geneagrapher.output.dot import DotOutput
+from geneagrapher.output.identity import IdentityOutput
+from geneagrapher.synthetic import make_geneagraph
+from geneagrapher.types import RecordId
+
+from array import array
+import io
+import json
+from pathlib import Path
+import pytest
+import struct
+from typing import List
+from unittest.mock import patch
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096])
+def test_load_graph(chunk_size: int) -> None:
+    graph = make_geneagraph(300, seed=2)
+    graph["status"] = "truncated"
+    saved = IdentityOutput(graph).output
+
+    loaded = load_graph(io.StringIO(saved), chunk_size=chunk_size)
+    assert isinstance(loaded, CompactGraph)
+    assert loaded.to_geneagraph() == graph
+
+
+@pytest.mark.parametrize(
+    "document",
+    [
+        '{"status": "complete", "extra": [1, {"a": 2}], "nodes": {}, \
+"start_nodes": [12345]}',
+        '\n{ "start_nodes" : [12345] , "nodes" : { } , "status" : "complete" }\n',
+    ],
+)
+def test_load_graph_layout(document: str) -> None:
+    graph = load_graph(io.StringIO(document), chunk_size=3)
+    assert graph.to_geneagraph() == {
+        "start_nodes": [12345],
+        "nodes": {},
+        "status": "complete",
+    }
+
+
+@pytest.mark.parametrize(
+    "document",
+    [
+        "",
+        "{}",
+        "[]",
+        '{"start_nodes": [], "nodes": {}, "status": "complete"} {}',
+        '{"start_nodes": [], "nodes": {"1": 2}, "status": "complete"}',
+        '{"start_nodes": [], "nodes": {"1": {"id": 1}}, "status": "complete"}',
+        '{"start_nodes": [], "nodes": {}, "status": "complete"',
+        '{"start_nodes": [], "nodes": {}, "status": "unknown"}',
+        '{"start_nodes": [], "nodes": {"1": {"id": 1',
+    ],
+)
+def test_load_graph_invalid(document: str) -> None:
+    with pytest.raises(ValueError):
+        load_graph(io.StringIO(document), chunk_size=5)
+
+
+def test_map_graph(tmp_path: Path) -> None:
+    graph = make_geneagraph(300, seed=4)
+    graph["status"] = "truncated"
+    path = tmp_path / "graph.bin"
+    path.write_bytes(BinaryOutput(graph).output)
+
+    mapped = map_graph(path)
+    assert isinstance(mapped.ids, memoryview)
+    assert mapped.to_geneagraph() == graph
+    rid = list(graph["nodes"])[-1]
+    assert mapped["nodes"][rid]["name"] == graph["nodes"][rid]["name"]
+    assert RecordId(0) not in mapped["nodes"]
+
+
+def test_int_column() -> None:
+    data = memoryview(array("i", [1, -2]).tobytes())
+    assert list(int_column(data)) == [1, -2]
+    # On big-endian systems, the little-endian data is byteswapped.
+    expected = array("i", [1, -2])
+    expected.byteswap()
+    with patch("geneagrapher.load.sys.byteorder", "big"):
+        assert int_column(data) == expected
+
+
+def test_map_graph_invalid(tmp_path: Path) -> None:
+    path = tmp_path / "graph.bin"
+    output = BinaryOutput(make_geneagraph(10)).output
+    for data in (
+        b"",
+        b"GGRAPHB",
+        output[:-1],
+        output + b"\0",
+        output[:8] + struct.pack("<I", 2) + output[12:],
+        output[:12] + struct.pack("<I", 2) + output[16:],
+        b"{}" + output[2:],
+    ):
+        path.write_bytes(data)
+        with pytest.raises(ValueError):
+            map_graph(path)
+    assert len(output) > HEADER.size
+
+
+def test_string_table() -> None:
+    table = StringTable(memoryview("abcdéf".encode()), array("i", [0, 1, 3, 7]))
+    assert len(table) == 3
+    assert list(table) == ["a", "bc", "déf"]
+    assert table[-1] == "déf"
+    assert table[1:] == ["bc", "déf"]
+    with pytest.raises(IndexError):
+        table[3]
+
+
+def test_run_convert(tmp_path: Path) -> None:
+    graph = make_geneagraph(100)
+    infile = tmp_path / "graph.json"
+    infile.write_text(IdentityOutput(graph).output)
+
+    outfile = tmp_path / "graph.dot"
+    assert run_convert([str(infile), "-o", str(outfile)]) == 0
+    assert outfile.read_text() == DotOutput(graph).output + "\n"
+
+    assert run_convert([str(infile), "-f", "json", "-o", str(outfile)]) == 0
+    assert json.loads(outfile.read_text()) == json.loads(IdentityOutput(graph).output)
+
+    binfile = tmp_path / "graph.bin"
+    assert run_convert([str(infile), "-f", "bin", "-o", str(binfile)]) == 0
+    assert map_graph(binfile).to_geneagraph() == graph
+    assert run_convert([str(binfile), "-o", str(outfile)]) == 0
+    assert outfile.read_text() == DotOutput(graph).output + "\n"
+
+
+@pytest.mark.parametrize("saved_format", ["json", "bin"])
+@pytest.mark.parametrize("format", ["dot", "json", "bin"])
+def test_run_convert_in_place(saved_format: str, format: str, tmp_path: Path) -> None:
+    graph = make_geneagraph(100)
+    path = tmp_path / "graph"
+    if saved_format == "json":
+        path.write_text(IdentityOutput(graph).output)
+    else:
+        path.write_bytes(b"".join(BinaryOutput(graph).chunks()))
+
+    assert run_convert([str(path), "-f", format, "-o", str(path)]) == 0
+    if format == "dot":
+        assert path.read_text() == DotOutput(graph).output + "\n"
+    else:
+        assert run_convert([str(path), "-f", "json", "-o", str(path)]) == 0
+        assert json.loads(path.read_text()) == json.loads(IdentityOutput(graph).output)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["graph"]
+
+
+def test_run_convert_split_components(tmp_path: Path) -> None:
+    graph = make_geneagraph(200)
+    infile = tmp_path / "graph.json"
+    infile.write_text(IdentityOutput(graph).output)
+
+    directory = tmp_path / "components"
+    assert (
+        run_convert(
+            [
+                str(infile),
+                "--split-components",
+                str(directory),
+                "--min-component-size",
+                "3",
+                "--jobs",
+                "1",
+            ]
+        )
+        == 0
+    )
+    index = json.loads((directory / "index.json").read_text())
+    assert index["records"] == 200
+    assert sum(entry["records"] for entry in index["files"]) == 200
+    assert index["files"][-1]["file"] == "small-components.dot"
+    assert sorted(p.name for p in directory.iterdir()) == sorted(
+        [entry["file"] for entry in index["files"]] + ["index.json"]
+    )
+
+
+@pytest.mark.parametrize(
+    "args,message",
+    (
+        [["-f", "json"], "argument --split-components: requires --format dot"],
+        [["--min-component-size", "0"], "argument --min-component-size"],
+        [["--jobs", "0"], "argument --jobs"],
+        [["-o", "{tmp}/graph.dot"], "not allowed with argument"],
+    ),
+)
+def test_run_convert_split_components_invalid(
+    args: List[str], message: str, tmp_path: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    argv = ["graph.json", "--split-components", str(tmp_path)] + [
+        arg.format(tmp=tmp_path) for arg in args
+    ]
+    with pytest.raises(SystemExit) as e:
+        run_convert(argv)
+    assert e.value.code == 2
+    assert message in capsys.readouterr().err
+
+
+def test_run_convert_invalid(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    infile = tmp_path / "graph.dot"
+    infile.write_text("digraph {}")
+    outfile = tmp_path / "graph.json"
+    outfile.write_text("{}")
+    assert run_convert([str(infile), "-o", str(outfile)]) == 1
+    assert f"Cannot read graph {infile}" in capsys.readouterr().err
+    # The output is not opened, so an existing file is left alone.
+    assert outfile.read_text() == "{}"
+    assert run_convert([str(tmp_path / "missing.json")]) == 1
+
+    infile = tmp_path / "valid.json"
+    infile.write_text(IdentityOutput(make_geneagraph(10)).output)
+    outfile = tmp_path / "missing" / "graph.dot"
+    assert run_convert([str(infile), "-o", str(outfile)]) == 1
+    assert f"Cannot write graph {outfile}" in capsys.readouterr().err
@@ -0,0 +1,30 @@
+from geneagrapher.output.ndjson import NdjsonOutput
+from geneagrapher.synthetic import make_geneagraph
+from geneagrapher.types import Geneagraph
+
+import io
+import json
+import pytest
+from unittest.mock import sentinel as s
+
+
+class TestNdjsonOutput:
+    def test_init(self) -> None:
+        do = NdjsonOutput(s.graph)
+        assert do.graph == s.graph
+
+    @pytest.mark.parametrize("graph", (make_geneagraph(0), make_geneagraph(50)))
+    def test_output(self, graph: Geneagraph) -> None:
+        expected = "\n".join(json.dumps(r) for r in graph["nodes"].values())
+
+        do = NdjsonOutput(graph)
+        assert do.output == expected
+
+        fp = io.StringIO()
+        do.write(fp)
+        assert fp.getvalue() == expected
+
+        lines = do.output.splitlines()
+        assert [json.loads(line) for line in lines] == json.loads(
+            json.dumps(list(graph["nodes"].values()))
+        )
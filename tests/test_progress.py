@@ -0,0 +1,153 @@
+from geneagrapher.progress import (
+    LOG_INTERVAL,
+    JsonlProgress,
+    ProgressBar,
+    ThrottledProgress,
+    bar_str,
+    make_progress,
+)
+
+import io
+import json
+import pytest
+from unittest.mock import patch
+
+
+class TtyStream(io.StringIO):
+    def isatty(self) -> bool:
+        return True
+
+
+def test_bar_str() -> None:
+    assert bar_str(1, 1, 2) == f"Progress: [{'█' * 30}{':' * 15}{'.' * 15}] 2/4"
+    assert bar_str(0, 0, 0) == f"Progress: [{'.' * 60}] 0/0"
+
+
+class TestProgressBar:
+    def test_tty(self) -> None:
+        stream = TtyStream()
+        times = iter([0.0, 0.0, 0.05, 0.08, 0.2, 0.25])
+        bar = ProgressBar(stream, clock=lambda: next(times))
+        bar(3, 0, 0)
+        # These reports come too soon after the first to be drawn.
+        bar(2, 1, 0)
+        bar(2, 0, 1)
+        bar(0, 1, 2)
+        bar.finish()
+        assert stream.getvalue() == (
+            bar_str(3, 0, 0) + "\r" + bar_str(0, 1, 2) + "\r" + "\n"
+        )
+
+    def test_tty_finish_pending(self) -> None:
+        stream = TtyStream()
+        times = iter([0.0, 0.0, 0.05, 0.06])
+        bar = ProgressBar(stream, clock=lambda: next(times))
+        bar(1, 0, 0)
+        bar(0, 0, 1)
+        bar.finish()
+        assert stream.getvalue() == (
+            bar_str(1, 0, 0) + "\r" + bar_str(0, 0, 1) + "\r" + "\n"
+        )
+
+    def test_not_tty(self) -> None:
+        stream = io.StringIO()
+        times = iter([0.0, 0.0, 1.0, LOG_INTERVAL, LOG_INTERVAL + 1])
+        bar = ProgressBar(stream, clock=lambda: next(times))
+        bar(3, 0, 0)
+        bar(2, 0, 1)
+        bar(1, 1, 1)
+        bar.finish()
+        assert stream.getvalue() == "Progress: 0/3\nProgress: 1/3\n"
+
+    def test_finish_unused(self) -> None:
+        stream = TtyStream()
+        ProgressBar(stream).finish()
+        assert stream.getvalue() == ""
+
+
+def test_jsonl() -> None:
+    stream = io.StringIO()
+    times = iter([10.0, 10.5, 11.0, 12.0, 13.0, 14.0])
+    progress = JsonlProgress(
+        stream, clock=lambda: next(times), wall_clock=lambda: 1700000000.0
+    )
+    progress(10, 0, 0)
+    progress(5, 1, 4)  # Not rendered; too soon.
+    progress(2, 2, 6)
+    # The counts of a second backend request start over.
+    progress(3, 0, 2)
+    progress.finish()
+
+    events = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert events == [
+        {
+            "event": "progress",
+            "time": 1700000000.0,
+            "elapsed": 0.5,
+            "queued": 10,
+            "fetching": 0,
+            "done": 0,
+            "total": 10,
+            "rate": 0.0,
+        },
+        {
+            "event": "progress",
+            "time": 1700000000.0,
+            "elapsed": 2.0,
+            "queued": 2,
+            "fetching": 2,
+            "done": 6,
+            "total": 10,
+            "rate": 4.0,
+        },
+        {
+            "event": "progress",
+            "time": 1700000000.0,
+            "elapsed": 3.0,
+            "queued": 3,
+            "fetching": 0,
+            "done": 2,
+            "total": 5,
+            "rate": 2.0,
+        },
+        {
+            "event": "finish",
+            "time": 1700000000.0,
+            "elapsed": 4.0,
+            "records": 8,
+            "rate": 2.0,
+        },
+    ]
+
+
+def test_make_progress() -> None:
+    stream = io.StringIO()
+    with patch("geneagrapher.progress.sys.stderr", stream):
+        bar = make_progress("bar")
+        jsonl = make_progress("jsonl")
+    assert isinstance(bar, ProgressBar) and bar.stream is stream
+    assert isinstance(jsonl, JsonlProgress) and jsonl.stream is stream
+    assert make_progress("none") is None
+
+
+def test_jsonl_requests_between_reports() -> None:
+    # Two backend requests of 100 records each report their progress
+    # within one interval.
+    stream = io.StringIO()
+    times = iter([0.0, 0.0] + [0.5] * 200 + [2.0])
+    progress = JsonlProgress(stream, clock=lambda: next(times))
+    progress(100, 0, 0)
+    for _ in range(2):
+        for done in range(1, 101):
+            progress(100 - done, 0, done)
+    progress.finish()
+
+    events = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [e["event"] for e in events] == ["progress", "progress", "finish"]
+    assert events[1]["rate"] == 100.0
+    assert events[-1]["records"] == 200
+
+
+def test_throttled_progress_abstract() -> None:
+    with pytest.raises(TypeError):
+        ThrottledProgress(io.StringIO(), 1.0)  # type: ignore[abstract]
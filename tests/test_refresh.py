@@ -0,0 +1,284 @@
+from geneagrapher.cache import RecordCache
+from geneagrapher.refresh import (
+    infer_start_nodes,
+    refresh_graph,
+    run_refresh,
+    split_stale,
+)
+from geneagrapher.stub_backend import StubBackend
+from geneagrapher.synthetic import make_geneagraph
+from geneagrapher.traverse import traverse_local
+from geneagrapher.types import Geneagraph, Record, RecordId, StartNodeRequest
+from tests.helpers import make_graph, make_record, sn
+
+import json
+import os
+from pathlib import Path
+import pytest
+import pytest_asyncio
+import time
+from typing import Any, AsyncIterator, Iterator, List, Tuple
+from unittest.mock import MagicMock, patch
+
+
+@pytest.mark.parametrize(
+    "records,expected",
+    [
+        ([make_record(2, [1], []), make_record(1, [], [2])], sn(2, True, False)),
+        ([make_record(2, [], [3]), make_record(3, [2], [])], sn(2, False, True)),
+        (
+            [
+                make_record(2, [1], [3]),
+                make_record(1, [], [2]),
+                make_record(3, [2], []),
+            ],
+            sn(2, True, True),
+        ),
+        ([make_record(2, [1], [3])], sn(2, True, False)),
+        ([], sn(2, True, False)),
+    ],
+)
+def test_infer_start_nodes(records: List[Record], expected: StartNodeRequest) -> None:
+    assert infer_start_nodes(make_graph([2], records)) == [expected]
+
+
+# 0 advised 1, who advised 2 and 4; 2 advised 3.
+FAMILY = [
+    make_record(0, [], [1]),
+    make_record(1, [0], [2, 4]),
+    make_record(2, [1], [3]),
+    make_record(3, [2], []),
+    make_record(4, [1], []),
+]
+
+
+@pytest.mark.parametrize(
+    "start_nodes",
+    [
+        # 2 is one of 1's descendants, but it is a start node, and 1's
+        # advisors are reached from 2.
+        [sn(1, True, False), sn(2, True, False)],
+        [sn(1, False, True), sn(2, True, False)],
+        [sn(1, False, True), sn(2, False, True)],
+        [sn(1, True, False), sn(3, True, False)],
+        [sn(0, False, True), sn(3, True, False)],
+        [sn(3, True, False), sn(4, True, False)],
+    ],
+)
+def test_infer_start_nodes_several(start_nodes: List[StartNodeRequest]) -> None:
+    records = {r["id"]: r for r in FAMILY}
+    graph = traverse_local(start_nodes, lambda ids: {i: records[i] for i in ids})[0]
+    assert infer_start_nodes(graph) == start_nodes
+
+
+def test_infer_start_nodes_start_node_descendant() -> None:
+    # 1 advised 2, who is a start node, so 1's descendants were not
+    # necessarily requested.
+    graph = make_graph(
+        [1, 2],
+        [make_record(0, [], [1]), make_record(1, [0], [2]), make_record(2, [1], [])],
+    )
+    assert infer_start_nodes(graph) == [sn(1, True, False), sn(2, True, False)]
+
+
+def test_infer_start_nodes_ambiguous() -> None:
+    # 0 and 1 advised 2, so the graph may have been built from 0:d 1:d,
+    # 0:a 1:d, or 0:d 1:a.
+    graph = make_graph(
+        [0, 1],
+        [
+            make_record(0, [], [2]),
+            make_record(1, [], [2]),
+            make_record(2, [0, 1], []),
+        ],
+    )
+    with pytest.raises(ValueError, match="record 2"):
+        infer_start_nodes(graph)
+
+
+def test_infer_start_nodes_synthetic(universe: Geneagraph) -> None:
+    # Start nodes whose traversals overlap: an ancestor's advisors and
+    # the advisors of some of its descendants.
+    root = universe["start_nodes"][0]
+    ids = list(build(universe, [sn(root, True, False)])["nodes"])
+    start_nodes = [sn(ids[i], True, False) for i in (0, 3, 10)]
+    assert infer_start_nodes(build(universe, start_nodes)) == sorted(
+        start_nodes, key=lambda sn: sn["recordId"]
+    )
+
+
+@pytest.fixture
+def cache(tmp_path: Path) -> Iterator[RecordCache]:
+    with RecordCache.open(tmp_path) as cache:
+        yield cache
+
+
+def test_split_stale(cache: RecordCache) -> None:
+    graph = make_graph(
+        [3], [make_record(3, [2], []), make_record(2, [1], []), make_record(1, [], [])]
+    )
+    newer = make_record(2, [1, 4], [])
+    cache.clock = lambda: 150.0
+    cache.put_many([newer])
+    cache.clock = lambda: 50.0
+    cache.put_many([make_record(1, [], [])])
+    cache.clock = lambda: 160.0
+
+    assert split_stale(graph, 100, 50, None, 160) == ({}, [3, 2, 1], 160)
+    # Record 2 has a copy in the cache that is newer than the graph;
+    # record 1's cached copy is older, so the graph's copy is used.
+    assert split_stale(graph, 100, 50, cache, 160) == ({2: newer}, [3, 1], 150)
+    assert split_stale(graph, 100, 50, cache, 201) == ({}, [3, 2, 1], 201)
+    assert split_stale(graph, 100, 50, cache, 149) == (
+        {3: graph["nodes"][RecordId(3)], 2: newer, 1: graph["nodes"][RecordId(1)]},
+        [],
+        100,
+    )
+
+
+@pytest.fixture
+def universe() -> Geneagraph:
+    return make_geneagraph(500, seed=11)
+
+
+@pytest_asyncio.fixture
+async def stub(universe: Geneagraph) -> AsyncIterator[Tuple[StubBackend, str]]:
+    backend = StubBackend(universe, progress_steps=1)
+    async with backend.serve("localhost", 0) as server:
+        port = list(server.sockets)[0].getsockname()[1]
+        yield backend, f"ws://localhost:{port}"
+
+
+def build(universe: Geneagraph, start_nodes: List[StartNodeRequest]) -> Geneagraph:
+    return traverse_local(start_nodes, StubBackend(universe).lookup)[0]
+
+
+@pytest.mark.asyncio
+async def test_refresh_graph(
+    stub: Tuple[StubBackend, str], universe: Geneagraph
+) -> None:
+    backend, uri = stub
+    start_nodes = [sn(universe["start_nodes"][0], True, False)]
+    saved = build(universe, start_nodes)
+
+    # Nothing is requested while the graph is current.
+    graph, stale, oldest = await refresh_graph(
+        saved, time.time(), start_nodes, None, uri=uri
+    )
+    assert graph == saved
+    assert stale == 0
+    assert backend.requests_served == 0
+
+    # Give a record of the graph a new advisor with an ancestor of its
+    # own.
+    ids = list(saved["nodes"])
+    new_ids = [RecordId(max(universe["nodes"]) + i) for i in (1, 2)]
+    universe["nodes"][new_ids[1]] = make_record(new_ids[1], [], [new_ids[0]])
+    universe["nodes"][new_ids[0]] = make_record(new_ids[0], [new_ids[1]], [ids[1]])
+    universe["nodes"][ids[1]]["advisors"].append(new_ids[0])
+
+    graph, stale, oldest = await refresh_graph(
+        saved, time.time() - 10, start_nodes, None, max_age=5, uri=uri
+    )
+    assert graph == build(universe, start_nodes)
+    assert set(new_ids) <= set(graph["nodes"])
+    assert stale == len(saved["nodes"])
+    assert oldest > time.time() - 5
+    # One request for the stale records and one for the frontier.
+    assert backend.requests_served == 2
+
+
+@pytest.mark.asyncio
+async def test_refresh_graph_cache(
+    stub: Tuple[StubBackend, str], universe: Geneagraph, cache: RecordCache
+) -> None:
+    backend, uri = stub
+    start_nodes = [sn(universe["start_nodes"][0], True, False)]
+    saved = build(universe, start_nodes)
+    saved["status"] = "truncated"
+
+    graph, stale, _ = await refresh_graph(
+        saved, time.time() - 10, start_nodes, cache, max_age=5, uri=uri
+    )
+    assert stale == len(saved["nodes"])
+    assert graph["status"] == "truncated"
+    assert len(cache) == len(saved["nodes"])
+
+    # The records were stored in the cache when they were requested
+    # again, so they are current now.
+    graph, stale, _ = await refresh_graph(
+        saved, time.time() - 10, start_nodes, cache, max_age=5, uri=uri
+    )
+    assert stale == 0
+    assert backend.requests_served == 1
+
+
+@patch("geneagrapher.refresh.open_cache")
+@patch("geneagrapher.refresh.refresh_graph")
+def test_run_refresh(
+    m_refresh_graph: MagicMock, m_open_cache: MagicMock, tmp_path: Path
+) -> None:
+    path = tmp_path / "graph.json"
+    saved = make_graph([2], [make_record(2, [1], []), make_record(1, [], [2])])
+    path.write_text(json.dumps(saved))
+    os.utime(path, (100, 100))
+    refreshed = make_graph([2], [make_record(2, [3], []), make_record(3, [], [2])])
+    m_open_cache.return_value = None
+
+    async def refresh_graph(*args: Any, **kwargs: Any) -> Tuple[Geneagraph, int, float]:
+        return refreshed, 1, 50
+
+    m_refresh_graph.side_effect = refresh_graph
+
+    assert run_refresh([str(path), "-q", "-o", str(path), "--max-age", "2"]) == 0
+    assert json.loads(path.read_text()) == json.loads(json.dumps(refreshed))
+    assert path.stat().st_mtime == 50
+    args, kwargs = m_refresh_graph.call_args
+    assert args == (saved, 100, [sn(2, True, False)], None)
+    assert kwargs["max_age"] == 2 * 24 * 60 * 60
+
+    # Start nodes given on the command line override the inferred ones.
+    assert run_refresh([str(path), "2:d", "-q", "-o", str(tmp_path / "out.json")]) == 0
+    assert m_refresh_graph.call_args.args[2] == [sn(2, False, True)]
+
+
+@patch("geneagrapher.refresh.refresh_graph")
+def test_run_refresh_ambiguous(
+    m_refresh_graph: MagicMock, tmp_path: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    path = tmp_path / "graph.json"
+    saved = make_graph(
+        [0, 1],
+        [make_record(0, [], [2]), make_record(1, [], [2]), make_record(2, [0, 1], [])],
+    )
+    path.write_text(json.dumps(saved))
+    assert run_refresh([str(path), "-q", "--no-cache"]) == 1
+    assert f"Cannot infer the start nodes of {path}" in capsys.readouterr().err
+    m_refresh_graph.assert_not_called()
+
+
+def test_run_refresh_unreadable(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    path = tmp_path / "graph.dot"
+    path.write_text("digraph {}")
+    assert run_refresh([str(path)]) == 1
+    assert f"Cannot read graph {path}" in capsys.readouterr().err
+    assert run_refresh([str(tmp_path / "missing.json")]) == 1
+
+
+@patch("geneagrapher.refresh.refresh_graph")
+def test_run_refresh_unwritable(
+    m_refresh_graph: MagicMock, tmp_path: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    path = tmp_path / "graph.json"
+    saved = make_graph([2], [make_record(2, [1], []), make_record(1, [], [2])])
+    path.write_text(json.dumps(saved))
+
+    async def refresh_graph(*args: Any, **kwargs: Any) -> Tuple[Geneagraph, int, float]:
+        return saved, 0, 50
+
+    m_refresh_graph.side_effect = refresh_graph
+    out = tmp_path / "missing" / "out.json"
+    assert run_refresh([str(path), "-q", "--no-cache", "-o", str(out)]) == 1
+    assert f"Cannot write graph {out}" in capsys.readouterr().err
@@ -0,0 +1,338 @@
+from geneagrapher import GeneagrapherClient
+from geneagrapher.geneagrapher import GgrapherError, RequestPayload
+from geneagrapher.serve import CachingProxy, ResultCache, request_key
+from geneagrapher.stub_backend import StubBackend
+from geneagrapher.synthetic import make_geneagraph
+from geneagrapher.traverse import traverse_local
+from geneagrapher.types import Geneagraph, StartNodeRequest
+
+import asyncio
+import json
+import pytest
+import pytest_asyncio
+from typing import Any, AsyncIterator, Dict, List, Tuple
+from unittest.mock import MagicMock
+
+
+class TestResultCache:
+    def test_get_put(self) -> None:
+        cache = ResultCache()
+        assert cache.get("a") is None
+        cache.put("a", "message")
+        assert cache.get("a") == "message"
+        assert len(cache) == 1
+        assert cache.size == 7
+
+    def test_replace(self) -> None:
+        cache = ResultCache()
+        cache.put("a", "message")
+        cache.put("a", "msg")
+        assert cache.get("a") == "msg"
+        assert cache.size == 3
+
+    def test_evicts_least_recently_used(self) -> None:
+        cache = ResultCache(max_bytes=10)
+        cache.put("a", "aaaa")
+        cache.put("b", "bbbb")
+        cache.get("a")
+        cache.put("c", "cccc")
+        assert cache.get("b") is None
+        assert cache.get("a") == "aaaa"
+        assert cache.get("c") == "cccc"
+        assert cache.size == 8
+
+    def test_too_big(self) -> None:
+        cache = ResultCache(max_bytes=3)
+        cache.put("a", "aaaa")
+        assert len(cache) == 0
+        assert cache.size == 0
+
+    def test_find_covering(self) -> None:
+        now = [100.0]
+        cache = ResultCache(ttl=10, clock=lambda: now[0])
+        a: StartNodeRequest = {
+            "recordId": 1,
+            "getAdvisors": True,
+            "getDescendants": True,
+        }
+        b: StartNodeRequest = {
+            "recordId": 2,
+            "getAdvisors": True,
+            "getDescendants": False,
+        }
+        cache.put("a", "graph a", [a])
+        cache.put("ab", "graph ab", [a, b])
+        cache.put("truncated", "truncated ab")
+        assert cache.find_covering([b]) == "graph ab"
+        assert cache.find_covering([a]) == "graph ab"
+        cache.get("a")
+        assert cache.find_covering([a]) == "graph a"
+        assert cache.find_covering([{**b, "getDescendants": True}]) is None
+        now[0] = 111
+        assert cache.find_covering([a]) is None
+
+    def test_ttl(self) -> None:
+        now = [100.0]
+        cache = ResultCache(ttl=10, clock=lambda: now[0])
+        cache.put("a", "aaaa")
+        now[0] = 110
+        assert cache.get("a") == "aaaa"
+        now[0] = 110.5
+        assert cache.get("a") is None
+        assert cache.size == 0
+
+
+def test_request_key() -> None:
+    def payload(reporting: bool, start_node: StartNodeRequest) -> RequestPayload:
+        return {
+            "kind": "build-graph",
+            "options": {"reportingCallback": reporting},
+            "startNodes": [start_node],
+        }
+
+    start_node: StartNodeRequest = {
+        "recordId": 1,
+        "getAdvisors": True,
+        "getDescendants": False,
+    }
+    reordered: StartNodeRequest = {
+        "getDescendants": False,
+        "recordId": 1,
+        "getAdvisors": True,
+    }
+    assert request_key(payload(True, start_node)) == request_key(
+        payload(False, reordered)
+    )
+
+    duplicated = payload(True, start_node)
+    duplicated["startNodes"] = [
+        {"recordId": 2, "getAdvisors": True, "getDescendants": False},
+        start_node,
+        start_node,
+    ]
+    swapped = payload(True, start_node)
+    swapped["startNodes"] = [
+        start_node,
+        {"recordId": 2, "getAdvisors": True, "getDescendants": False},
+    ]
+    assert request_key(duplicated) == request_key(swapped)
+
+    limited = payload(True, start_node)
+    limited["options"]["maxDepth"] = 2
+    assert request_key(limited) != request_key(payload(True, start_node))
+    deeper = payload(False, reordered)
+    deeper["options"]["maxDepth"] = 3
+    assert request_key(limited) != request_key(deeper)
+    deeper["options"]["maxDepth"] = 2
+    assert request_key(limited) == request_key(deeper)
+
+
+@pytest.fixture
+def universe() -> Geneagraph:
+    return make_geneagraph(500, seed=5)
+
+
+@pytest_asyncio.fixture
+async def proxy(
+    universe: Geneagraph,
+) -> AsyncIterator[Tuple[CachingProxy, StubBackend, str]]:
+    backend = StubBackend(universe, latency=0.05, progress_steps=2)
+    async with backend.serve("localhost", 0) as upstream:
+        upstream_port = list(upstream.sockets)[0].getsockname()[1]
+        proxy = CachingProxy(
+            GeneagrapherClient(f"ws://localhost:{upstream_port}"), ResultCache()
+        )
+        async with proxy.client, proxy.serve("localhost", 0) as server:
+            port = list(server.sockets)[0].getsockname()[1]
+            yield proxy, backend, f"ws://localhost:{port}"
+
+
+def start_nodes(universe: Geneagraph, index: int) -> List[StartNodeRequest]:
+    return [
+        {
+            "recordId": list(universe["nodes"])[index],
+            "getAdvisors": True,
+            "getDescendants": False,
+        }
+    ]
+
+
+@pytest.mark.asyncio
+async def test_cache_hit(
+    proxy: Tuple[CachingProxy, StubBackend, str], universe: Geneagraph
+) -> None:
+    caching_proxy, backend, uri = proxy
+    async with GeneagrapherClient(uri) as client:
+        first = await client.build_graph(start_nodes(universe, -1))
+        second = await client.build_graph(start_nodes(universe, -1))
+        other = await client.build_graph(start_nodes(universe, -2))
+
+    assert first == second
+    assert first != other
+    assert backend.requests_served == 2
+    assert caching_proxy.upstream_requests == 2
+    assert caching_proxy.cache_hits == 1
+
+
+@pytest.mark.asyncio
+async def test_coalescing(
+    proxy: Tuple[CachingProxy, StubBackend, str], universe: Geneagraph
+) -> None:
+    caching_proxy, backend, uri = proxy
+    progress = [MagicMock(), None, MagicMock()]
+    async with GeneagrapherClient(uri, pool_size=3) as client:
+        graphs = await asyncio.gather(
+            *(
+                client.build_graph(start_nodes(universe, -1), progress=p)
+                for p in progress
+            )
+        )
+
+    assert graphs[0] == graphs[1] == graphs[2]
+    assert backend.requests_served == 1
+    assert caching_proxy.coalesced == 2
+    assert caching_proxy.inflight == {}
+    # Progress is forwarded to each client that asked for it.
+    for p in progress:
+        if p is not None:
+            assert p.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_upstream_error(
+    proxy: Tuple[CachingProxy, StubBackend, str], universe: Geneagraph
+) -> None:
+    caching_proxy, _, uri = proxy
+    await caching_proxy.client.close()
+    async with GeneagrapherClient(uri) as client:
+        with pytest.raises(GgrapherError) as exc_info:
+            await client.build_graph(start_nodes(universe, -1))
+    assert exc_info.value.extra == {
+        "Response": json.dumps({"kind": "error", "payload": "The client is closed."})
+    }
+    assert len(caching_proxy.results) == 0
+
+
+@pytest.mark.asyncio
+async def test_bad_request(proxy: Tuple[CachingProxy, StubBackend, str]) -> None:
+    _, _, uri = proxy
+    async with GeneagrapherClient(uri) as client:
+        with pytest.raises(GgrapherError) as exc_info:
+            await client.request({"kind": "nonsense"})  # type: ignore[typeddict-item]
+    assert exc_info.value.extra == {
+        "Response": json.dumps({"kind": "error", "payload": "bad request"})
+    }
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "nodes",
+    [
+        [1],
+        [{"recordId": 5}],
+        [{"recordId": "5", "getAdvisors": True, "getDescendants": False}],
+        [{"recordId": 5, "getAdvisors": 1, "getDescendants": False}],
+        "abc",
+        {"recordId": 5, "getAdvisors": True, "getDescendants": False},
+    ],
+)
+async def test_bad_start_nodes(
+    proxy: Tuple[CachingProxy, StubBackend, str], universe: Geneagraph, nodes: Any
+) -> None:
+    _, backend, uri = proxy
+    payload: RequestPayload = {
+        "kind": "build-graph",
+        "options": {"reportingCallback": False},
+        "startNodes": nodes,
+    }
+    async with GeneagrapherClient(uri) as client:
+        with pytest.raises(GgrapherError) as exc_info:
+            await client.request(payload)
+        # The proxy keeps serving the connection.
+        await client.build_graph(start_nodes(universe, -1))
+    assert exc_info.value.extra == {
+        "Response": json.dumps({"kind": "error", "payload": "bad request"})
+    }
+    assert backend.requests_served == 1
+
+
+@pytest.mark.asyncio
+async def test_subgraph_hit(
+    proxy: Tuple[CachingProxy, StubBackend, str], universe: Geneagraph
+) -> None:
+    caching_proxy, backend, uri = proxy
+    both = start_nodes(universe, -1) + start_nodes(universe, -2)
+    async with GeneagrapherClient(uri) as client:
+        await client.build_graph(both)
+        subgraph = await client.build_graph(start_nodes(universe, -2))
+        # The extracted graph is cached under its own key.
+        await client.build_graph(start_nodes(universe, -2))
+
+    assert subgraph == traverse_local(start_nodes(universe, -2), backend.lookup)[0]
+    assert backend.requests_served == 1
+    assert caching_proxy.subgraph_hits == 1
+    assert caching_proxy.cache_hits == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "limits", [{"maxDepth": 1}, {"maxNodes": 3}, {"maxNodes": 5, "maxDepth": 2}]
+)
+async def test_limits(
+    proxy: Tuple[CachingProxy, StubBackend, str],
+    universe: Geneagraph,
+    limits: Dict[str, int],
+) -> None:
+    caching_proxy, backend, uri = proxy
+    both = start_nodes(universe, -1) + start_nodes(universe, -3)
+    options: Dict[str, Any] = {"reportingCallback": False, **limits}
+    payload: RequestPayload = {
+        "kind": "build-graph",
+        "options": options,  # type: ignore[typeddict-item]
+        "startNodes": start_nodes(universe, -3),
+    }
+    async with GeneagrapherClient(uri) as client:
+        # A cached graph that covers the start nodes is not limited, so
+        # it cannot answer the limited request.
+        await client.build_graph(both)
+        graph = await client.request(payload)
+        unlimited = await client.build_graph(start_nodes(universe, -3))
+
+    # The stub backend ignores the limits, so the proxy applies them.
+    expected, _ = traverse_local(
+        start_nodes(universe, -3),
+        backend.lookup,
+        max_nodes=limits.get("maxNodes"),
+        max_depth=limits.get("maxDepth"),
+    )
+    assert graph == expected
+    assert graph["status"] == "truncated"
+    assert len(graph["nodes"]) < len(unlimited["nodes"])
+    assert backend.requests_served == 2
+    assert caching_proxy.subgraph_hits == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"reportingCallback": False, "maxNodes": 0},
+        {"reportingCallback": False, "maxDepth": -1},
+        {"reportingCallback": False, "maxNodes": "10"},
+    ],
+)
+async def test_bad_limits(
+    proxy: Tuple[CachingProxy, StubBackend, str],
+    universe: Geneagraph,
+    options: Dict[str, Any],
+) -> None:
+    _, backend, uri = proxy
+    payload: RequestPayload = {
+        "kind": "build-graph",
+        "options": options,  # type: ignore[typeddict-item]
+        "startNodes": start_nodes(universe, -1),
+    }
+    async with GeneagrapherClient(uri) as client:
+        with pytest.raises(GgrapherError):
+            await client.request(payload)
+    assert backend.requests_served == 0
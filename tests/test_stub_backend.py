@@ -0,0 +1,154 @@
+from geneagrapher.cache import RecordCache
+from geneagrapher.geneagrapher import (
+    GgrapherError,
+    RequestPayload,
+    get_graph,
+    get_graph_cached,
+    get_graph_sharded,
+)
+from geneagrapher.stub_backend import StubBackend
+from geneagrapher.synthetic import make_geneagraph
+from geneagrapher.traverse import traverse_local
+from geneagrapher.types import Geneagraph, RecordId, StartNodeRequest
+
+import json
+from pathlib import Path
+import pytest
+import pytest_asyncio
+from typing import AsyncIterator, List, Tuple
+import websockets.client
+
+
+@pytest.fixture
+def universe() -> Geneagraph:
+    return make_geneagraph(2000, seed=7)
+
+
+@pytest_asyncio.fixture
+async def stub(universe: Geneagraph) -> AsyncIterator[Tuple[StubBackend, str]]:
+    backend = StubBackend(universe, latency=0.01, progress_steps=3)
+    async with backend.serve("localhost", 0) as server:
+        port = list(server.sockets)[0].getsockname()[1]
+        yield backend, f"ws://localhost:{port}"
+
+
+def start_nodes(universe: Geneagraph) -> List[StartNodeRequest]:
+    ids = list(universe["nodes"])
+    return [
+        {"recordId": ids[-1], "getAdvisors": True, "getDescendants": False},
+        {"recordId": ids[10], "getAdvisors": False, "getDescendants": True},
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("reporting", [True, False])
+async def test_get_graph(
+    stub: Tuple[StubBackend, str],
+    universe: Geneagraph,
+    reporting: bool,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    backend, uri = stub
+    graph = await get_graph(
+        {
+            "kind": "build-graph",
+            "options": {"reportingCallback": reporting},
+            "startNodes": start_nodes(universe),
+        },
+        uri=uri,
+    )
+
+    expected, _ = traverse_local(
+        start_nodes(universe), lambda ids: {i: universe["nodes"][i] for i in ids}
+    )
+    assert graph == expected
+    assert len(graph["nodes"]) > 10
+    assert backend.requests_served == 1
+    assert ("Progress: " in capsys.readouterr().err) is reporting
+
+
+@pytest.mark.asyncio
+async def test_get_graph_cached(
+    stub: Tuple[StubBackend, str], universe: Geneagraph, tmp_path: Path
+) -> None:
+    backend, uri = stub
+    request: RequestPayload = {
+        "kind": "build-graph",
+        "options": {"reportingCallback": False},
+        "startNodes": start_nodes(universe),
+    }
+    with RecordCache.open(tmp_path) as cache:
+        graph = await get_graph_cached(request, cache, uri=uri)
+        assert backend.requests_served == 1
+
+        # The second build is served from the cache.
+        assert await get_graph_cached(request, cache, uri=uri) == graph
+        assert backend.requests_served == 1
+
+
+@pytest.mark.asyncio
+async def test_get_graph_sharded(
+    stub: Tuple[StubBackend, str], universe: Geneagraph
+) -> None:
+    backend, uri = stub
+    request: RequestPayload = {
+        "kind": "build-graph",
+        "options": {"reportingCallback": True},
+        "startNodes": start_nodes(universe),
+    }
+    assert await get_graph_sharded(request, 4, uri=uri) == await get_graph(
+        request, uri=uri
+    )
+    assert backend.requests_served == 3
+
+
+@pytest.mark.asyncio
+async def test_multiple_requests_per_connection(
+    stub: Tuple[StubBackend, str], universe: Geneagraph
+) -> None:
+    backend, uri = stub
+    async with websockets.client.connect(uri) as ws:
+        for record_id in list(universe["nodes"])[:3]:
+            await ws.send(
+                json.dumps(
+                    {
+                        "kind": "build-graph",
+                        "options": {"reportingCallback": False},
+                        "startNodes": [
+                            {
+                                "recordId": record_id,
+                                "getAdvisors": False,
+                                "getDescendants": False,
+                            }
+                        ],
+                    }
+                )
+            )
+            response = json.loads(await ws.recv())
+            assert response["kind"] == "graph"
+            assert list(response["payload"]["nodes"]) == [str(record_id)]
+    assert backend.requests_served == 3
+
+
+@pytest.mark.asyncio
+async def test_bad_request(stub: Tuple[StubBackend, str]) -> None:
+    _, uri = stub
+    with pytest.raises(GgrapherError) as exc_info:
+        await get_graph({"kind": "other"}, uri=uri)  # type: ignore[typeddict-item]
+    assert exc_info.value.msg == "Request to Geneagrapher backend failed."
+
+
+@pytest.mark.asyncio
+async def test_unknown_record(stub: Tuple[StubBackend, str]) -> None:
+    _, uri = stub
+    graph = await get_graph(
+        {
+            "kind": "build-graph",
+            "options": {"reportingCallback": True},
+            "startNodes": [
+                {"recordId": 0, "getAdvisors": True, "getDescendants": False}
+            ],
+        },
+        uri=uri,
+    )
+    assert graph == {"start_nodes": [RecordId(0)], "nodes": {}, "status": "complete"}
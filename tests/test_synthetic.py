@@ -0,0 +1,30 @@
+from geneagrapher.synthetic import make_geneagraph
+from geneagrapher.types import RecordId
+
+import pytest
+
+
+@pytest.mark.parametrize("num_nodes", [0, 1, 2, 500])
+def test_make_geneagraph(num_nodes: int) -> None:
+    graph = make_geneagraph(num_nodes, seed=3)
+    nodes = graph["nodes"]
+    assert len(nodes) == num_nodes
+    assert graph["status"] == "complete"
+    assert graph["start_nodes"] == list(nodes)[-1:]
+
+    for record_id, record in nodes.items():
+        assert record["id"] == record_id
+        for advisor_id in record["advisors"]:
+            assert record_id in nodes[RecordId(advisor_id)]["descendants"]
+        for descendant_id in record["descendants"]:
+            assert record_id in nodes[RecordId(descendant_id)]["advisors"]
+
+
+def test_make_geneagraph_deterministic() -> None:
+    assert make_geneagraph(100, seed=1) == make_geneagraph(100, seed=1)
+    assert make_geneagraph(100, seed=1) != make_geneagraph(100, seed=2)
+
+
+def test_make_geneagraph_start_nodes() -> None:
+    graph = make_geneagraph(10, start_nodes=[RecordId(1), RecordId(2)])
+    assert graph["start_nodes"] == [1, 2]
@@ -0,0 +1,126 @@
+from geneagrapher.timings import MAX_INTERVALS, TimedWriter, Timings, phase
+
+import io
+import pytest
+import time
+from unittest.mock import patch
+
+
+class TestTimings:
+    def test_phase(self) -> None:
+        timings = Timings()
+        with patch("geneagrapher.timings.time.perf_counter", side_effect=[1, 3, 5, 6]):
+            with timings.phase("decode"):
+                pass
+            with timings.phase("decode"):
+                pass
+        assert timings.phases == {"decode": 3}
+
+    def test_phase_exception(self) -> None:
+        timings = Timings()
+        with pytest.raises(ValueError):
+            with timings.phase("backend"):
+                raise ValueError()
+        assert "backend" in timings.phases
+
+    def test_phase_none(self) -> None:
+        with phase(None, "decode"):
+            pass
+
+    @pytest.mark.parametrize(
+        "message,size", [("abc", 3), ("Universität", 12), (b"abcd", 4)]
+    )
+    def test_received(self, message: str, size: int) -> None:
+        timings = Timings()
+        timings.received(message)
+        timings.received(message)
+        assert timings.messages_received == 2
+        assert timings.bytes_received == 2 * size
+
+    def test_progress_received(self) -> None:
+        timings = Timings()
+        with patch.object(timings, "elapsed", side_effect=[1.5, 2.5]):
+            timings.progress_received()
+            timings.progress_received()
+        assert timings.first_progress == 1.5
+
+    def test_overlapping_phases(self) -> None:
+        timings = Timings()
+        # Two concurrent requests wait for the backend from 1 to 4 and
+        # from 2 to 5, and a third from 7 to 8.
+        timings.add_interval("backend", 1, 4)
+        timings.add_interval("backend", 7, 8)
+        timings.add_interval("backend", 2, 5)
+        timings.add_interval("cache", 3, 3.5)
+        assert timings.phases == {"backend": 5, "cache": 0.5}
+
+    def test_many_intervals(self) -> None:
+        timings = Timings()
+        for i in range(MAX_INTERVALS + 1):
+            timings.add_interval("decode", i, i + 2)
+        assert len(timings.intervals["decode"]) == 1
+        timings.add_interval("decode", 0, 1)
+        assert timings.phases == {"decode": MAX_INTERVALS + 2}
+
+    def test_many_disjoint_intervals(self) -> None:
+        timings = Timings()
+        started = time.perf_counter()
+        for i in range(10 * MAX_INTERVALS):
+            timings.add_interval("write", 2 * i, 2 * i + 1)
+        assert time.perf_counter() - started < 1
+        assert len(timings.intervals["write"]) <= MAX_INTERVALS
+        assert timings.phases == {"write": 10 * MAX_INTERVALS}
+
+    def test_many_intervals_open_phase(self) -> None:
+        timings = Timings()
+        # A request waits for the backend from 1 to the end, while
+        # another makes many short ones, the first of them from 0 to 0.5.
+        ticks = iter([1, 3 * MAX_INTERVALS])
+        with patch("geneagrapher.timings.time.perf_counter", side_effect=ticks):
+            with timings.phase("backend"):
+                for i in range(2 * MAX_INTERVALS):
+                    timings.add_interval("backend", i * 1.5, i * 1.5 + 0.5)
+        assert timings.phases == {"backend": 3 * MAX_INTERVALS - 0.5}
+
+    def test_report(self) -> None:
+        timings = Timings()
+        timings.add_interval("write", 0, 1)
+        timings.add_interval("connect", 1, 1.5)
+        timings.add_interval("custom", 1.5, 1.75)
+        timings.received("abc")
+        timings.final_graph = 2
+        with patch.object(timings, "elapsed", return_value=4):
+            assert (
+                timings.report()
+                == """Timings (wall-clock):
+  connect:                    0.500s  12.5%
+  write:                      1.000s  25.0%
+  custom:                     0.250s   6.2%
+  other:                      2.250s
+  total:                      4.000s
+  first progress message:          -
+  final graph:                2.000s
+  messages received:               1
+  bytes received:                  3"""
+            )
+
+
+def test_report_overlap() -> None:
+    timings = Timings()
+    timings.add_interval("backend", 0, 3)
+    timings.add_interval("cache", 1, 2)
+    with patch.object(timings, "elapsed", return_value=3):
+        report = timings.report()
+    assert "  other:                      0.000s\n" in report
+    assert "the phases overlap" in report
+
+
+def test_timed_writer() -> None:
+    timings = Timings()
+    fp = io.StringIO()
+    writer = TimedWriter(fp, timings)
+    writer.write("a")
+    writer.writelines(["b", "c"])
+    writer.flush()
+    assert fp.getvalue() == "abc"
+    assert list(timings.phases) == ["write"]
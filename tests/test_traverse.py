@@ -0,0 +1,310 @@
+from geneagrapher.traverse import (
+    LocalTraversal,
+    canonical_start_nodes,
+    covers,
+    extract_subgraph,
+    traverse_local,
+)
+from geneagrapher.types import Geneagraph, Record, RecordId, StartNodeRequest
+from tests.helpers import make_record, sn
+
+import pytest
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+# 1 and 2 advised 3; 3 advised 4 and 5; 5 advised 6. 7 advised 1.
+RECORDS: Dict[RecordId, Record] = {
+    RecordId(r["id"]): r
+    for r in [
+        make_record(7, [], [1]),
+        make_record(1, [7], [3]),
+        make_record(2, [], [3]),
+        make_record(3, [1, 2], [4, 5]),
+        make_record(4, [3], []),
+        make_record(5, [3], [6]),
+        make_record(6, [5], []),
+    ]
+}
+
+
+class Lookup:
+    def __init__(self, records: Dict[RecordId, Record]) -> None:
+        self.records = records
+        self.calls: List[List[RecordId]] = []
+
+    def __call__(self, ids: Iterable[RecordId]) -> Dict[RecordId, Record]:
+        ids = sorted(ids)
+        self.calls.append(ids)
+        return {rid: self.records[rid] for rid in ids if rid in self.records}
+
+
+@pytest.mark.parametrize(
+    "start_nodes,expected_nodes",
+    (
+        [[sn(3, True, False)], [1, 2, 3, 7]],
+        [[sn(3, False, True)], [3, 4, 5, 6]],
+        [[sn(3, True, True)], [1, 2, 3, 4, 5, 6, 7]],
+        [[sn(3, False, False)], [3]],
+        # Nodes reached in the advisor direction are not expanded in
+        # the descendant direction.
+        [[sn(5, True, False)], [1, 2, 3, 5, 7]],
+        [[sn(4, True, False), sn(6, True, False)], [1, 2, 3, 4, 5, 6, 7]],
+    ),
+)
+def test_traverse_local(
+    start_nodes: List[StartNodeRequest], expected_nodes: List[int]
+) -> None:
+    graph, frontier = traverse_local(start_nodes, Lookup(RECORDS))
+    assert frontier == []
+    assert graph["start_nodes"] == [s["recordId"] for s in start_nodes]
+    assert sorted(graph["nodes"]) == expected_nodes
+    assert all(graph["nodes"][rid] == RECORDS[rid] for rid in graph["nodes"])
+    assert graph["status"] == "complete"
+
+
+def test_traverse_local_batches_lookups() -> None:
+    lookup = Lookup(RECORDS)
+    traverse_local([sn(7, False, True), sn(3, True, False)], lookup)
+    # One lookup per level of the traversal.
+    assert lookup.calls == [[3, 7], [1, 2], [4, 5], [6]]
+
+
+@pytest.mark.parametrize(
+    "missing,start_nodes,expected_nodes,expected_frontier",
+    (
+        [
+            (2,),
+            [sn(3, True, False)],
+            [1, 3, 7],
+            [sn(2, True, False)],
+        ],
+        [(2,), [sn(3, False, True)], [3, 4, 5, 6], []],
+        [(6,), [sn(3, False, True)], [3, 4, 5], [sn(6, False, True)]],
+        [(3,), [sn(3, True, True)], [], [sn(3, True, True)]],
+        [(3,), [sn(3, False, False)], [], [sn(3, False, False)]],
+        # A missing record reached in both directions is requested
+        # once, with both directions.
+        [
+            (3,),
+            [sn(2, False, True), sn(4, True, False)],
+            [2, 4],
+            [sn(3, True, True)],
+        ],
+        [
+            (1, 2),
+            [sn(3, True, False)],
+            [3],
+            [sn(1, True, False), sn(2, True, False)],
+        ],
+    ),
+)
+def test_traverse_local_missing(
+    missing: Tuple[int, ...],
+    start_nodes: List[StartNodeRequest],
+    expected_nodes: List[int],
+    expected_frontier: List[StartNodeRequest],
+) -> None:
+    records = {rid: r for rid, r in RECORDS.items() if rid not in missing}
+    graph, frontier = traverse_local(start_nodes, Lookup(records))
+    assert sorted(graph["nodes"]) == expected_nodes
+    assert sorted(frontier, key=lambda f: f["recordId"]) == expected_frontier
+    assert graph["start_nodes"] == [s["recordId"] for s in start_nodes]
+
+
+@pytest.mark.parametrize(
+    "start_nodes,max_depth,max_nodes,expected_nodes,status",
+    (
+        [[sn(6, True, False)], 0, None, [6], "truncated"],
+        [[sn(6, True, False)], 2, None, [3, 5, 6], "truncated"],
+        [[sn(6, True, False)], 4, None, [1, 2, 3, 5, 6, 7], "complete"],
+        # Records without relatives in the direction followed do not
+        # truncate the graph at the depth limit.
+        [[sn(6, False, True)], 0, None, [6], "complete"],
+        [[sn(3, True, True)], 1, None, [1, 2, 3, 4, 5], "truncated"],
+        # Records closer to the start nodes are kept first.
+        [[sn(6, True, False)], None, 3, [3, 5, 6], "truncated"],
+        [[sn(3, True, True)], None, 4, [1, 2, 3, 4], "truncated"],
+        [[sn(3, False, True)], None, 4, [3, 4, 5, 6], "complete"],
+        [[sn(3, True, True)], 1, 3, [1, 2, 3], "truncated"],
+    ),
+)
+def test_traverse_local_limits(
+    start_nodes: List[StartNodeRequest],
+    max_depth: Optional[int],
+    max_nodes: Optional[int],
+    expected_nodes: List[int],
+    status: str,
+) -> None:
+    graph, frontier = traverse_local(
+        start_nodes, Lookup(RECORDS), max_depth=max_depth, max_nodes=max_nodes
+    )
+    assert frontier == []
+    assert sorted(graph["nodes"]) == expected_nodes
+    assert graph["status"] == status
+
+
+@pytest.mark.parametrize(
+    "max_depth,max_nodes,expected_frontier",
+    (
+        # Missing records at the depth limit are requested without
+        # their relatives.
+        [1, None, [sn(3, False, False)]],
+        [None, None, [sn(3, True, False)]],
+        # Missing records count toward the limit on records.
+        [None, 2, [sn(3, True, False)]],
+        [None, 1, []],
+    ),
+)
+def test_traverse_local_limits_missing(
+    max_depth: Optional[int],
+    max_nodes: Optional[int],
+    expected_frontier: List[StartNodeRequest],
+) -> None:
+    records = {rid: r for rid, r in RECORDS.items() if rid != 3}
+    graph, frontier = traverse_local(
+        [sn(5, True, False)],
+        Lookup(records),
+        max_depth=max_depth,
+        max_nodes=max_nodes,
+    )
+    assert sorted(graph["nodes"]) == [5]
+    assert frontier == expected_frontier
+
+
+def fetch_generations(
+    traversal: LocalTraversal,
+    available: Dict[RecordId, Record],
+    missing: Tuple[int, ...],
+) -> List[List[RecordId]]:
+    """Advance `traversal`, making the records it asks for available,
+    except those in `missing`, until it is done. Return the IDs that it
+    asked for at each step."""
+    generations: List[List[RecordId]] = []
+    while True:
+        record_ids = traversal.advance()
+        if not record_ids:
+            return generations
+        generations.append(record_ids)
+        available.update(
+            {rid: RECORDS[rid] for rid in record_ids if rid not in missing}
+        )
+
+
+@pytest.mark.parametrize(
+    "start_nodes,max_depth,max_nodes,expected_generations",
+    (
+        [[sn(3, True, True)], None, None, [[3], [1, 2, 4, 5], [7, 6]]],
+        [[sn(3, True, True)], 1, None, [[3], [1, 2, 4, 5]]],
+        [[sn(3, True, True)], None, 4, [[3], [1, 2, 4]]],
+        [[sn(6, True, False)], None, 3, [[6], [5], [3]]],
+        [[sn(4, True, False), sn(6, True, False)], 2, None, [[4, 6], [3, 5], [1, 2]]],
+    ),
+)
+def test_local_traversal(
+    start_nodes: List[StartNodeRequest],
+    max_depth: Optional[int],
+    max_nodes: Optional[int],
+    expected_generations: List[List[int]],
+) -> None:
+    available: Dict[RecordId, Record] = {}
+    lookup = Lookup(available)
+    traversal = LocalTraversal(
+        start_nodes, lookup, max_depth=max_depth, max_nodes=max_nodes
+    )
+    assert fetch_generations(traversal, available, ()) == expected_generations
+    # The graph is the one built when all the records are available.
+    expected, _ = traverse_local(
+        start_nodes, Lookup(RECORDS), max_depth=max_depth, max_nodes=max_nodes
+    )
+    assert traversal.graph() == expected
+    # Each record is looked up once before it is fetched and once after.
+    looked_up = sorted(rid for ids in lookup.calls for rid in ids)
+    assert looked_up == sorted(2 * [rid for ids in expected_generations for rid in ids])
+
+
+def test_local_traversal_not_returned() -> None:
+    available: Dict[RecordId, Record] = {}
+    traversal = LocalTraversal([sn(3, True, True)], Lookup(available))
+    # Records that are still missing once fetched are not asked for
+    # again, and are left out of the graph.
+    assert fetch_generations(traversal, available, (1, 5)) == [[3], [1, 2, 4, 5]]
+    assert sorted(traversal.graph()["nodes"]) == [2, 3, 4]
+
+
+def test_local_traversal_cached() -> None:
+    # Records that are available are traversed without being asked for.
+    available = {rid: r for rid, r in RECORDS.items() if rid not in (3, 6)}
+    traversal = LocalTraversal([sn(5, True, True)], Lookup(available))
+    assert fetch_generations(traversal, available, ()) == [[3, 6]]
+    assert sorted(traversal.graph()["nodes"]) == [1, 2, 3, 5, 6, 7]
+
+
+@pytest.mark.parametrize(
+    "start_nodes,expected",
+    (
+        [[], []],
+        [[sn(3, True, False)], [sn(3, True, False)]],
+        [
+            [sn(3, True, False), sn(1, True, False)],
+            [sn(1, True, False), sn(3, True, False)],
+        ],
+        [
+            [
+                sn(3, True, False),
+                sn(1, False, True),
+                sn(3, False, True),
+                sn(3, True, False),
+            ],
+            [sn(1, False, True), sn(3, True, True)],
+        ],
+        [[sn(3, False, False)], [sn(3, False, False)]],
+    ),
+)
+def test_canonical_start_nodes(
+    start_nodes: List[StartNodeRequest], expected: List[StartNodeRequest]
+) -> None:
+    assert canonical_start_nodes(start_nodes) == expected
+
+
+def test_canonical_start_nodes_copies() -> None:
+    start_nodes = [sn(3, True, False), sn(3, False, True)]
+    canonical_start_nodes(start_nodes)
+    assert start_nodes == [sn(3, True, False), sn(3, False, True)]
+
+
+@pytest.mark.parametrize(
+    "superset,subset,expected",
+    (
+        [[sn(3, True, True)], [], True],
+        [[sn(3, True, True)], [sn(3, True, False)], True],
+        [[sn(3, True, False), sn(3, False, True)], [sn(3, True, True)], True],
+        [[sn(3, True, False), sn(5, True, False)], [sn(5, True, False)], True],
+        [[sn(3, True, False)], [sn(3, True, True)], False],
+        [[sn(3, True, False)], [sn(5, True, False)], False],
+        [[], [sn(5, False, False)], False],
+    ),
+)
+def test_covers(
+    superset: List[StartNodeRequest], subset: List[StartNodeRequest], expected: bool
+) -> None:
+    assert covers(superset, subset) is expected
+
+
+class TestExtractSubgraph:
+    def test_extract(self) -> None:
+        graph, _ = traverse_local([sn(3, True, True)], Lookup(RECORDS))
+        graph["status"] = "truncated"
+        subgraph = extract_subgraph(graph, [sn(5, False, True)])
+        assert subgraph == {
+            "start_nodes": [5],
+            "nodes": {5: RECORDS[RecordId(5)], 6: RECORDS[RecordId(6)]},
+            "status": "truncated",
+        }
+
+    def test_missing_records(self) -> None:
+        graph: Geneagraph = {
+            "start_nodes": [RecordId(3)],
+            "nodes": {RecordId(3): RECORDS[RecordId(3)]},
+            "status": "complete",
+        }
+        assert extract_subgraph(graph, [sn(3, True, False)]) is None